@@ -0,0 +1,1036 @@
+# Recording stand-in for the Maya modules used by Zeus.
+#
+# install() puts fake maya, maya.cmds, maya.mel, maya.standalone,
+# maya.api.OpenMaya and maya.api.OpenMayaAnim modules in sys.modules, so
+# the plug-in runs in a plain Python interpreter. The fakes keep a tiny
+# scene (nodes, attribute values, connections, parenting) good enough for
+# the Zeus code paths, and every call is recorded with a modelled cost
+# (COSTS, in microseconds, rough timings of the real calls in an
+# interactive session). Undoable commands are counted as undo entries
+# the way Maya's undo queue does (one per command, or one per chunk).
+#
+# The modelled costs also drive a simulated clock (clock.perf_counter),
+# the benchmarks give it to the model instead of the time module so the
+# write throttling behaves as in Maya.
+import fnmatch
+import importlib.util
+import itertools
+import os
+import sys
+import types
+from collections import Counter
+
+
+# Modelled cost of a call (microseconds)
+DEFAULT_COMMAND_COST = 40.0
+DEFAULT_API_COST = 2.0
+COSTS = {
+    # Commands (MEL dispatch, name resolution, undo bookkeeping)
+    'cmds.createNode': 300.0,
+    'cmds.shadingNode': 400.0,
+    'cmds.group': 250.0,
+    'cmds.nParticle': 3000.0,
+    'cmds.emitter': 1500.0,
+    'cmds.connectDynamic': 800.0,
+    'cmds.polyCylinder': 400.0,
+    'cmds.particleInstancer': 1200.0,
+    'cmds.hyperShade': 1500.0,
+    'cmds.parent': 200.0,
+    'cmds.rename': 150.0,
+    'cmds.delete': 200.0,
+    'cmds.connectAttr': 80.0,
+    'cmds.setAttr': 45.0,
+    'cmds.getAttr': 40.0,
+    'cmds.ls': 60.0,
+    'cmds.listConnections': 50.0,
+    'cmds.listRelatives': 40.0,
+    'cmds.setKeyframe': 120.0,
+    'cmds.cutKey': 100.0,
+    'cmds.undoInfo': 10.0,
+    'cmds.evalDeferred': 5.0,
+    'mel.eval': 200.0,
+    # API (no command dispatch, name resolution only where noted)
+    'MSelectionList.add': 15.0,
+    'MFnDependencyNode.findPlug': 5.0,
+    'MDGModifier.doIt': 10.0,
+    'MFnAnimCurve.create': 100.0,
+}
+# Extra cost per item of a bulk call
+MODIFIER_OPERATION_COST = 3.0
+ANIM_CURVE_KEY_COST = 0.2
+PRESET_LINE_COST = 40.0
+
+UNDOABLE_COMMANDS = {
+    'addAttr', 'connectAttr', 'connectDynamic', 'createNode', 'cutKey', 'delete', 'emitter', 'group',
+    'hyperShade', 'nParticle', 'parent', 'particleInstancer', 'polyCylinder', 'rename', 'select', 'setAttr', 'setKeyframe', 'shadingNode',
+}
+
+# Attribute defaults that matter to Zeus (everything else reads 0)
+DEFAULT_VALUES = {
+    'nucleus': {'windDirectionX': 1.0, 'gravity': 9.8, 'airDensity': 1.0, 'startFrame': 1.0},
+    'nParticle': {'lifespan': 1.0, 'drag': 0.01},
+}
+
+# Node types that are not DAG nodes
+DEPENDENCY_TYPES = {
+    'time', 'aiPhysicalSky', 'aiStandardSurface', 'animCurveTL', 'animCurveTU', 'cacheFile',
+    'zeusCloudDrift', 'zeusRainCuller', 'shadingEngine',
+}
+
+
+# Simulated time, advanced by the modelled cost of every call
+class Clock:
+    def __init__(self):
+        self.time = 0.0
+
+    def perf_counter(self):
+        return self.time
+
+    def advance(self, seconds):
+        self.time += seconds
+
+
+# Calls, modelled cost and undo entries of a run
+class Recorder:
+    def __init__(self):
+        self.calls = Counter()
+        self.cost = 0.0
+        self.undo_entries = 0
+        self.chunk_depth = 0
+
+    def record(self, name, cost=None, undoable=False):
+        if cost is None:
+            cost = COSTS.get(name, DEFAULT_COMMAND_COST if name.startswith(('cmds.', 'mel.')) else DEFAULT_API_COST)
+        self.calls[name] += 1
+        self.cost += cost
+        clock.advance(cost * 1e-6)
+        if undoable and self.chunk_depth == 0:
+            self.undo_entries += 1
+
+    def open_chunk(self):
+        self.chunk_depth += 1
+
+    def close_chunk(self):
+        if self.chunk_depth > 0:
+            self.chunk_depth -= 1
+            if self.chunk_depth == 0:
+                self.undo_entries += 1
+
+    def summary(self):
+        return {
+            'calls': sum(self.calls.values()),
+            'modelled_ms': self.cost / 1000.0,
+            'undo_entries': self.undo_entries,
+            'by_call': dict(self.calls.most_common()),
+        }
+
+
+clock = Clock()
+recorder = Recorder()
+
+
+class FakeNode:
+    def __init__(self, name, node_type, parent=None):
+        self.name = name
+        self.type = node_type
+        self.parent = parent
+        self.attributes = {}
+        self.alive = True
+
+    @property
+    def dag(self):
+        return self.type not in DEPENDENCY_TYPES
+
+    def path(self):
+        if not self.dag:
+            return self.name
+        return (self.parent.path() if self.parent else '') + '|' + self.name
+
+
+class Scene:
+    def __init__(self):
+        self.nodes = []
+        # (source node, source attribute, destination node, destination attribute)
+        self.connections = []
+        self.deferred = []
+        self.plugins = {}
+        self.selection = []
+        self.create_node('time', 'time1')
+        camera = self.create_node('transform', 'persp')
+        self.create_node('camera', 'perspShape', camera)
+
+    def create_node(self, node_type, name=None, parent=None):
+        name = self.unique_name(name or node_type + '1')
+        node = FakeNode(name, node_type, parent)
+        node.attributes.update(DEFAULT_VALUES.get(node_type, {}))
+        self.nodes.append(node)
+        if node_type == 'transform':
+            callbacks.fire('nodeAdded', MObject(node))
+        return node
+
+    def unique_name(self, name):
+        if self.find(name) is None:
+            return name
+        base = name.rstrip('0123456789')
+        for index in itertools.count(1):
+            if self.find(f'{base}{index}') is None:
+                return f'{base}{index}'
+
+    def find(self, name):
+        name = str(name).split('.')[0].split('|')[-1]
+        for node in self.nodes:
+            if node.alive and node.name == name:
+                return node
+        return None
+
+    def get(self, name):
+        node = self.find(name)
+        if node is None:
+            raise RuntimeError(f'No object matches name: {name}')
+        return node
+
+    def live_nodes(self):
+        return [node for node in self.nodes if node.alive]
+
+    def children(self, node):
+        return [child for child in self.live_nodes() if child.parent is node]
+
+    def delete(self, node):
+        for child in self.children(node):
+            self.delete(child)
+        node.alive = False
+        self.connections = [connection for connection in self.connections
+                            if connection[0] is not node and connection[2] is not node]
+        if node.type == 'transform':
+            callbacks.fire('nodeRemoved', MObject(node))
+
+    def connect(self, source, destination):
+        source_node, source_attribute = split_plug(source)
+        destination_node, destination_attribute = split_plug(destination)
+        self.connections = [connection for connection in self.connections
+                            if (connection[2], connection[3]) != (destination_node, destination_attribute)]
+        self.connections.append((source_node, source_attribute, destination_node, destination_attribute))
+
+    def is_destination(self, node, attribute):
+        return any(connection[2] is node and connection[3] == attribute for connection in self.connections)
+
+    def source(self, node, attribute):
+        for source_node, source_attribute, destination_node, destination_attribute in self.connections:
+            if destination_node is node and destination_attribute == attribute:
+                return source_node, source_attribute
+        return None, None
+
+    # Same scene read again from disk: every node is a new object
+    def reopen(self):
+        copies = {}
+        for node in self.live_nodes():
+            copy = FakeNode(node.name, node.type)
+            copy.attributes = dict(node.attributes)
+            copies[node] = copy
+            node.alive = False
+        for node, copy in copies.items():
+            copy.parent = copies.get(node.parent)
+        self.nodes = list(copies.values())
+        self.connections = [(copies[source], source_attribute, copies[destination], destination_attribute)
+                            for source, source_attribute, destination, destination_attribute in self.connections]
+        callbacks.fire(MSceneMessage.kAfterOpen)
+
+
+def split_plug(plug):
+    name, attribute = plug.split('.', 1)
+    return scene.get(name), attribute
+
+
+class CallbackRegistry:
+    def __init__(self):
+        self.callbacks = {}
+        self.ids = itertools.count(1)
+
+    def add(self, message, function, *client_data, node=None):
+        callback_id = next(self.ids)
+        self.callbacks[callback_id] = (message, node, function, client_data)
+        return callback_id
+
+    def remove(self, callback_id):
+        self.callbacks.pop(callback_id, None)
+
+    def fire(self, message, *args, node=None):
+        for callback_message, callback_node, function, client_data in list(self.callbacks.values()):
+            if callback_message == message and (callback_node is None or callback_node is node):
+                function(*args, *client_data)
+
+
+scene = None
+callbacks = CallbackRegistry()
+
+
+# Fresh scene, callbacks and counters
+def reset():
+    global scene, recorder
+    callbacks.callbacks.clear()
+    recorder = Recorder()
+    scene = Scene()
+
+
+def process_idle():
+    while scene.deferred:
+        scene.deferred.pop(0)()
+
+
+# ---------------------------------------------------------------------------
+# maya.cmds
+
+# Fake commands by name
+commands = {}
+
+
+def command(function):
+    name = function.__name__.rstrip('_')
+
+    def wrapper(*args, **kwargs):
+        recorder.record(f'cmds.{name}', undoable=name in UNDOABLE_COMMANDS and not kwargs.get('query'))
+        return function(*args, **kwargs)
+    wrapper.__name__ = name
+    commands[name] = wrapper
+    return wrapper
+
+
+def node_names(nodes, long=False):
+    return [node.path() if long else node.name for node in nodes]
+
+
+def flatten(names):
+    if isinstance(names, (list, tuple)):
+        return [name for item in names for name in flatten(item)]
+    return [names]
+
+
+@command
+def objExists(name):
+    return scene.find(name) is not None
+
+
+@command
+def createNode(node_type, name=None, parent=None, **kwargs):
+    node = scene.create_node(node_type, name, scene.get(parent) if parent else None)
+    return node.name
+
+
+@command
+def shadingNode(node_type, name=None, **kwargs):
+    return scene.create_node(node_type, name).name
+
+
+@command
+def group(*args, empty=False, name=None, **kwargs):
+    return scene.create_node('transform', name).name
+
+
+@command
+def parent(child, parent_name, **kwargs):
+    node = scene.get(child)
+    node.parent = scene.get(parent_name)
+    return [node.name]
+
+
+@command
+def rename(old_name, new_name):
+    node = scene.get(old_name)
+    new_name = scene.unique_name(new_name)
+    node.name = new_name
+    callbacks.fire('nameChanged', MObject(node), old_name, node=node)
+    return new_name
+
+
+@command
+def delete(*names):
+    for name in flatten(list(names)):
+        node = scene.find(name)
+        if node is not None:
+            scene.delete(node)
+
+
+@command
+def ls(*patterns, long=False, objectsOnly=False, recursive=False, **kwargs):
+    found = []
+    for pattern in flatten(list(patterns)):
+        if '.' in pattern:
+            node_pattern, attribute = pattern.split('.', 1)
+            found += [node for node in scene.live_nodes()
+                      if fnmatch.fnmatchcase(node.name, node_pattern) and attribute in node.attributes]
+        else:
+            found += [node for node in scene.live_nodes() if fnmatch.fnmatchcase(node.name, pattern.split('|')[-1])]
+    return node_names(found, long)
+
+
+@command
+def listRelatives(name, shapes=False, fullPath=False, type=None, parent=False, **kwargs):
+    node = scene.get(name)
+    if parent:
+        return node_names([node.parent], fullPath) if node.parent else None
+    children = scene.children(node)
+    if shapes:
+        children = [child for child in children if child.type != 'transform']
+    if type:
+        children = [child for child in children if child.type == type]
+    return node_names(children, fullPath) or None
+
+
+@command
+def listConnections(name, type=None, source=True, destination=True, connections=False, plugs=False, **kwargs):
+    node = scene.get(name)
+    result = []
+    for source_node, source_attribute, destination_node, destination_attribute in scene.connections:
+        if source and destination_node is node:
+            pair = (f'{node.name}.{destination_attribute}', source_node,
+                    f'{source_node.name}.{source_attribute}')
+        elif destination and source_node is node:
+            pair = (f'{node.name}.{source_attribute}', destination_node,
+                    f'{destination_node.name}.{destination_attribute}')
+        else:
+            continue
+        if type and pair[1].type != type:
+            continue
+        if connections:
+            result.append(pair[0])
+        result.append(pair[2] if plugs else pair[1].name)
+    return result or None
+
+
+@command
+def connectAttr(source, destination, force=False, **kwargs):
+    scene.connect(source, destination)
+
+
+@command
+def isConnected(source, destination, **kwargs):
+    source_node, source_attribute = split_plug(source)
+    destination_node, destination_attribute = split_plug(destination)
+    return (source_node, source_attribute, destination_node, destination_attribute) in scene.connections
+
+
+@command
+def setAttr(plug, *values, type=None, **kwargs):
+    node, attribute = split_plug(plug)
+    node.attributes[attribute] = values[0] if len(values) == 1 else tuple(values)
+
+
+@command
+def getAttr(plug, **kwargs):
+    node, attribute = split_plug(plug)
+    return node.attributes.get(attribute, 0.0)
+
+
+@command
+def addAttr(name, longName=None, **kwargs):
+    scene.get(name).attributes.setdefault(longName, '' if kwargs.get('dataType') == 'string' else None)
+
+
+@command
+def attributeQuery(attribute, node=None, exists=False, **kwargs):
+    return attribute in scene.get(node).attributes
+
+
+@command
+def emitter(n=None, **kwargs):
+    return [scene.create_node('pointEmitter', n).name]
+
+
+@command
+def nParticle(name=None, **kwargs):
+    transform = scene.create_node('transform', name)
+    shape = scene.create_node('nParticle', transform.name + 'Shape', transform)
+    nucleus = scene.find('nucleus1') or scene.create_node('nucleus', 'nucleus1')
+    scene.connect(f'{nucleus.name}.outputObjects[0]', f'{shape.name}.nextState')
+    return [transform.name, shape.name]
+
+
+@command
+def polyCylinder(name=None, **kwargs):
+    transform = scene.create_node('transform', name)
+    shape = scene.create_node('mesh', transform.name + 'Shape', transform)
+    return [transform.name]
+
+
+@command
+def particleInstancer(particles, object=None, name=None, **kwargs):
+    instancer = scene.create_node('instancer', name)
+    scene.connect(f'{particles}.instanceData[0].instancePointData', f'{instancer.name}.inputPoints')
+    scene.connect(f'{object}.matrix', f'{instancer.name}.inputHierarchy[0]')
+    return instancer.name
+
+
+@command
+def connectDynamic(name, em=None, fields=None, **kwargs):
+    # Transforms stand for their particle shape
+    node = scene.get(name)
+    shapes = [child for child in scene.children(node) if child.type == 'nParticle']
+    target = (shapes or [node])[0].name
+    if em:
+        scene.connect(f'{em}.output[0]', f'{target}.newParticles[0]')
+    if fields:
+        scene.connect(f'{fields}.outputForce[0]', f'{target}.inputForce[0]')
+
+
+@command
+def select(*names, **kwargs):
+    scene.selection = [scene.get(name) for name in flatten(list(names))]
+
+
+@command
+def hyperShade(assign=None, **kwargs):
+    # Shading group of the material, connected to the selected shapes
+    material = scene.get(assign)
+    groups = [connection[2] for connection in scene.connections
+              if connection[0] is material and connection[2].type == 'shadingEngine']
+    group = groups[0] if groups else scene.create_node('shadingEngine', material.name + 'SG')
+    if not groups:
+        scene.connect(f'{material.name}.outColor', f'{group.name}.surfaceShader')
+    for node in scene.selection:
+        for shape in scene.children(node) or [node]:
+            scene.connect(f'{shape.name}.instObjGroups[0]', f'{group.name}.dagSetMembers[-1]')
+
+
+@command
+def setKeyframe(plug, **kwargs):
+    pass
+
+
+@command
+def cutKey(plug, **kwargs):
+    pass
+
+
+@command
+def keyframe(plug, **kwargs):
+    return None
+
+
+@command
+def playbackOptions(query=False, minTime=False, maxTime=False, **kwargs):
+    return 1.0 if minTime else 120.0
+
+
+@command
+def evalDeferred(function, **kwargs):
+    scene.deferred.append(function)
+
+
+@command
+def undoInfo(openChunk=False, closeChunk=False, **kwargs):
+    if openChunk:
+        recorder.open_chunk()
+    elif closeChunk:
+        recorder.close_chunk()
+
+
+@command
+def undo(**kwargs):
+    pass
+
+
+@command
+def about(version=False, **kwargs):
+    return '2025'
+
+
+@command
+def loadPlugin(path, **kwargs):
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    module.initializePlugin(MObject(None))
+    scene.plugins[name] = module
+
+
+@command
+def unloadPlugin(name, **kwargs):
+    scene.plugins.pop(name).uninitializePlugin(MObject(None))
+
+
+@command
+def pluginInfo(name, query=False, loaded=False, **kwargs):
+    return name in scene.plugins
+
+
+@command
+def file_(*args, new=False, force=False, **kwargs):
+    if new:
+        reset()
+
+
+# Commands registered by MFnPlugin.registerCommand
+def plugin_command(name, creator):
+    def run(*args):
+        recorder.record(f'cmds.{name}', undoable=True)
+        creator().doIt(args)
+    run.__name__ = name
+    return run
+
+
+# ---------------------------------------------------------------------------
+# maya.api.OpenMaya
+
+def api(name, cost=None):
+    recorder.record(name, cost)
+
+
+class MFn:
+    kDagNode = 'kDagNode'
+    kDependencyNode = 'kDependencyNode'
+    kNumericAttribute = 'kNumericAttribute'
+    kTypedAttribute = 'kTypedAttribute'
+    kEnumAttribute = 'kEnumAttribute'
+    kUnitAttribute = 'kUnitAttribute'
+    kAnimCurve = 'kAnimCurve'
+
+
+# Node (FakeNode) or attribute ((FakeNode, name)) object
+class MObject:
+    def __init__(self, item=None):
+        self.item = item
+
+    def hasFn(self, kind):
+        if isinstance(self.item, FakeNode):
+            return (kind == MFn.kDependencyNode or (kind == MFn.kDagNode and self.item.dag)
+                    or (kind == MFn.kAnimCurve and self.item.type.startswith('animCurve')))
+        if isinstance(self.item, tuple):
+            node, attribute = self.item
+            if isinstance(node.attributes.get(attribute), str):
+                return kind == MFn.kTypedAttribute
+            return kind == MFn.kNumericAttribute
+        return False
+
+    def isNull(self):
+        return self.item is None
+
+    def __eq__(self, other):
+        return isinstance(other, MObject) and self.item is other.item
+
+    def __hash__(self):
+        return id(self.item)
+
+
+class MObjectHandle:
+    def __init__(self, mobject):
+        self.mobject = mobject
+
+    def isValid(self):
+        return self.mobject.item is not None and self.mobject.item.alive
+
+    def isAlive(self):
+        return self.isValid()
+
+    def object(self):
+        return self.mobject
+
+
+class MSelectionList:
+    def __init__(self):
+        self.items = []
+
+    def add(self, name):
+        api('MSelectionList.add')
+        node = scene.find(name)
+        if node is None:
+            raise RuntimeError(f'kInvalidParameter: Object does not exist: {name}')
+        self.items.append((node, name.split('.', 1)[1] if '.' in name.split('|')[-1] else None))
+        return self
+
+    def length(self):
+        return len(self.items)
+
+    def getDependNode(self, index):
+        return MObject(self.items[index][0])
+
+    def getPlug(self, index):
+        node, attribute = self.items[index]
+        if attribute is None:
+            raise TypeError('not a plug')
+        return MPlug(node, attribute)
+
+
+class MPlug:
+    def __init__(self, node=None, attribute=None):
+        # MPlug(MObject, attribute MObject) as well as the internal form
+        if isinstance(node, MObject):
+            node = node.item
+        if isinstance(attribute, MObject):
+            attribute = attribute.item[1]
+        self.node_item = node
+        self.attribute_name = attribute
+
+    def value(self):
+        return self.node_item.attributes.get(self.attribute_name, 0.0)
+
+    def asDouble(self):
+        api('MPlug.asDouble')
+        return float(self.value())
+
+    def asInt(self):
+        api('MPlug.asInt')
+        return int(self.value())
+
+    def asBool(self):
+        api('MPlug.asBool')
+        return bool(self.value())
+
+    def asString(self):
+        api('MPlug.asString')
+        return str(self.value())
+
+    def asMTime(self):
+        return MTime(self.asDouble())
+
+    def asMAngle(self):
+        return MAngle(self.asDouble())
+
+    def asMDistance(self):
+        return MDistance(self.asDouble())
+
+    def set(self, value):
+        self.node_item.attributes[self.attribute_name] = value
+
+    def attribute(self):
+        return MObject((self.node_item, self.attribute_name))
+
+    def node(self):
+        return MObject(self.node_item)
+
+    def name(self):
+        return f'{self.node_item.name}.{self.attribute_name}'
+
+    @property
+    def isDestination(self):
+        return scene.is_destination(self.node_item, self.attribute_name)
+
+    @property
+    def isNull(self):
+        return self.node_item is None
+
+    def source(self):
+        return MPlug(*scene.source(self.node_item, self.attribute_name))
+
+    @property
+    def isLocked(self):
+        return False
+
+
+class MFnDependencyNode:
+    def __init__(self, mobject=None):
+        self.mobject = mobject
+
+    def name(self):
+        api('MFnDependencyNode.name')
+        return self.mobject.item.name
+
+    def typeName(self):
+        return self.mobject.item.type
+
+    def hasAttribute(self, attribute):
+        api('MFnDependencyNode.hasAttribute')
+        return attribute in self.mobject.item.attributes
+
+    def findPlug(self, attribute, want_networked_plug):
+        api('MFnDependencyNode.findPlug')
+        return MPlug(self.mobject.item, attribute)
+
+
+class MFnDagNode(MFnDependencyNode):
+    def parent(self, index):
+        api('MFnDagNode.parent')
+        return MObject(self.mobject.item.parent)
+
+    def partialPathName(self):
+        api('MFnDagNode.partialPathName')
+        return self.mobject.item.name
+
+    def fullPathName(self):
+        api('MFnDagNode.fullPathName')
+        return self.mobject.item.path()
+
+
+class MFnAttribute:
+    def __init__(self, mobject=None):
+        self.mobject = mobject
+
+
+class MFnNumericData:
+    kBoolean, kInt, kFloat, kDouble, k3Double = range(5)
+
+
+class MFnNumericAttribute(MFnAttribute):
+    def numericType(self):
+        return MFnNumericData.kDouble
+
+
+class MFnUnitAttribute(MFnAttribute):
+    kAngle, kDistance, kTime = range(3)
+
+    def unitType(self):
+        return MFnUnitAttribute.kDistance
+
+
+class MFnTypedAttribute(MFnAttribute):
+    pass
+
+
+class MFnEnumAttribute(MFnAttribute):
+    pass
+
+
+class MFnMatrixAttribute(MFnAttribute):
+    kDouble = 1
+
+
+class MFnCompoundAttribute(MFnAttribute):
+    pass
+
+
+class MDGModifier:
+    def __init__(self):
+        self.operations = []
+        self.previous = []
+        self.deleted = []
+
+    def add_value(self, plug, value):
+        api('MDGModifier.newPlugValue')
+        self.operations.append((plug, value))
+
+    def newPlugValueDouble(self, plug, value):
+        self.add_value(plug, float(value))
+
+    def newPlugValueInt(self, plug, value):
+        self.add_value(plug, int(value))
+
+    def newPlugValueBool(self, plug, value):
+        self.add_value(plug, bool(value))
+
+    def newPlugValueString(self, plug, value):
+        self.add_value(plug, str(value))
+
+    def newPlugValueMTime(self, plug, value):
+        self.add_value(plug, value.value)
+
+    def newPlugValueMAngle(self, plug, value):
+        self.add_value(plug, value.value)
+
+    def newPlugValueMDistance(self, plug, value):
+        self.add_value(plug, value.value)
+
+    def deleteNode(self, mobject):
+        api('MDGModifier.deleteNode')
+        self.deleted.append(mobject.item)
+
+    def doIt(self):
+        api('MDGModifier.doIt', COSTS['MDGModifier.doIt'] + MODIFIER_OPERATION_COST * len(self.operations))
+        self.previous = [(plug, plug.value()) for plug, value in self.operations]
+        for plug, value in self.operations:
+            plug.set(value)
+        for node in self.deleted:
+            scene.delete(node)
+
+    def undoIt(self):
+        api('MDGModifier.undoIt', COSTS['MDGModifier.doIt'] + MODIFIER_OPERATION_COST * len(self.previous))
+        for plug, value in reversed(self.previous):
+            plug.set(value)
+
+
+class MTime:
+    kFilm = 'film'
+    kSeconds = 'seconds'
+
+    def __init__(self, value=0.0, unit=None):
+        # Frames at 24 fps
+        self.value = value * 24.0 if unit == MTime.kSeconds else value
+
+    @staticmethod
+    def uiUnit():
+        return MTime.kFilm
+
+    def asUnits(self, unit):
+        return self.value / 24.0 if unit == MTime.kSeconds else self.value
+
+
+class MAngle:
+    def __init__(self, value=0.0, unit=None):
+        self.value = value
+
+    @staticmethod
+    def uiUnit():
+        return None
+
+    def asUnits(self, unit):
+        return self.value
+
+
+class MDistance(MAngle):
+    pass
+
+
+class MTimeArray(list):
+    pass
+
+
+class MDoubleArray(list):
+    pass
+
+
+class MTypeId:
+    def __init__(self, value):
+        self.value = value
+
+
+class MPxNode:
+    pass
+
+
+class MPxCommand:
+    def __init__(self):
+        pass
+
+
+class MGlobal:
+    kBatch, kInteractive, kLibraryApp, kBaseUIMode = range(4)
+
+    @staticmethod
+    def mayaState():
+        return MGlobal.kBatch
+
+    @staticmethod
+    def displayInfo(message):
+        pass
+
+    @staticmethod
+    def displayWarning(message):
+        pass
+
+
+class MMessage:
+    @staticmethod
+    def removeCallback(callback_id):
+        callbacks.remove(callback_id)
+
+
+class MSceneMessage(MMessage):
+    kAfterOpen = 'afterOpen'
+    kAfterNew = 'afterNew'
+    kBeforeSave = 'beforeSave'
+
+    @staticmethod
+    def addCallback(message, function, client_data=None):
+        return callbacks.add(message, function)
+
+
+class MNodeMessage(MMessage):
+    @staticmethod
+    def addNameChangedCallback(node, function, client_data=None):
+        return callbacks.add('nameChanged', function, client_data, node=node.item)
+
+
+class MDGMessage(MMessage):
+    @staticmethod
+    def addNodeAddedCallback(function, node_type='dependNode', client_data=None):
+        return callbacks.add('nodeAdded', function)
+
+    @staticmethod
+    def addNodeRemovedCallback(function, node_type='dependNode', client_data=None):
+        return callbacks.add('nodeRemoved', function)
+
+
+class MFnPlugin:
+    def __init__(self, mobject, vendor=None, version=None, api_version=None):
+        pass
+
+    def registerNode(self, type_name, type_id, creator, initialize, *args):
+        api('MFnPlugin.registerNode', 500.0)
+
+    def deregisterNode(self, type_id):
+        pass
+
+    def registerCommand(self, name, creator, *args):
+        api('MFnPlugin.registerCommand', 200.0)
+        setattr(sys.modules['maya.cmds'], name, plugin_command(name, creator))
+
+    def deregisterCommand(self, name):
+        delattr(sys.modules['maya.cmds'], name)
+
+
+# ---------------------------------------------------------------------------
+# maya.api.OpenMayaAnim
+
+class MFnAnimCurve:
+    kTangentLinear = 'linear'
+
+    def __init__(self):
+        self.node = None
+
+    def create(self, plug, modifier=None):
+        api('MFnAnimCurve.create')
+        self.node = scene.create_node('animCurveTU', f'{plug.node_item.name}_{plug.attribute_name}')
+        scene.connect(f'{self.node.name}.output', plug.name())
+        return MObject(self.node)
+
+    def addKeys(self, times, values, tangent_in=None, tangent_out=None, *args):
+        api('MFnAnimCurve.addKeys', DEFAULT_API_COST + ANIM_CURVE_KEY_COST * len(times))
+        self.node.attributes['keys'] = list(zip([time.value for time in times], values))
+
+
+# Keys are not undone in the fake scene
+class MAnimCurveChange:
+    def undoIt(self):
+        api('MAnimCurveChange.undoIt')
+
+    def redoIt(self):
+        api('MAnimCurveChange.redoIt')
+
+
+class MAnimMessage(MMessage):
+    @staticmethod
+    def addAnimCurveEditedCallback(function, client_data=None):
+        return callbacks.add('animCurveEdited', function)
+
+
+# ---------------------------------------------------------------------------
+# maya.mel, maya.standalone
+
+def mel_eval(text):
+    # applyAttrPreset evaluates one blendAttr per preset line
+    recorder.record('mel.eval')
+    if text.startswith('applyAttrPreset'):
+        recorder.record('mel.blendAttr', PRESET_LINE_COST * 100)
+
+
+def standalone_initialize(name='python'):
+    pass
+
+
+ANIM_CLASSES = ('MFnAnimCurve', 'MAnimCurveChange', 'MAnimMessage')
+
+
+def install():
+    modules = {name: types.ModuleType(name) for name in (
+        'maya', 'maya.cmds', 'maya.mel', 'maya.standalone', 'maya.api', 'maya.api.OpenMaya',
+        'maya.api.OpenMayaAnim',
+    )}
+
+    this = sys.modules[__name__]
+    for name, value in vars(this).items():
+        if name.startswith('M') and isinstance(value, type) and value.__module__ == __name__:
+            target = 'maya.api.OpenMayaAnim' if name in ANIM_CLASSES else 'maya.api.OpenMaya'
+            setattr(modules[target], name, value)
+    for name, function in commands.items():
+        setattr(modules['maya.cmds'], name, function)
+    modules['maya.mel'].eval = mel_eval
+    modules['maya.standalone'].initialize = standalone_initialize
+
+    modules['maya'].cmds = modules['maya.cmds']
+    modules['maya'].mel = modules['maya.mel']
+    modules['maya'].standalone = modules['maya.standalone']
+    modules['maya'].api = modules['maya.api']
+    modules['maya.api'].OpenMaya = modules['maya.api.OpenMaya']
+    modules['maya.api'].OpenMayaAnim = modules['maya.api.OpenMayaAnim']
+    sys.modules.update(modules)
+    reset()
@@ -0,0 +1,291 @@
+# Offline benchmark of the main Zeus scenarios (no Maya needed).
+#
+# Usage:
+#   python benchmarks/scenario_benchmark.py [--scenario <name>] [--update-baseline]
+#
+# The plug-in runs against the recording fake of the Maya modules
+# (fake_maya), and every scenario reports the number of Maya calls, their
+# modelled cost, the wall time of the Python side and the undo entries it
+# created. Calls, modelled cost and undo entries are deterministic: the
+# script fails when one of them is more than --tolerance over
+# scenario_baseline.json. Scenarios needing NumPy are skipped without it.
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import types
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+PLUGIN_DIRECTORY = os.path.join(os.path.dirname(BENCHMARK_DIRECTORY), 'plug-ins')
+PLUGIN_PATH = os.path.join(PLUGIN_DIRECTORY, 'zeus.py')
+BASELINE_PATH = os.path.join(BENCHMARK_DIRECTORY, 'scenario_baseline.json')
+COMPARED_METRICS = ('calls', 'modelled_ms', 'undo_entries')
+
+sys.path.insert(0, BENCHMARK_DIRECTORY)
+sys.path.insert(0, PLUGIN_DIRECTORY)
+
+import fake_maya
+
+DRAG_STEPS = 100
+# Mouse move events of a drag (seconds)
+DRAG_EVENT_INTERVAL = 1.0 / 60.0
+BAKE_FRAMES = 1000
+
+
+# Fresh scene with the plug-in loaded and a controller without UI.
+# Returns the zeus module.
+def load_plugin():
+    fake_maya.reset()
+    for name in [name for name in sys.modules if name.startswith('zeus')]:
+        del sys.modules[name]
+    # Cold preset cache
+    os.environ['ZEUS_CACHE_DIR'] = tempfile.mkdtemp(prefix='zeus_benchmark_')
+
+    import maya.cmds as cmds
+    cmds.loadPlugin(PLUGIN_PATH)
+
+    # The model throttles its writes on the simulated clock
+    import zeus_model
+    zeus_model.time = types.SimpleNamespace(perf_counter=fake_maya.clock.perf_counter)
+    return sys.modules['zeus']
+
+
+def new_controller():
+    zeus = load_plugin()
+    return zeus.Zeus()
+
+
+def scenario_plugin_load():
+    yield
+    load_plugin()
+    import maya.cmds as cmds
+    cmds.unloadPlugin('zeus')
+
+
+def scenario_create_environment():
+    controller = new_controller()
+    yield
+    controller.create_env_button_action()
+
+
+# Create Environment on a complete rig (nothing to create)
+def scenario_recreate_environment():
+    controller = new_controller()
+    controller.create_env_button_action()
+    fake_maya.process_idle()
+    yield
+    controller.create_env_button_action()
+
+
+# Create Environment on a rig missing its drift node and material
+def scenario_repair_environment():
+    import maya.cmds as cmds
+
+    controller = new_controller()
+    controller.create_env_button_action()
+    fake_maya.process_idle()
+    cmds.delete(controller.model.cloud_drift)
+    cmds.delete('m_RainSG')
+    yield
+    controller.create_env_button_action()
+
+
+def scenario_slider_drag():
+    controller = new_controller()
+    controller.create_env_button_action()
+    fake_maya.process_idle()
+    drags = {
+        'density': lambda step: controller.clouds_density_action(step % 100),
+        'details': lambda step: controller.clouds_aod_action(step % 100),
+        'rain_rate': lambda step: controller.rain_enabled_action(step * 10),
+        'wind_speed': lambda step: controller.wind_speed_action(step * 0.5),
+        'wind_direction': lambda step: controller.wind_direction_action(step / DRAG_STEPS, 'Z'),
+    }
+    yield
+    for drag in drags.values():
+        controller.slider_pressed_action()
+        for step in range(DRAG_STEPS):
+            drag(step)
+            fake_maya.clock.advance(DRAG_EVENT_INTERVAL)
+            fake_maya.process_idle()
+        controller.slider_released_action()
+
+
+# Lean rain switched on, then a particle budget below the current rate
+def scenario_lean_rain():
+    controller = new_controller()
+    controller.create_env_button_action()
+    fake_maya.process_idle()
+    controller.rain_enabled_action(1000)
+    controller.model.flush_writes()
+    yield
+    controller.rain_lean_action(True)
+    controller.rain_budget_action(1200)
+
+
+# Switching between weather states, then applying the same one again
+def scenario_apply_state():
+    from zeus_states import load_state
+
+    controller = new_controller()
+    controller.create_env_button_action()
+    fake_maya.process_idle()
+    states = [load_state(name) for name in ('clear', 'storm', 'overcast', 'overcast')]
+    yield
+    for state in states:
+        controller.model.apply_state(state)
+
+
+# Scene values read back by the UI while scrubbing (one read per
+# UI_SYNC_INTERVAL, see ZeusUI.sync)
+def scenario_ui_sync():
+    controller = new_controller()
+    controller.create_env_button_action()
+    fake_maya.process_idle()
+    yield
+    for _ in range(DRAG_STEPS):
+        controller.model.capture_state()
+
+
+# Live cost estimate of the UI (the machine scale is read once, the
+# first call in the setup)
+def scenario_cost_estimate():
+    controller = new_controller()
+    controller.create_env_button_action()
+    fake_maya.process_idle()
+    controller.model.estimate_cost()
+    yield
+    for _ in range(DRAG_STEPS):
+        controller.model.estimate_cost()
+
+
+def scenario_bake_timeline():
+    import numpy as np
+
+    controller = new_controller()
+    controller.create_env_button_action()
+    fake_maya.process_idle()
+    frames = np.arange(1, BAKE_FRAMES + 1, dtype=np.float64)
+    schedule = {
+        'frame': frames,
+        'density': 50 + 40 * np.sin(frames / 50),
+        'storminess': (frames > BAKE_FRAMES / 2).astype(np.float64),
+        'details': np.linspace(10, 90, BAKE_FRAMES),
+        'rain_rate': np.clip(1000 * np.sin(frames / 80), 0, None),
+        'wind_speed': 5 + 5 * np.cos(frames / 30),
+        'wind_direction': np.stack([np.cos(frames / 200), np.zeros(BAKE_FRAMES), np.sin(frames / 200)], axis=1),
+    }
+    yield
+    controller.model.bake_timeline(schedule)
+
+
+def scenario_scene_reload():
+    controller = new_controller()
+    controller.create_env_button_action()
+    fake_maya.process_idle()
+    yield
+    fake_maya.scene.reopen()
+    controller.model.set_reference_from_outliner()
+
+
+SCENARIOS = {
+    'plugin_load': (scenario_plugin_load, ()),
+    'create_environment': (scenario_create_environment, ()),
+    'recreate_environment': (scenario_recreate_environment, ()),
+    'repair_environment': (scenario_repair_environment, ()),
+    'slider_drag': (scenario_slider_drag, ()),
+    'lean_rain': (scenario_lean_rain, ()),
+    'apply_state': (scenario_apply_state, ()),
+    'ui_sync': (scenario_ui_sync, ()),
+    'cost_estimate': (scenario_cost_estimate, ()),
+    'bake_timeline': (scenario_bake_timeline, ('numpy',)),
+    'scene_reload': (scenario_scene_reload, ()),
+}
+
+
+# Run the setup of a scenario (up to its yield), then record the rest
+def run_scenario(scenario, verbose=False):
+    # The plug-in logs are only shown with --verbose
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        steps = scenario()
+        next(steps)
+        fake_maya.recorder = fake_maya.Recorder()
+        start = time.perf_counter()
+        for _ in steps:
+            pass
+        fake_maya.process_idle()
+        wall_time = time.perf_counter() - start
+
+    result = fake_maya.recorder.summary()
+    result['wall_ms'] = wall_time * 1000.0
+    return result
+
+
+def missing_modules(modules):
+    missing = []
+    for name in modules:
+        try:
+            __import__(name)
+        except ImportError:
+            missing.append(name)
+    return missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the Zeus scenarios against a recording Maya stand-in')
+    parser.add_argument('--scenario', choices=list(SCENARIOS), action='append', help='run only these scenarios')
+    parser.add_argument('--tolerance', type=float, default=0.05, help='allowed increase over the baseline (ratio)')
+    parser.add_argument('--calls', action='store_true', help='print the calls of every scenario')
+    parser.add_argument('--verbose', action='store_true', help='show the plug-in output')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    fake_maya.install()
+
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        scenario, requirements = SCENARIOS[name]
+        missing = missing_modules(requirements)
+        if missing:
+            print(f'{name}: skipped ({", ".join(missing)} not installed)')
+            continue
+
+        result = results[name] = run_scenario(scenario, args.verbose)
+        print(f'{name}: {result["calls"]} calls, {result["modelled_ms"]:.1f} ms modelled, '
+              f'{result["wall_ms"]:.1f} ms wall, {result["undo_entries"]} undo entries')
+        if args.calls:
+            for call, count in result['by_call'].items():
+                print(f'    {call}: {count}')
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    failed = False
+    if args.update_baseline:
+        for name, result in results.items():
+            baseline[name] = {metric: result[metric] for metric in COMPARED_METRICS}
+        with open(BASELINE_PATH, 'w') as baseline_file:
+            json.dump(baseline, baseline_file, indent=4, sort_keys=True)
+        print(f'Baseline updated: {BASELINE_PATH}')
+    else:
+        for name, result in results.items():
+            for metric in COMPARED_METRICS:
+                if name not in baseline:
+                    continue
+                reference = baseline[name][metric]
+                if result[metric] > reference * (1.0 + args.tolerance) + 1e-9:
+                    print(f'{name}: {metric} regression, {result[metric]:.1f} (baseline {reference:.1f})')
+                    failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# Plug-in startup benchmark.
+#
+# Usage:
+#   mayapy benchmarks/startup_benchmark.py [--runs 10] [--update-baseline]
+#
+# Every run starts a fresh interpreter, initializes Maya standalone and
+# times loadPlugin('zeus.py'). The median is compared with
+# startup_baseline.json and the script fails when it is more than
+# --tolerance slower, when there is no baseline yet, or when the load
+# imported modules that should stay lazy (Qt, NumPy, the UI, the model).
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+PLUGIN_PATH = os.path.join(os.path.dirname(BENCHMARK_DIRECTORY), 'plug-ins', 'zeus.py')
+BASELINE_PATH = os.path.join(BENCHMARK_DIRECTORY, 'startup_baseline.json')
+
+LAZY_MODULES = ('PySide2', 'PySide6', 'numpy', 'zeus_ui', 'zeus_model', 'zeus_timeline')
+
+CHILD_SCRIPT = '''
+import json
+import os
+import sys
+import time
+
+import maya.standalone
+maya.standalone.initialize(name='python')
+import maya.cmds as cmds
+
+plugin_path = sys.argv[1]
+sys.path.insert(0, os.path.dirname(plugin_path))
+lazy_modules = json.loads(sys.argv[2])
+already_loaded = [name for name in lazy_modules if name in sys.modules]
+
+start = time.perf_counter()
+cmds.loadPlugin(plugin_path)
+elapsed = time.perf_counter() - start
+
+imported = [name for name in lazy_modules if name in sys.modules and name not in already_loaded]
+print(json.dumps({'load_time': elapsed, 'imported': imported}))
+'''
+
+
+def run_once(python):
+    output = subprocess.run(
+        [python, '-c', CHILD_SCRIPT, PLUGIN_PATH, json.dumps(LAZY_MODULES)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    # The last line is the result, Maya may print before it
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure the Zeus plug-in load time')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--python', default=sys.executable, help='interpreter to benchmark (mayapy)')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown over the baseline (ratio)')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    results = [run_once(args.python) for _ in range(args.runs)]
+    load_times = [result['load_time'] for result in results]
+    median = statistics.median(load_times)
+    imported = sorted({name for result in results for name in result['imported']})
+
+    print(f'loadPlugin median: {median * 1000:.1f} ms '
+          f'(min {min(load_times) * 1000:.1f} ms, max {max(load_times) * 1000:.1f} ms, {args.runs} runs)')
+
+    failed = False
+    if imported:
+        print(f'Modules imported eagerly: {", ".join(imported)}')
+        failed = True
+
+    if args.update_baseline:
+        with open(BASELINE_PATH, 'w') as baseline_file:
+            json.dump({'load_time': median}, baseline_file, indent=4)
+        print(f'Baseline updated: {BASELINE_PATH}')
+    elif not os.path.exists(BASELINE_PATH):
+        # Load times depend on the host, the baseline is made on the
+        # mayapy host that runs the check
+        print(f'No baseline at {BASELINE_PATH}, run with --update-baseline on this host first')
+        failed = True
+    else:
+        with open(BASELINE_PATH) as baseline_file:
+            baseline = json.load(baseline_file)['load_time']
+        ratio = median / baseline
+        print(f'Baseline: {baseline * 1000:.1f} ms ({ratio:.2f}x)')
+        if ratio > 1.0 + args.tolerance:
+            print('Startup time regression!')
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,47 +1,142 @@
 # Import Maya stuff
-from maya import OpenMaya as om
-from maya import OpenMayaUI as omui
-
-# Import Qt
-try:
-    from PySide2.QtCore import Qt
-    from PySide2.QtWidgets import *
-    from shiboken2 import wrapInstance
-except:
-    from PySide6.QtCore import Qt
-    from PySide6.QtWidgets import *
-    from shiboken6 import wrapInstance
-
-# Manually reloading modules to prevent caching and
-# not having to reopen Autodesk Maya everytime
-import importlib
-import sys
-
-if 'zeus_ui' in sys.modules:
-    importlib.reload(sys.modules['zeus_ui'])
-if 'zeus_model' in sys.modules:
-    importlib.reload(sys.modules['zeus_model'])
-if 'zeus_utils' in sys.modules:
-    importlib.reload(sys.modules['zeus_utils'])
-
-from zeus_ui import ZeusUI
-from zeus_model import ZeusModel
+# (Qt and the UI are only imported when the UI is shown, see Zeus.show_ui,
+# so the plug-in loads quickly in mayapy / batch sessions)
+import maya.api.OpenMaya as om
+
+# Set ZEUS_DEV_RELOAD=1 to reload the Zeus modules when the plug-in is
+# loaded again (not having to reopen Autodesk Maya everytime)
+import zeus_utils
+if zeus_utils.DEV_RELOAD:
+    zeus_utils.reload_modules()
+
+from zeus_handles import COMMAND_CLASSES
+from zeus_nodes import NODE_CLASSES
+from zeus_profile import instrument_class, profiler
+from zeus_rigs import release_rig_registry
 from zeus_utils import *
 
-global plugin_instance
+
+# Tell Maya the plug-in uses the Python API 2.0
+def maya_useNewAPI():
+    pass
+
+plugin_instance = None
 
 class Zeus:
-    def __init__(self, maya_main_window):
+    def __init__(self):
+        from zeus_model import ZeusModel
         self.model = ZeusModel()
-        self.maya_main_window = maya_main_window
+        self.maya_main_window = None
+        self.ui = None
+        self.stats_panel = None
+        self.environment_job = None
+
+        self.callback_ids = [
+            om.MSceneMessage.addCallback(om.MSceneMessage.kAfterOpen, self.on_scene_opened),
+            om.MSceneMessage.addCallback(om.MSceneMessage.kAfterNew, self.on_scene_opened),
+        ]
+        self.time_callback_id = None
+
+    def show_ui(self):
+        from maya import OpenMayaUI as omui
+        try:
+            from PySide2.QtWidgets import QWidget
+            from shiboken2 import wrapInstance
+        except:
+            from PySide6.QtWidgets import QWidget
+            from shiboken6 import wrapInstance
+        from zeus_ui import ZeusUI
+
+        # Get Maya's window pointer
+        maya_main_window_ptr = omui.MQtUtil.mainWindow()
+        self.maya_main_window = wrapInstance(int(maya_main_window_ptr), QWidget)
         self.ui = ZeusUI(self)
         self.ui.show()
 
-    # Create the plugin environment
+        # Keyed weather shows up in the UI while scrubbing
+        if self.time_callback_id is None:
+            self.time_callback_id = om.MDGMessage.addTimeChangeCallback(self.on_time_changed)
+            self.callback_ids.append(self.time_callback_id)
+
+    def close(self):
+        if self.environment_job is not None:
+            self.environment_job.cancel()
+        if self.stats_panel:
+            self.stats_panel.close()
+        if self.ui:
+            self.ui.close()
+        for callback_id in self.callback_ids:
+            om.MMessage.removeCallback(callback_id)
+        self.callback_ids = []
+        self.time_callback_id = None
+        self.model.close()
+
+    def on_scene_opened(self, *args):
+        self.model.on_scene_changed()
+        # Opened scenes get their rig repaired (see ZeusModel.reconcile),
+        # scenes without the rig are left alone
+        if RECONCILE_ON_OPEN and self.model.rigs.rig(self.model.rig_id) is not None:
+            self.model.reconcile()
+        if self.ui:
+            self.ui.request_sync(full=True)
+
+    def on_time_changed(self, *args):
+        if self.ui:
+            self.ui.request_sync()
+
+    # Live profiling stats (see zeus_profile)
+    def show_stats_action(self):
+        from zeus_ui import ZeusStatsPanel
+
+        if self.stats_panel is None:
+            self.stats_panel = ZeusStatsPanel(self)
+        self.stats_panel.show()
+        self.stats_panel.raise_()
+
+    def profiling_action(self, is_toggled):
+        if is_toggled:
+            profiler.enable()
+        else:
+            profiler.disable()
+
+    def profiling_reset_action(self):
+        profiler.reset()
+
+    def profiling_export_action(self, path):
+        profiler.export_trace(path)
+
+    # Create the plugin environment, step by step while Maya is idle
     def create_env_button_action(self):
-        self.model.create_sky()
-        self.model.create_cloud_bank()
-        self.model.create_rain()
+        if self.environment_job is not None and self.environment_job.running:
+            return
+        if self.ui:
+            self.ui.show_progress(0, len(self.model.environment_steps()), 'Creating environment')
+        self.environment_job = self.model.create_environment_deferred(self.create_env_progress,
+                                                                      self.create_env_finished)
+
+    def create_env_cancel_action(self):
+        if self.environment_job is not None:
+            self.environment_job.cancel()
+
+    def create_env_progress(self, done, total, label):
+        if self.ui:
+            self.ui.show_progress(done, total, f'{label} done')
+
+    def create_env_finished(self, completed):
+        self.environment_job = None
+        if self.ui:
+            self.ui.hide_progress()
+            self.ui.request_sync(full=True)
+
+    # Slider drags are buffered by the model and committed as one undo chunk
+    def slider_pressed_action(self):
+        self.model.begin_interaction()
+
+    def slider_released_action(self):
+        self.model.end_interaction()
+        # New cost estimate
+        if self.ui:
+            self.ui.request_sync()
 
     def clouds_density_action(self, value):
         self.model.set_cloud_density(value)
@@ -60,6 +155,7 @@ class Zeus:
 
     def clouds_storminess_action(self, is_toggled):
         self.model.set_cloud_storminess(is_toggled)
+        self.model.flush_writes()
 
     def clouds_aod_action(self, value):
         self.model.set_cloud_details_amount(value)
@@ -70,9 +166,66 @@ class Zeus:
     def clouds_aod_delete_keyframe_action(self):
         self.model.delete_cloud_details_keyframe()
 
+    def clouds_baked_noise_action(self, is_toggled):
+        self.model.set_baked_noise(is_toggled)
+
+    def clouds_quality_action(self, tier):
+        self.model.set_quality_tier(tier)
+
+    # Weather states (see zeus_states)
+    def states_apply_action(self, name):
+        from zeus_states import load_state
+        self.model.apply_state(load_state(name))
+        if self.ui:
+            self.ui.request_sync()
+
+    def states_save_action(self, name):
+        from zeus_states import save_state
+        save_state(name, self.model.capture_state())
+
+    # Blend from the current weather to a state over the playback range
+    def states_blend_action(self, name):
+        import maya.cmds as cmds
+        from zeus_states import load_state
+
+        start = cmds.playbackOptions(query=True, minTime=True)
+        end = cmds.playbackOptions(query=True, maxTime=True)
+        self.model.blend_states(self.model.capture_state(), load_state(name), start, end)
+        if self.ui:
+            self.ui.request_sync()
+
     def rain_enabled_action(self, value):
         self.model.enable_rain(value)
 
+    def rain_lean_action(self, is_toggled):
+        self.model.set_lean_rain(is_toggled)
+
+    def rain_budget_action(self, budget):
+        self.model.set_particle_budget(budget)
+
+    # Rain tiled over size by size and culled from the camera, or the
+    # single emitter
+    def rain_tiles_action(self, enabled, size):
+        self.model.set_rain_tiles(size if enabled else None)
+
+    # The selected meshes become the ground of the rain
+    def rain_ground_action(self, splashes):
+        import maya.cmds as cmds
+
+        meshes = cmds.ls(selection=True, dag=True, type='mesh', noIntermediate=True, long=True)
+        if not meshes:
+            log('Select the ground meshes first')
+            return
+        self.model.set_ground_collision(meshes, splashes)
+
+    def rain_ground_clear_action(self):
+        self.model.set_ground_collision(None)
+
+    def rain_splash_action(self, is_toggled):
+        settings = self.model.get_ground_collision_settings()
+        if settings is not None:
+            self.model.set_ground_collision(settings['meshes'], is_toggled)
+
     def rain_enabled_add_keyframe_action(self):
         self.model.add_rain_enabled_keyframe()
 
@@ -90,6 +243,7 @@ class Zeus:
 
     def wind_direction_action(self, value, axis):
         self.model.set_wind_direction(value, axis)
+        self.model.flush_writes()
 
     def wind_direction_add_keyframe_action(self):
         self.model.add_wind_direction_keyframe()
@@ -97,15 +251,59 @@ class Zeus:
     def wind_direction_delete_keyframe_action(self):
         self.model.delete_wind_direction_keyframe()
 
+    # Quality tier and particle budget for target seconds per frame over
+    # the keyed range (see ZeusModel.auto_tune_cost)
+    def cost_auto_tune_action(self, target):
+        self.model.auto_tune_cost(target)
+        if self.ui:
+            self.ui.request_sync(full=True)
+
+    # Measure the speed of this machine again (see zeus_cost.machine_scale)
+    def cost_calibrate_action(self):
+        from zeus_cost import machine_scale
+
+        machine_scale(recalibrate=True)
+        if self.ui:
+            self.ui.request_sync()
+
+    # Time of day from start_hour to end_hour over the playback range,
+    # or the static sky
+    def sky_time_of_day_action(self, enabled, start_hour, end_hour):
+        self.model.set_time_of_day({'start_hour': start_hour, 'end_hour': end_hour} if enabled else None)
+
+    def wind_field_action(self, is_toggled):
+        self.model.set_wind_field({} if is_toggled else None)
+
+    # Gust and turbulence settings, only applied to an enabled wind field
+    def wind_field_setting_action(self, name, value):
+        settings = self.model.get_wind_field_settings()
+        if settings is not None:
+            self.model.set_wind_field({**settings, name: value})
+
+
+# Every action handler shows up in the profiler
+instrument_class(Zeus, lambda name: name.endswith('_action'))
+
 
 # Initialize the plug-in
 def initializePlugin(mobject):
-    # Get Maya's window pointer
-    maya_main_window_ptr = omui.MQtUtil.mainWindow()
-    maya_main_window = wrapInstance(int(maya_main_window_ptr), QWidget)
-    # Plugin instantiation
-    global plugin_instance
-    plugin_instance = Zeus(maya_main_window)
+    # Register custom nodes and commands
+    plugin_fn = om.MFnPlugin(mobject, PLUGIN_NAME, '1.0', 'Any')
+    for node_class in NODE_CLASSES:
+        plugin_fn.registerNode(node_class.type_name, node_class.type_id,
+                               node_class.creator, node_class.initialize)
+    for command_class in COMMAND_CLASSES:
+        plugin_fn.registerCommand(command_class.command_name, command_class.creator)
+
+    if PROFILE:
+        profiler.enable()
+
+    # Plugin instantiation, the UI only exists in interactive sessions
+    # (batch scripts drive ZeusModel directly, see zeus_batch)
+    if om.MGlobal.mayaState() == om.MGlobal.kInteractive:
+        global plugin_instance
+        plugin_instance = Zeus()
+        plugin_instance.show_ui()
     om.MGlobal.displayInfo(f'[{PLUGIN_NAME}]: Plugin loaded!')
 
 
@@ -114,6 +312,15 @@ def uninitializePlugin(mobject):
     global plugin_instance
     # Free instance memory
     if plugin_instance:
-        plugin_instance.ui.close()
+        plugin_instance.close()
         plugin_instance = None
+    release_rig_registry()
+    profiler.disable()
+
+    # Deregister custom nodes and commands
+    plugin_fn = om.MFnPlugin(mobject)
+    for node_class in NODE_CLASSES:
+        plugin_fn.deregisterNode(node_class.type_id)
+    for command_class in COMMAND_CLASSES:
+        plugin_fn.deregisterCommand(command_class.command_name)
     om.MGlobal.displayInfo(f'[{PLUGIN_NAME}]: Plugin unloaded!')
\ No newline at end of file
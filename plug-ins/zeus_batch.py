@@ -0,0 +1,125 @@
+# Headless entry point for Zeus (mayapy, render farm, batch nodes).
+#
+# Usage:
+#   mayapy zeus_batch.py <scene> <config.json> [--output <scene>]
+#
+# The config is a JSON file like:
+#   {
+#       "density": 40, "storminess": 1, "details": 60,
+#       "rain_rate": 500, "wind_speed": 10, "wind_direction": [1, 0, 0],
+#       "quality_tier": "final", "schedule": "timelapse.csv",
+#       "rig": "default", "cache": true, "baked_noise": false,
+#       "lean_rain": true, "particle_budget": 500000, "rain_tiles": 200,
+#       "wind_field": {"gust_strength": 3, "turbulence_strength": 1},
+#       "ground_collision": {"meshes": ["ground"], "splashes": true},
+#       "time_of_day": {"start_hour": 6, "end_hour": 20, "latitude": 45},
+#       "auto_tune": 60,
+#       "state": "storm", "export": "weather.npz",
+#       "blend": {"from": "clear", "to": "storm", "start": 1, "end": 240}
+#   }
+# "state" is a weather state (library name, file or dict) applied before
+# the other parameters, "blend" animates between two states and "export"
+# writes the per-frame weather of the playback range (see zeus_export).
+# "wind_field" is true for the default gusts and turbulence, or a dict of
+# settings (see DEFAULT_WIND_FIELD). "ground_collision" is a list of
+# meshes the rain stops on, or a dict with the meshes and splashes.
+# "rain_tiles" is the size of the tiled rain area (true for the default),
+# or a dict of size, tile_size and camera, false for the single emitter.
+# "time_of_day" is true for the defaults or a dict of settings (see
+# DEFAULT_TIME_OF_DAY), the sky is baked over the playback range.
+# "auto_tune" picks the quality tier and particle budget keeping every
+# keyed frame under that many seconds (see zeus_cost).
+# Every key is optional, the environment is created if the scene does
+# not have one yet (and repaired if it is incomplete). Nothing here imports Qt.
+import argparse
+import json
+import os
+import sys
+
+PLUGIN_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+if PLUGIN_DIRECTORY not in sys.path:
+    sys.path.insert(0, PLUGIN_DIRECTORY)
+
+
+def initialize_maya():
+    # Only start a standalone session when not already inside Maya
+    # (commands are not available before the initialization)
+    import maya.cmds as cmds
+    if not hasattr(cmds, 'loadPlugin'):
+        import maya.standalone
+        maya.standalone.initialize(name='python')
+
+    if not cmds.pluginInfo('zeus', query=True, loaded=True):
+        cmds.loadPlugin(os.path.join(PLUGIN_DIRECTORY, 'zeus.py'))
+
+
+# ZeusModel on its own, without the UI
+def open_model(rig_id=None):
+    from zeus_model import ZeusModel
+    from zeus_utils import DEFAULT_RIG_ID
+    return ZeusModel(rig_id or DEFAULT_RIG_ID)
+
+
+def apply_config(model, config):
+    # Creates whatever is missing, repairs the rest
+    if config.get('create_environment', True):
+        model.reconcile()
+
+    model.apply_parameters(config)
+    if 'blend' in config:
+        from zeus_states import load_state
+        blend = config['blend']
+        model.blend_states(load_state(blend['from']), load_state(blend['to']), blend['start'], blend['end'])
+    if 'schedule' in config:
+        model.bake_timeline(config['schedule'])
+    # Target seconds per frame, once the weather is final
+    if 'auto_tune' in config:
+        model.auto_tune_cost(config['auto_tune'])
+    # true for the playback range or [start, end]
+    if config.get('cache'):
+        frame_range = config['cache'] if isinstance(config['cache'], list) else (None, None)
+        model.update_rain_cache(*frame_range)
+    if 'export' in config:
+        from zeus_export import export_weather
+        export_weather(model, config['export'])
+
+
+def run(scene, config, output=None):
+    import maya.cmds as cmds
+    from zeus_utils import log
+
+    if isinstance(config, str):
+        with open(config) as config_file:
+            config = json.load(config_file)
+
+    initialize_maya()
+    cmds.file(scene, open=True, force=True)
+
+    model = open_model(config.get('rig'))
+    apply_config(model, config)
+    model.close()
+
+    if output:
+        cmds.file(rename=output)
+    cmds.file(save=True, force=True)
+    log(f'Saved {output or scene}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Create or update a Zeus weather rig without the UI')
+    parser.add_argument('scene', help='scene to open')
+    parser.add_argument('config', help='weather config (JSON)')
+    parser.add_argument('--output', help='save to this scene instead of overwriting the input one')
+    parser.add_argument('--quality-tier', help='cloud quality tier (overrides the config one)')
+    args = parser.parse_args(argv)
+
+    with open(args.config) as config_file:
+        config = json.load(config_file)
+    if args.quality_tier:
+        config['quality_tier'] = args.quality_tier
+
+    run(args.scene, config, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+import bisect
+import glob
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+
+import maya.cmds as cmds
+
+from zeus_utils import *
+
+
+# Disk cache of the rain nParticles of a rig.
+#
+# The rain at frame f only depends on the weather parameters during the
+# particle lifespan before f (the preroll), so every cached frame is
+# stored with a signature hashing the parameter values and keyframes that
+# affect that window. Updating the cache compares the signatures: frames
+# that did not change are reused, the others are simulated again (only
+# the changed ranges, with their preroll) and merged into the cache.
+# Anything that changes the simulation adds its attributes to
+# cache_inputs, or its other settings to cache_settings.
+#
+# Frames are Maya nCache files (.mcx), one per frame, with float
+# precision, rather than a custom memory mapped format: the nParticles
+# play them back natively through a cacheFile node saved with the scene,
+# so renders and farm tasks read the cache without the plug-in, and
+# frames are still replaced one file at a time. The cloud container uses a procedural (gradient) density and is not
+# simulated, it has nothing to cache.
+class ZeusCacheManager:
+    def __init__(self, model):
+        self.model = model
+        self.hits = 0
+        self.misses = 0
+
+    def cache_directory(self):
+        return workspace_cache_directory(self.model.rig_id, 'rain')
+
+    def cache_name(self):
+        return self.model.rain_particles_shape.split('|')[-1].replace(':', '_')
+
+    # Frames needed before f to rebuild the rain at f
+    def preroll_frames(self):
+        lifespan = cmds.getAttr(f'{self.model.rain_particles_shape}.lifespan')
+        return int(math.ceil(lifespan * frames_per_second())) + 1
+
+    # (label, plug) of every attribute the rain simulation depends on,
+    # animated or not. Labels keep the signatures of renamed nodes.
+    def cache_inputs(self):
+        nodes = self.model.nodes
+        rate_key, rate_attribute = self.model.rain_rate_target()
+        inputs = [(rate_key, rate_attribute), ('nucleus', 'windSpeed')]
+        inputs += [('nucleus', f'windDirection{axis}') for axis in ('X', 'Y', 'Z')]
+        inputs += [('nucleus', 'gravity'), ('nucleus', 'airDensity'),
+                   ('rain_particles_shape', 'lifespan'), ('rain_particles_shape', 'drag'),
+                   ('rain_particles_shape', 'maxCount')]
+
+        # Where the rain is emitted from
+        emitter_key = 'rain_tiles' if nodes.contains('rain_tiles') else 'rain_emitter'
+        for key in ('group', emitter_key):
+            inputs += [(key, f'{channel}{axis}') for channel in ('translate', 'rotate', 'scale')
+                       for axis in ('X', 'Y', 'Z')]
+        # Gusts of the wind field (see zeus_wind)
+        if nodes.contains('wind_container') and nodes.contains('cloud_drift'):
+            inputs += [('cloud_drift', f'gust{axis}') for axis in ('X', 'Y', 'Z')]
+        # Tile rates (see ZeusRainCullerNode)
+        if nodes.contains('rain_culler'):
+            inputs += [('rain_culler', attribute)
+                       for attribute in ('maxDistance', 'cullRate', 'rateScale', 'particleBudget')]
+
+        inputs = [(f'{key}.{attribute}', f'{nodes.name(key)}.{attribute}') for key, attribute in inputs]
+        # The culling follows the camera
+        if nodes.contains('rain_culler'):
+            cameras = cmds.listConnections(f'{nodes.name("rain_culler")}.cameraMatrix', source=True,
+                                           destination=False, shapes=True) or []
+            for camera in cameras[:1]:
+                transform = cmds.listRelatives(camera, parent=True, fullPath=True)[0]
+                inputs += [(f'camera.{attribute}', f'{camera}.{attribute}')
+                           for attribute in ('focalLength', 'horizontalFilmAperture', 'verticalFilmAperture')]
+                inputs += [(f'camera.{channel}{axis}', f'{transform}.{channel}{axis}')
+                           for channel in ('translate', 'rotate') for axis in ('X', 'Y', 'Z')]
+        return inputs
+
+    # Whatever else the simulation depends on: the settings stored on
+    # the rig group and the ground the rain collides with
+    def cache_settings(self):
+        settings = [
+            self.model.get_particle_budget(),
+            bool(self.model.get_lean_rain()),
+            json.dumps(self.model.get_wind_field_settings(), sort_keys=True),
+            len(cmds.listRelatives(self.model.rain_tiles, children=True) or [])
+            if self.model.nodes.contains('rain_tiles') else 0,
+        ]
+        ground = self.model.get_ground_collision_settings()
+        if ground is not None:
+            from zeus_collision import ground_signature
+            settings += [json.dumps(ground, sort_keys=True), ground_signature(ground['meshes'])]
+        return settings
+
+    def frame_signatures(self, start, end):
+        preroll = self.preroll_frames()
+
+        # Unanimated values are the same for every frame, animated ones
+        # are described by their keys (time, value and tangents)
+        static = [self.model.rig_id, preroll, self.cache_settings()]
+        curves = []
+        for label, name in self.cache_inputs():
+            times = cmds.keyframe(name, query=True, timeChange=True)
+            if not times:
+                static.append((label, round(cmds.getAttr(name), 6)))
+                continue
+            values = cmds.keyframe(name, query=True, valueChange=True)
+            tangents = cmds.keyTangent(name, query=True, inAngle=True, outAngle=True,
+                                       inWeight=True, outWeight=True)
+            tangents = [tangents[i:i + 4] for i in range(0, len(tangents), 4)]
+            curves.append((times, [repr((time, value, tangent)) for time, value, tangent
+                                   in zip(times, values, tangents)]))
+
+        base = hashlib.sha1(repr(static).encode())
+        signatures = {}
+        for frame in range(start, end + 1):
+            signature = base.copy()
+            for times, keys in curves:
+                # Keys inside the window plus the ones bounding it
+                first = max(bisect.bisect_left(times, frame - preroll) - 1, 0)
+                last = bisect.bisect_right(times, frame) + 1
+                signature.update('|'.join(keys[first:last]).encode())
+            signatures[frame] = signature.hexdigest()[:16]
+        return signatures
+
+    def manifest_path(self):
+        return os.path.join(self.cache_directory(), 'manifest.json')
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path()):
+            return {}
+        with open(self.manifest_path()) as manifest_file:
+            return {int(frame): signature for frame, signature in json.load(manifest_file).items()}
+
+    def save_manifest(self, signatures):
+        with open(self.manifest_path(), 'w') as manifest_file:
+            json.dump(signatures, manifest_file, indent=0)
+
+    def frame_file(self, directory, frame):
+        return os.path.join(directory, f'{self.cache_name()}Frame{frame}.mcx')
+
+    # Bring the cache up to date for start-end and attach it.
+    # simulator(manager, ranges, directory) can replace the serial
+    # simulation of the stale ranges (see zeus_simulate).
+    # Returns the number of reused and simulated frames.
+    def update(self, start=None, end=None, simulator=None):
+        if start is None:
+            start = int(cmds.playbackOptions(query=True, minTime=True))
+        if end is None:
+            end = int(cmds.playbackOptions(query=True, maxTime=True))
+
+        directory = self.cache_directory()
+        os.makedirs(directory, exist_ok=True)
+
+        signatures = self.frame_signatures(start, end)
+        manifest = self.load_manifest()
+        stale = [
+            frame for frame, signature in signatures.items()
+            if manifest.get(frame) != signature or not os.path.exists(self.frame_file(directory, frame))
+        ]
+        hits = len(signatures) - len(stale)
+        self.hits += hits
+        self.misses += len(stale)
+
+        if stale:
+            # The simulation has to run live
+            self.detach()
+            if simulator is None:
+                for range_start, range_end in contiguous_ranges(stale):
+                    self.simulate(range_start, range_end, directory)
+            else:
+                simulator(self, contiguous_ranges(stale), directory)
+            manifest.update({frame: signatures[frame] for frame in stale})
+            self.save_manifest(manifest)
+
+        # The description only covers start-end: every frame of it is on
+        # disk and up to date, the other frames of the manifest may have
+        # gaps or older signatures. An attached cache of another range is
+        # replaced.
+        cache_nodes = self.cache_nodes()
+        if cache_nodes and (cmds.getAttr(f'{cache_nodes[0]}.sourceStart'),
+                            cmds.getAttr(f'{cache_nodes[0]}.sourceEnd')) != (start, end):
+            self.detach()
+        if stale or not self.cache_nodes():
+            self.write_description(directory, start, end)
+        self.attach(directory)
+        log(f'Rain cache {start}-{end}: {hits} frame(s) reused, {len(stale)} simulated '
+            f'(session: {self.hits} hits, {self.misses} misses)')
+        return hits, len(stale)
+
+    # Simulate start-end (from start - preroll) and move the frames
+    # into the cache directory
+    def simulate(self, start, end, directory, preroll=None):
+        if preroll is None:
+            preroll = self.preroll_frames()
+        nucleus_start = cmds.getAttr(f'{self.model.nucleus}.startFrame')
+        simulation_start = max(start - preroll, int(nucleus_start))
+
+        temporary_directory = tempfile.mkdtemp(prefix='zeus_rain_')
+        cmds.setAttr(f'{self.model.nucleus}.startFrame', simulation_start)
+        try:
+            cmds.cacheFile(fileName=self.cache_name(), directory=temporary_directory,
+                           cacheableNode=self.model.rain_particles_shape,
+                           startTime=simulation_start, endTime=end,
+                           format='OneFilePerFrame', doubleToFloat=True)
+            merge_frames(temporary_directory, directory, self.cache_name(), start, end)
+            # The description is kept as the template of the merged cache
+            shutil.copy(os.path.join(temporary_directory, self.cache_name() + '.xml'),
+                        os.path.join(directory, self.cache_name() + '.template.xml'))
+        finally:
+            cmds.setAttr(f'{self.model.nucleus}.startFrame', nucleus_start)
+            shutil.rmtree(temporary_directory, ignore_errors=True)
+
+    # Alive particles and world bounding box of the rain at frame, to
+    # compare two simulations of the same frame
+    def rain_stats(self, frame):
+        cmds.currentTime(frame)
+        shape = self.model.rain_particles_shape
+        return {'count': cmds.getAttr(f'{shape}.count'), 'bounds': cmds.exactWorldBoundingBox(shape)}
+
+    # Cache description (xml) covering every cached frame
+    def write_description(self, directory, start, end):
+        write_cache_description(directory, self.cache_name(), start, end)
+
+    def attach(self, directory):
+        if self.cache_nodes():
+            return
+        cmds.cacheFile(attachFile=True, fileName=self.cache_name(), directory=directory,
+                       cacheableNode=self.model.rain_particles_shape)
+
+    def detach(self):
+        cache_nodes = self.cache_nodes()
+        if cache_nodes:
+            cmds.delete(cache_nodes)
+        cmds.setAttr(f'{self.model.rain_particles_shape}.playFromCache', False)
+
+    def cache_nodes(self):
+        return cmds.listConnections(self.model.rain_particles_shape, type='cacheFile') or []
+
+
+# Folder of the caches of a rig in the workspace cache folder, where the
+# scene and the render farm find them
+def workspace_cache_directory(rig_id, *names):
+    workspace = cmds.workspace(query=True, rootDirectory=True)
+    cache_rule = cmds.workspace(fileRuleEntry='fileCache') or 'cache/nCache'
+    return os.path.join(workspace, cache_rule, 'zeus', rig_id, *names)
+
+
+# [3, 4, 5, 9, 10] -> [(3, 5), (9, 10)]
+def contiguous_ranges(frames):
+    ranges = []
+    for frame in sorted(frames):
+        if ranges and frame == ranges[-1][1] + 1:
+            ranges[-1][1] = frame
+        else:
+            ranges.append([frame, frame])
+    return [tuple(frame_range) for frame_range in ranges]
+
+
+# Move the start-end frame files of a cache to another directory
+def merge_frames(source_directory, target_directory, cache_name, start, end):
+    for path in glob.glob(os.path.join(source_directory, f'{cache_name}Frame*.mcx')):
+        match = re.search(r'Frame(\d+)(Tick\d+)?\.mcx$', path)
+        frame = int(match.group(1))
+        # Sub-frame samples (Tick) belong to the interval after their frame
+        last_frame = end - 1 if match.group(2) else end
+        if start <= frame <= last_frame:
+            shutil.move(path, os.path.join(target_directory, os.path.basename(path)))
+
+
+# Write the xml of a cache from its template with the start-end range
+def write_cache_description(directory, cache_name, start, end):
+    with open(os.path.join(directory, cache_name + '.template.xml')) as template_file:
+        description = template_file.read()
+
+    ticks_per_frame = int(round(6000 / frames_per_second()))
+    description = re.sub(r'<time Range="[^"]*"/>',
+                         f'<time Range="{start * ticks_per_frame}-{end * ticks_per_frame}"/>',
+                         description)
+    description = re.sub(r'(StartTime|EndTime)="[^"]*"',
+                         lambda match: f'{match.group(1)}="{(start if match.group(1) == "StartTime" else end) * ticks_per_frame}"',
+                         description)
+    with open(os.path.join(directory, cache_name + '.xml'), 'w') as description_file:
+        description_file.write(description)
+
+
+def fluid_cache_name(fluid_shape):
+    return fluid_shape.split('|')[-1].replace(':', '_')
+
+
+# Bake the grids of a fluid to a cache (one file per frame) and attach it.
+# write_frame(frame) fills the grids for the frame, which are recorded
+# as they are. The frames go to a folder next to directory, moved to it
+# once complete: callers key directory on what they bake, an existing
+# one is the same bake and is reused.
+def bake_fluid_cache(fluid_shape, directory, frames, write_frame):
+    cache_name = fluid_cache_name(fluid_shape)
+    detach_fluid_cache(fluid_shape)
+    if not os.path.exists(os.path.join(directory, cache_name + '.xml')):
+        temporary_directory = directory + '.tmp'
+        shutil.rmtree(temporary_directory, ignore_errors=True)
+        os.makedirs(temporary_directory)
+        current_time = cmds.currentTime(query=True)
+        try:
+            for frame in frames:
+                cmds.currentTime(frame)
+                write_frame(frame)
+                cmds.cacheFile(fileName=cache_name, directory=temporary_directory, cacheableNode=fluid_shape,
+                               startTime=frame, endTime=frame, format='OneFilePerFrame', doubleToFloat=True)
+                # Every frame writes its own description, the first one is the template
+                template_path = os.path.join(temporary_directory, cache_name + '.template.xml')
+                if not os.path.exists(template_path):
+                    os.replace(os.path.join(temporary_directory, cache_name + '.xml'), template_path)
+            write_cache_description(temporary_directory, cache_name, frames[0], frames[-1])
+            shutil.rmtree(directory, ignore_errors=True)
+            os.replace(temporary_directory, directory)
+        finally:
+            cmds.currentTime(current_time)
+            shutil.rmtree(temporary_directory, ignore_errors=True)
+        log(f'Baked {fluid_shape} frames {frames[0]:g}-{frames[-1]:g} to {directory}')
+
+    cmds.cacheFile(attachFile=True, fileName=cache_name, directory=directory, cacheableNode=fluid_shape)
+
+
+def detach_fluid_cache(fluid_shape):
+    cache_nodes = cmds.listConnections(fluid_shape, type='cacheFile') or []
+    if cache_nodes:
+        cmds.delete(cache_nodes)
@@ -0,0 +1,139 @@
+import hashlib
+import math
+import os
+
+import numpy as np
+import maya.api.OpenMaya as om
+
+from zeus_utils import *
+
+
+# Ground collision of the rain without a collision solve.
+# Making the set meshes nucleus colliders costs a collision test of every
+# particle against every triangle on every substep. Instead, the ground
+# meshes are ray cast once from above into a 2D heightfield (the highest
+# surface of every cell), cached on disk and only built again when the
+# meshes change. On every evaluation, the zeusGroundCollision node (see
+# ZeusGroundCollisionNode) finds the cell under each particle with one
+# division and gives the particles under the ground their age as
+# lifespanPP so the solver removes them. The ones that hit emit splashes
+# through a per-point rate.
+
+
+# Dag path of a mesh shape (or of the shape under a transform)
+def mesh_path(mesh):
+    selection = om.MSelectionList()
+    selection.add(mesh)
+    path = selection.getDagPath(0)
+    path.extendToShape()
+    return path
+
+
+# Cheap description of the ground: the topology, bounding box and world
+# matrix of every mesh (no vertex read). Editing, deforming or moving a
+# mesh changes it, so it keys the rain cache (see ZeusCacheManager).
+def ground_signature(meshes):
+    signature = []
+    for mesh in meshes:
+        path = mesh_path(mesh)
+        mesh_fn = om.MFnMesh(path)
+        box = mesh_fn.boundingBox
+        signature.append((path.fullPathName(), mesh_fn.numVertices, mesh_fn.numPolygons,
+                          tuple(box.min), tuple(box.max), tuple(path.inclusiveMatrix())))
+    return signature
+
+
+# Key of the ground seen by the node: the topology and world space
+# points of every mesh (worldMesh data)
+def mesh_data_signature(mesh_objects):
+    signature = hashlib.sha1()
+    for mesh in mesh_objects:
+        mesh_fn = om.MFnMesh(mesh)
+        signature.update(repr((mesh_fn.numVertices, mesh_fn.numPolygons)).encode())
+        signature.update(mesh_points(mesh_fn).tobytes())
+    signature.update(repr((HEIGHTFIELD_CELL_SIZE, HEIGHTFIELD_MAX_RESOLUTION)).encode())
+    return signature.hexdigest()[:16]
+
+
+def mesh_points(mesh_fn):
+    return np.array(mesh_fn.getPoints(), dtype=np.float64)[:, :3]
+
+
+# Height of the highest surface at the center of every (z, x) cell,
+# -inf where there is no ground. The meshes are worldMesh data, their
+# object space is the world.
+def build_heightfield(mesh_objects):
+    mesh_fns = [om.MFnMesh(mesh) for mesh in mesh_objects]
+    points = np.concatenate([mesh_points(mesh_fn) for mesh_fn in mesh_fns])
+    low, high = points.min(axis=0), points.max(axis=0)
+    width = high[0] - low[0]
+    depth = high[2] - low[2]
+    cell_size = max(HEIGHTFIELD_CELL_SIZE, width / HEIGHTFIELD_MAX_RESOLUTION, depth / HEIGHTFIELD_MAX_RESOLUTION)
+    columns = max(int(math.ceil(width / cell_size)), 1)
+    rows = max(int(math.ceil(depth / cell_size)), 1)
+    heights = np.full((rows, columns), -np.inf, dtype=np.float32)
+
+    # Rays going down from above the ground
+    top = high[1] + 1.0
+    distance = high[1] - low[1] + 2.0
+    down = om.MFloatVector(0.0, -1.0, 0.0)
+    for mesh_fn in mesh_fns:
+        accelerator = mesh_fn.autoUniformGridParams()
+        for row in range(rows):
+            z = low[2] + (row + 0.5) * cell_size
+            for column in range(columns):
+                x = low[0] + (column + 0.5) * cell_size
+                hit = mesh_fn.closestIntersection(om.MFloatPoint(x, top, z), down, om.MSpace.kObject, distance,
+                                                  False, accelParams=accelerator)
+                if hit is not None and hit[2] >= 0:
+                    heights[row, column] = max(heights[row, column], hit[0].y)
+
+    return {'heights': heights, 'origin': np.array([low[0], low[2]]), 'cell_size': np.float64(cell_size)}
+
+
+def heightfield_path(key):
+    directory = os.path.join(cache_root(), 'heightfields')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'ground_{key}.npz')
+
+
+# Heightfield of the meshes, built only when not on disk yet
+def load_heightfield(mesh_objects):
+    path = heightfield_path(mesh_data_signature(mesh_objects))
+    if not os.path.exists(path):
+        heightfield = build_heightfield(mesh_objects)
+        # Written next to the final file first, readers never see a partial file
+        temporary_path = path + '.tmp.npz'
+        np.savez(temporary_path, **heightfield)
+        os.replace(temporary_path, path)
+        rows, columns = heightfield['heights'].shape
+        log(f'Sampled the ground into a {columns}x{rows} heightfield: {path}')
+        return heightfield
+    with np.load(path) as stored:
+        return {name: stored[name] for name in stored.files}
+
+
+# Ground height under every (x, y, z) position, -inf outside the heightfield
+def ground_heights(heightfield, positions):
+    heights = heightfield['heights']
+    cells = np.floor((positions[:, (0, 2)] - heightfield['origin']) / heightfield['cell_size']).astype(np.int64)
+    columns, rows = cells[:, 0], cells[:, 1]
+    inside = (rows >= 0) & (rows < heights.shape[0]) & (columns >= 0) & (columns < heights.shape[1])
+
+    result = np.full(len(positions), -np.inf)
+    result[inside] = heights[rows[inside], columns[inside]]
+    return result
+
+
+# Lifespan of every particle and whether it hit the ground: the ones under
+# it get their age, so the solver removes them at its next step. Only the
+# positions and ages are read, never the lifespans written, so giving the
+# result back to the particles does not change it (see
+# ZeusGroundCollisionNode).
+def collide(heightfield, positions, ages, lifespan):
+    lifespans = np.full(len(positions), lifespan)
+    hits = np.zeros(len(positions), dtype=bool)
+    if heightfield is not None and len(ages) == len(positions):
+        hits = positions[:, 1] <= ground_heights(heightfield, positions)
+        lifespans[hits] = ages[hits]
+    return lifespans, hits
@@ -0,0 +1,150 @@
+import json
+import os
+import platform
+import time
+
+from zeus_utils import *
+
+
+# Render and simulation cost of a rig, per frame.
+# The estimate is a linear model of the work the renderer and the solver
+# do: ray marching samples of the cloud container, detail texture
+# evaluations and rain particles. The coefficients (COST_COEFFICIENTS)
+# were measured on a reference workstation and are scaled by the speed
+# of this machine, measured once with a small ray marching loop (on the
+# first auto-tune or from Calibrate, never while the UI is built) and
+# cached on disk.
+
+
+# Seconds of a ray marching loop (transmittance through a density ramp),
+# the best of a few runs
+def micro_benchmark(iterations=COST_BENCHMARK_ITERATIONS):
+    best = None
+    for _ in range(COST_BENCHMARK_REPEATS):
+        start = time.perf_counter()
+        transmittance = 1.0
+        radiance = 0.0
+        for i in range(iterations):
+            density = (i % 97) / 97.0
+            absorbed = transmittance * density * 0.01
+            radiance += absorbed * (1.0 - density * 0.5)
+            transmittance -= absorbed
+            if transmittance < 1e-3:
+                transmittance = 1.0
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def calibration_path():
+    return os.path.join(cache_root(), 'cost_calibration.json')
+
+
+# Calibrations of every machine, read from the cache once per session
+calibrations = None
+
+
+def load_calibrations():
+    path = calibration_path()
+    if not os.path.exists(path):
+        return {}
+    with open(path) as calibration_file:
+        return json.load(calibration_file)
+
+
+# Speed of this machine relative to the reference one (2 is twice as
+# slow). It is measured on first use, or again with recalibrate, and then
+# kept in memory and in the cache. With measure=False an uncalibrated
+# machine counts as the reference instead of running the benchmark.
+def machine_scale(recalibrate=False, measure=True):
+    global calibrations
+
+    if calibrations is None:
+        calibrations = load_calibrations()
+    machine = platform.node()
+    if recalibrate or (measure and machine not in calibrations):
+        seconds = micro_benchmark()
+        calibrations[machine] = seconds / COST_REFERENCE_SECONDS
+        path = calibration_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as calibration_file:
+            json.dump(calibrations, calibration_file, indent=4)
+        log(f'Cost model calibrated: {seconds * 1000:.1f} ms benchmark, {calibrations[machine]:.2f}x the reference')
+    return calibrations.get(machine, 1.0)
+
+
+# Seconds per frame of the clouds, the rain render and the rain
+# simulation (and their total) for the rig parameters:
+#   density, storminess, details, rain_rate: the weather parameters
+#   resolution, initial_sample_rate, extra_sample_rate, quality: the
+#       cloud container sampling
+#   lifespan, particle_budget (0 for unlimited), lean_rain, baked_noise
+def estimate_cost(parameters, scale=1.0):
+    coefficients = COST_COEFFICIENTS
+    samples = (parameters['quality'] * max(parameters['resolution'])
+               * (parameters['initial_sample_rate'] + parameters['extra_sample_rate'])
+               * (0.5 + parameters['density'] / 100.0)
+               * (1.0 + COST_STORM_FACTOR * parameters['storminess']))
+    clouds = coefficients['cloud_sample'] * samples
+    if not parameters['baked_noise']:
+        clouds += coefficients['cloud_texture'] * samples * parameters['details'] / 100.0
+
+    particles = parameters['rain_rate'] * parameters['lifespan']
+    if parameters['particle_budget'] > 0:
+        particles = min(particles, parameters['particle_budget'])
+    per_particle = coefficients['particle_streak' if parameters['lean_rain'] else 'particle_render']
+    rain = per_particle * particles
+    simulation = coefficients['particle_simulation'] * particles
+
+    cost = {
+        'frame': coefficients['frame'] * scale,
+        'clouds': clouds * scale,
+        'rain': rain * scale,
+        'simulation': simulation * scale,
+    }
+    cost['total'] = sum(cost.values())
+    return cost
+
+
+# Seconds per rain particle alive (render and simulation)
+def particle_cost(lean_rain, scale=1.0):
+    coefficients = COST_COEFFICIENTS
+    render = coefficients['particle_streak' if lean_rain else 'particle_render']
+    return (render + coefficients['particle_simulation']) * scale
+
+
+# Cost parameters of a tier, from its fluid settings (see
+# ZeusModel.quality_tier_settings)
+def tier_cost_parameters(settings):
+    return {
+        'resolution': [settings[f'resolution{axis}'] for axis in ('W', 'H', 'D')],
+        'initial_sample_rate': settings['initialSampleRate'],
+        'extra_sample_rate': settings['extraSampleRate'],
+        'quality': settings['quality'],
+    }
+
+
+# Quality tier and particle budget keeping every frame under target
+# seconds. frames is a list of parameters (one per frame), tier_settings
+# gives the fluid settings of a tier. The finest tier is kept when the
+# clouds leave room for the particles of every frame (or at least
+# MINIMUM_AUTO_BUDGET of them), the budget being what is left of the
+# target on the worst frame. Returns (tier, budget, worst seconds).
+def auto_tune(frames, target, tier_settings, scale=1.0):
+    needed = max(parameters['rain_rate'] * parameters['lifespan'] for parameters in frames)
+    per_particle = particle_cost(frames[0]['lean_rain'], scale)
+    tiers = sorted(QUALITY_TIERS, key=lambda tier: QUALITY_TIERS[tier], reverse=True)
+    for tier in tiers:
+        settings = tier_cost_parameters(tier_settings(tier))
+        # Everything but the rain, on the worst frame
+        fixed = max(estimate_cost({**parameters, **settings, 'rain_rate': 0.0}, scale)['total']
+                    for parameters in frames)
+        budget = int((target - fixed) / per_particle)
+        if budget >= min(MINIMUM_AUTO_BUDGET, needed) or tier == tiers[-1]:
+            break
+
+    # Over the target even without rain, keep a single particle
+    budget = max(budget, 1)
+    worst = max(estimate_cost({**parameters, **settings, 'particle_budget': budget}, scale)['total']
+                for parameters in frames)
+    return tier, budget, worst
@@ -0,0 +1,242 @@
+# Per-frame export of the weather of a rig (lighting, comp, audio).
+#
+# Usage:
+#   mayapy zeus_export.py <scene> <output.npz> [--start <frame>] [--end <frame>] [--rig <id>]
+#
+# Every Zeus parameter (in UI units, the same columns as the bake_timeline
+# schedules), the sun and sky intensity and the cloud texture origin are
+# written for every frame of the range. The animation curves are read
+# once through MFnAnimCurve and evaluated for all the frames at once with
+# NumPy, the texture origin is the cumulative sum of the wind velocity
+# and gusts (the trapezoidal integration of the zeusCloudDrift node, in
+# closed form) instead of one drift evaluation per frame. The result is a
+# NumPy .npz file (one array per column), or a Parquet file when pyarrow
+# is installed.
+import argparse
+import os
+import sys
+
+PLUGIN_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+if PLUGIN_DIRECTORY not in sys.path:
+    sys.path.insert(0, PLUGIN_DIRECTORY)
+
+
+# Keys of a time curve as arrays (frames, values, slopes per frame),
+# None when the curve cannot be evaluated in closed form here (weighted
+# tangents, cycling infinity)
+def curve_keys(curve_fn, frames_per_second):
+    import numpy as np
+    import maya.api.OpenMaya as om
+    import maya.api.OpenMayaAnim as oma
+
+    if curve_fn.isWeighted or not curve_fn.isTimeInput:
+        return None
+    if (curve_fn.preInfinityType, curve_fn.postInfinityType) != (oma.MFnAnimCurve.kConstant,) * 2:
+        return None
+
+    unit = om.MTime.uiUnit()
+    count = curve_fn.numKeys
+    keys = {
+        'frames': np.empty(count), 'values': np.empty(count),
+        'in_slopes': np.empty(count), 'out_slopes': np.empty(count),
+        'steps': np.zeros(count, dtype=bool),
+    }
+    step_types = (oma.MFnAnimCurve.kTangentStep, oma.MFnAnimCurve.kTangentStepNext)
+    for index in range(count):
+        keys['frames'][index] = curve_fn.input(index).asUnits(unit)
+        keys['values'][index] = curve_fn.value(index)
+        # Tangent x is in seconds
+        for name, is_in_tangent in (('in_slopes', True), ('out_slopes', False)):
+            x, y = curve_fn.getTangentXY(index, is_in_tangent)
+            keys[name][index] = y / (x * frames_per_second) if x else 0.0
+        keys['steps'][index] = curve_fn.outTangentType(index) in step_types
+    return keys
+
+
+# Cubic Hermite evaluation of curve_keys at every frame (constant
+# before the first key and after the last one)
+def evaluate_keys(keys, frames):
+    import numpy as np
+
+    key_frames = keys['frames']
+    values = keys['values']
+    if len(key_frames) == 1:
+        return np.full(len(frames), values[0])
+
+    segment = np.clip(np.searchsorted(key_frames, frames, side='right') - 1, 0, len(key_frames) - 2)
+    start, end = key_frames[segment], key_frames[segment + 1]
+    length = end - start
+    t = np.clip((frames - start) / length, 0.0, 1.0)
+
+    t2 = t * t
+    t3 = t2 * t
+    result = ((2 * t3 - 3 * t2 + 1) * values[segment]
+              + (t3 - 2 * t2 + t) * length * keys['out_slopes'][segment]
+              + (-2 * t3 + 3 * t2) * values[segment + 1]
+              + (t3 - t2) * length * keys['in_slopes'][segment + 1])
+
+    # Stepped segments hold the value of their first key
+    steps = keys['steps'][segment]
+    result[steps] = values[segment][steps]
+    return result
+
+
+# Values of a plug at every frame: its own value when not driven, the
+# vectorized curve when keyed, or one evaluation per frame for anything
+# else (expressions, driven keys, weighted curves)
+def evaluate_plug(plug, frames, frames_per_second):
+    import numpy as np
+    import maya.api.OpenMaya as om
+    import maya.api.OpenMayaAnim as oma
+
+    source = plug.source()
+    if source.isNull:
+        return np.full(len(frames), plug.asDouble())
+
+    source_node = source.node()
+    if source_node.hasFn(om.MFn.kAnimCurve):
+        keys = curve_keys(oma.MFnAnimCurve(source_node), frames_per_second)
+        if keys is not None:
+            return evaluate_keys(keys, frames)
+
+    unit = om.MTime.uiUnit()
+    values = np.empty(len(frames))
+    for index, frame in enumerate(frames):
+        with om.MDGContextGuard(om.MDGContext(om.MTime(float(frame), unit))):
+            values[index] = plug.asDouble()
+    return values
+
+
+# Integral of the drift wind velocity over the whole frames from
+# startTime covering first-last: (first grid frame, (n, 3) integral).
+# The node sums the trapezoids of the wind velocity from startTime, so
+# an offset is the difference of two cumulative sums.
+def wind_integral(model, first, last, frames_per_second):
+    import numpy as np
+    import maya.api.OpenMaya as om
+
+    start_time = model.nodes.plug('cloud_drift', 'startTime').asMTime().asUnits(om.MTime.uiUnit())
+    first = start_time + np.floor(min(first, start_time) - start_time)
+    last = max(last, start_time)
+    grid = first + np.arange(int(np.ceil(last - first)) + 1)
+
+    speed = evaluate_plug(model.nodes.plug('nucleus', 'windSpeed'), grid, frames_per_second)
+    velocity = np.stack([
+        speed * evaluate_plug(model.nodes.plug('nucleus', f'windDirection{axis}'), grid, frames_per_second)
+        + evaluate_plug(model.nodes.plug('cloud_drift', f'gust{axis}'), grid, frames_per_second)
+        for axis in ('X', 'Y', 'Z')
+    ], axis=1)
+
+    integral = np.zeros_like(velocity)
+    integral[1:] = np.cumsum((velocity[1:] + velocity[:-1]) * 0.5, axis=0) / frames_per_second
+    return first, integral
+
+
+# Texture origin of the drift node at every frame (integer frames)
+def drift_offsets(model, frames, frames_per_second):
+    import numpy as np
+    import maya.api.OpenMaya as om
+
+    start_time = model.nodes.plug('cloud_drift', 'startTime').asMTime().asUnits(om.MTime.uiUnit())
+    scale = model.nodes.plug('cloud_drift', 'scale').asDouble()
+
+    first, integral = wind_integral(model, frames[0], frames[-1], frames_per_second)
+    start_index = int(round(start_time - first))
+    frame_indices = np.clip(np.round(frames - first).astype(np.int64), 0, len(integral) - 1)
+    return -scale * (integral[frame_indices] - integral[start_index])
+
+
+# Columns of the weather at every frame
+def evaluate_weather(model, frames):
+    import numpy as np
+    from zeus_model import edge_dropoff_to_storminess, frequency_ratio_to_details, opacity_bias_to_density
+    from zeus_utils import frames_per_second
+
+    frames = np.asarray(frames, dtype=np.float64)
+    fps = frames_per_second()
+
+    def values(key, attribute):
+        return evaluate_plug(model.nodes.plug(key, attribute), frames, fps)
+
+    columns = {
+        'frame': frames,
+        'density': opacity_bias_to_density(values('cloud_shape', 'opacityInputBias')),
+        'storminess': edge_dropoff_to_storminess(values('cloud_shape', 'edgeDropoff')),
+        'details': frequency_ratio_to_details(values('cloud_shape', 'frequencyRatio')),
+        'rain_rate': values(*model.rain_rate_target()),
+        'wind_speed': values('nucleus', 'windSpeed'),
+    }
+    for axis in ('x', 'y', 'z'):
+        columns[f'wind_direction_{axis}'] = values('nucleus', f'windDirection{axis.upper()}')
+    if model.nodes.contains('physical_sky'):
+        columns['sun_elevation'] = values('physical_sky', 'elevation')
+        columns['sun_azimuth'] = values('physical_sky', 'azimuth')
+        columns['sky_intensity'] = values('physical_sky', 'intensity')
+    if model.nodes.contains('cloud_drift'):
+        offsets = drift_offsets(model, frames, fps)
+        for i, axis in enumerate(('x', 'y', 'z')):
+            columns[f'texture_origin_{axis}'] = offsets[:, i]
+    return columns
+
+
+def write_columns(path, columns):
+    import numpy as np
+
+    if path.lower().endswith('.parquet'):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError('Parquet export needs pyarrow, use a .npz output instead')
+        pyarrow.parquet.write_table(pyarrow.table(columns), path)
+    else:
+        np.savez_compressed(path, **columns)
+
+
+# Export start-end (playback range by default) of the rig to path.
+# Returns the columns.
+def export_weather(model, path, start=None, end=None):
+    import time
+    import numpy as np
+    import maya.cmds as cmds
+    from zeus_utils import log
+
+    if start is None:
+        start = cmds.playbackOptions(query=True, minTime=True)
+    if end is None:
+        end = cmds.playbackOptions(query=True, maxTime=True)
+
+    model.flush_writes()
+    begin = time.perf_counter()
+    columns = evaluate_weather(model, np.arange(start, end + 1, dtype=np.float64))
+    write_columns(path, columns)
+    log(f'Exported {len(columns["frame"])} frames to {path} in {(time.perf_counter() - begin) * 1000:.1f} ms')
+    return columns
+
+
+def run(scene, output, start=None, end=None, rig_id=None):
+    import maya.cmds as cmds
+    from zeus_batch import initialize_maya, open_model
+
+    initialize_maya()
+    cmds.file(scene, open=True, force=True)
+
+    model = open_model(rig_id)
+    export_weather(model, output, start, end)
+    model.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export the per-frame weather of a Zeus rig')
+    parser.add_argument('scene', help='scene to open')
+    parser.add_argument('output', help='.npz (or .parquet with pyarrow) file to write')
+    parser.add_argument('--start', type=float, help='first frame (playback start by default)')
+    parser.add_argument('--end', type=float, help='last frame (playback end by default)')
+    parser.add_argument('--rig', help='weather rig id')
+    args = parser.parse_args(argv)
+
+    run(args.scene, args.output, args.start, args.end, args.rig)
+
+
+if __name__ == '__main__':
+    main()
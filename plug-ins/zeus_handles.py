@@ -0,0 +1,181 @@
+import maya.api.OpenMaya as om
+import maya.cmds as cmds
+
+from zeus_utils import *
+
+
+# Registry of the nodes used by a Zeus rig.
+# Nodes are resolved by name once and kept as MObjectHandles, plugs are
+# cached per node, so reading and writing attributes does not go through
+# Maya name resolution every time. Handles survive renames (names are
+# tracked with a callback) and are resolved again by name when they die,
+# e.g. after a new scene has been opened.
+class ZeusNodeRegistry:
+    __slots__ = ('names', 'handles', 'plugs', 'callback_ids')
+
+    def __init__(self):
+        self.names = {}
+        self.handles = {}
+        self.plugs = {}
+        self.callback_ids = {}
+
+        # Scene reloads invalidate every handle
+        self.callback_ids[None] = [
+            om.MSceneMessage.addCallback(om.MSceneMessage.kAfterOpen, self.on_scene_changed),
+            om.MSceneMessage.addCallback(om.MSceneMessage.kAfterNew, self.on_scene_changed),
+        ]
+
+    def register(self, key, name):
+        self.names[key] = name
+        return self.resolve(key)
+
+    def resolve(self, key):
+        # Forget whatever was resolved before
+        self.handles.pop(key, None)
+        self.remove_node_callbacks(key)
+        for cached_key in [cached_key for cached_key in self.plugs if cached_key[0] == key]:
+            del self.plugs[cached_key]
+
+        selection = om.MSelectionList()
+        try:
+            selection.add(self.names[key])
+        except (KeyError, RuntimeError):
+            return None
+
+        node = selection.getDependNode(0)
+        self.handles[key] = om.MObjectHandle(node)
+        self.callback_ids[key] = [
+            om.MNodeMessage.addNameChangedCallback(node, self.on_name_changed, key)
+        ]
+        return node
+
+    def refresh(self):
+        for key in list(self.names):
+            self.resolve(key)
+
+    def contains(self, key):
+        return self.node(key) is not None
+
+    def node(self, key):
+        handle = self.handles.get(key)
+        if handle is None or not handle.isValid():
+            if key not in self.names or self.resolve(key) is None:
+                return None
+            handle = self.handles[key]
+        return handle.object()
+
+    def name(self, key):
+        node = self.node(key)
+        if node is None:
+            return None
+        if node.hasFn(om.MFn.kDagNode):
+            return om.MFnDagNode(node).partialPathName()
+        return om.MFnDependencyNode(node).name()
+
+    def plug(self, key, attribute):
+        plug = self.plugs.get((key, attribute))
+        handle = self.handles.get(key)
+        if plug is None or handle is None or not handle.isValid():
+            node = self.node(key)
+            if node is None:
+                raise RuntimeError(f'{key} is not part of the scene')
+            plug = om.MFnDependencyNode(node).findPlug(attribute, False)
+            self.plugs[(key, attribute)] = plug
+        return plug
+
+    def on_name_changed(self, node, previous_name, key):
+        self.names[key] = om.MFnDependencyNode(node).name()
+
+    def on_scene_changed(self, *args):
+        self.refresh()
+
+    def remove_node_callbacks(self, key):
+        for callback_id in self.callback_ids.pop(key, []):
+            om.MMessage.removeCallback(callback_id)
+
+    def remove_callbacks(self):
+        for key in list(self.callback_ids):
+            self.remove_node_callbacks(key)
+
+
+# MDGModifiers waiting to be executed by the zeusApplyModifier command
+pending_modifiers = []
+
+
+# Replaces the animation of a plug with a new curve, keys included, as a
+# single modifier for zeusApplyModifier. The previous curve is deleted
+# and the new one created through an MDGModifier, the keys (which an
+# MDGModifier cannot hold) are recorded in an MAnimCurveChange, so undo
+# restores the previous curve as it was.
+class ZeusAnimCurveModifier:
+    def __init__(self, plug, times, values):
+        self.plug = plug
+        self.times = times
+        self.values = values
+        self.modifier = None
+        self.change = None
+
+    def doIt(self):
+        # OpenMayaAnim is only needed to bake curves
+        import maya.api.OpenMayaAnim as oma
+
+        # Redo
+        if self.modifier is not None:
+            self.modifier.doIt()
+            self.change.redoIt()
+            return
+
+        self.modifier = om.MDGModifier()
+        source = self.plug.source()
+        if not source.isNull and source.node().hasFn(om.MFn.kAnimCurve):
+            self.modifier.deleteNode(source.node())
+        curve_fn = oma.MFnAnimCurve()
+        curve_fn.create(self.plug, modifier=self.modifier)
+        self.modifier.doIt()
+
+        self.change = oma.MAnimCurveChange()
+        curve_fn.addKeys(self.times, self.values, oma.MFnAnimCurve.kTangentLinear, oma.MFnAnimCurve.kTangentLinear,
+                         False, self.change)
+
+    def undoIt(self):
+        self.change.undoIt()
+        self.modifier.undoIt()
+
+
+# Undoable command running an MDGModifier (or a ZeusAnimCurveModifier)
+# built by the model, it is what puts the API writes on Maya's undo queue
+class ZeusApplyModifierCommand(om.MPxCommand):
+    command_name = APPLY_MODIFIER_COMMAND
+
+    def __init__(self):
+        super(ZeusApplyModifierCommand, self).__init__()
+        self.modifier = None
+
+    @staticmethod
+    def creator():
+        return ZeusApplyModifierCommand()
+
+    def doIt(self, args):
+        self.modifier = pending_modifiers.pop(0)
+        self.redoIt()
+
+    def redoIt(self):
+        self.modifier.doIt()
+
+    def undoIt(self):
+        self.modifier.undoIt()
+
+    def isUndoable(self):
+        return True
+
+
+def apply_modifier(modifier):
+    # Without the plug-in command (e.g. plain mayapy) writes are not undoable
+    if hasattr(cmds, APPLY_MODIFIER_COMMAND):
+        pending_modifiers.append(modifier)
+        getattr(cmds, APPLY_MODIFIER_COMMAND)()
+    else:
+        modifier.doIt()
+
+
+COMMAND_CLASSES = [ZeusApplyModifierCommand]
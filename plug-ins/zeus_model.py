@@ -1,106 +1,718 @@
+import maya.api.OpenMaya as om
 import maya.cmds as cmds
-import maya.mel as mel
-import numpy as np
 
-import importlib
-import sys
-
-if 'zeus_utils' in sys.modules:
-    importlib.reload(sys.modules['zeus_utils'])
+import json
+import math
+import time
 
+# NumPy, OpenMayaAnim and zeus_timeline are only needed to bake
+# timelines, they are imported when used to keep the plug-in load fast
+from zeus_handles import ZeusAnimCurveModifier, ZeusNodeRegistry, apply_modifier
+from zeus_presets import apply_preset
+from zeus_profile import instrument_class, profiler
+from zeus_rigs import rig_registry
+from zeus_states import ZeusWeatherState, load_state
 from zeus_utils import *
 
+
+# Conversions from the UI parameters to the node attributes,
+# they work both on single values and NumPy arrays
+def density_to_opacity_bias(value):
+    return value / 100 * 0.6
+
+def details_to_frequency_ratio(value):
+    return value / 100 * 3.9 + 0.1
+
+def storminess_to_edge_dropoff(storminess):
+    return CLEAR_EDGE_DROPOFF + (STORMY_EDGE_DROPOFF - CLEAR_EDGE_DROPOFF) * storminess
+
+def storminess_to_transparency(storminess):
+    return CLEAR_TRANSPARENCY + (STORMY_TRANSPARENCY - CLEAR_TRANSPARENCY) * storminess
+
+# And back (see ZeusModel.capture_state)
+def opacity_bias_to_density(value):
+    return value / 0.6 * 100
+
+def frequency_ratio_to_details(value):
+    return (value - 0.1) / 3.9 * 100
+
+def edge_dropoff_to_storminess(value):
+    return (value - CLEAR_EDGE_DROPOFF) / (STORMY_EDGE_DROPOFF - CLEAR_EDGE_DROPOFF)
+
+
+# Runs (label, step) pairs one per idle event of Maya's main thread, so
+# the UI stays responsive and can show the progress between the steps.
+# All the steps go in a single undo chunk, cancelling (or a failing
+# step) undoes the steps already done. Nothing else may write to the
+# scene meanwhile or it would land in the chunk: the UI is disabled and
+# the model holds its writes back (see ZeusModel.environment_running).
+class ZeusDeferredSteps:
+    def __init__(self, steps, progress=None, finished=None):
+        self.steps = steps
+        self.progress = progress
+        self.finished = finished
+        self.index = 0
+        self.running = False
+        self.cancelled = False
+        self.repairs = []
+
+    def start(self):
+        cmds.undoInfo(openChunk=True, chunkName=ENVIRONMENT_CHUNK_NAME)
+        self.running = True
+        cmds.evalDeferred(self.run_next, lowestPriority=True)
+        return self
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run_next(self):
+        if self.cancelled:
+            self.finish(False)
+            return
+
+        label, step = self.steps[self.index]
+        try:
+            self.repairs += step() or []
+        except Exception:
+            self.finish(False)
+            raise
+        self.index += 1
+
+        if self.progress:
+            self.progress(self.index, len(self.steps), label)
+        if self.index < len(self.steps):
+            cmds.evalDeferred(self.run_next, lowestPriority=True)
+        else:
+            self.finish(True)
+
+    def finish(self, completed):
+        self.running = False
+        cmds.undoInfo(closeChunk=True)
+        if not completed and self.index > 0:
+            cmds.undo()
+            log(f'Environment creation cancelled after {self.index}/{len(self.steps)} steps')
+        elif completed:
+            log(f'Environment updated: {", ".join(self.repairs)}' if self.repairs else 'Environment is up to date')
+        if self.finished:
+            self.finished(completed)
+
+
+# Node references are stored in the registry, reading them always
+# gives the current name of the node (even after a rename)
+def node_property(key):
+    return property(
+        lambda self: self.nodes.name(key),
+        lambda self, name: self.rigs.register_node(self.rig_id, key, name)
+    )
+
+
 class ZeusModel:
-    def __init__(self):
-        # If GROUP_NAME group already in the outliner
-        # get the objects references
+    group = node_property('group')
+    skydome = node_property('skydome')
+    skydome_light = node_property('skydome_light')
+    physical_sky = node_property('physical_sky')
+    cloud_container = node_property('cloud_container')
+    cloud_shape = node_property('cloud_shape')
+    cloud_drift = node_property('cloud_drift')
+    rain_emitter = node_property('rain_emitter')
+    rain_tiles = node_property('rain_tiles')
+    rain_culler = node_property('rain_culler')
+    rain_particles = node_property('rain_particles')
+    rain_particles_shape = node_property('rain_particles_shape')
+    nucleus = node_property('nucleus')
+    rain_streak = node_property('rain_streak')
+    rain_instancer = node_property('rain_instancer')
+    wind_container = node_property('wind_container')
+    wind_shape = node_property('wind_shape')
+    rain_splash = node_property('rain_splash')
+    rain_splash_emitter = node_property('rain_splash_emitter')
+    ground_collision = node_property('ground_collision')
+
+    def __init__(self, rig_id=DEFAULT_RIG_ID):
+        # Handles to the rig nodes and plugs, shared by every model
+        # through the scene rig registry (see nodes)
+        self.rig_id = rig_id
+        self.rigs = rig_registry()
+        self.empty_nodes = None
+
+        # Pending attribute writes, flushed in batch (see queue_write)
+        self.pending_writes = {}
+        self.last_flush_time = 0.0
+        self.flush_scheduled = False
+        self.interaction_open = False
+        self.environment_job = None
+        self.cache_manager = None
+        self.noise_volume = None
+        self.wind_field = None
+        self.drift_callback_id = None
+        self.drift_update_scheduled = False
+        self.noise_update_scheduled = False
+        self.noise_stale = False
+        # Read from the rig group when first needed (see get_time_of_day)
+        self.stored_time_of_day = None
+        self.sky_table = None
+        # Read from the rig group when first needed (see get_particle_budget)
+        self.particle_budget = None
+
+        # If the rig group is already in the outliner but not in the
+        # registry (scenes made before rig ids) get the objects references
         # otherwise it will create the group
-        if cmds.objExists(GROUP_NAME):
-            self.set_reference_from_outliner()
-        else:
-            self.group = cmds.group(empty=True, name=GROUP_NAME)
-
-    def set_reference_from_outliner(self):
-        # Check for skydome
-        children = cmds.ls(SKYDOME_OBJECT_NAME, long=True) or []
-        if children:
-            self.skydome = children[0]
-            log('Found ' + self.skydome)
-        else:
-            log('No skydome object found!')
+        if self.rigs.rig(rig_id) is None:
+            group_name = self.object_name(GROUP_NAME)
+            if cmds.objExists(group_name):
+                self.rigs.add_rig(rig_id, group_name)
+                self.set_reference_from_outliner()
+            else:
+                self.rigs.add_rig(rig_id, cmds.group(empty=True, name=group_name))
 
-        # Check for clouds
-        children = cmds.ls(CLOUD_OBJECT_NAME, long=True) or []
-        if children:
-            self.cloud_container = children[0]
-            log('Found ' + self.cloud_container)
-        else:
-            log('No cloud object found!')
+        # Wind key edits update the drift table
+        if self.nodes.contains('cloud_drift'):
+            self.watch_drift_wind()
 
-        # Check for rain emitter
-        children = cmds.ls(RAIN_EMITTER_OBJECT_NAME, long=True) or []
-        if children:
-            self.rain_emitter = children[0]
-            log('Found ' + self.rain_emitter)
-        else:
-            log('No rain emitter object found!')
+    # Registry of the rig nodes, looked up on every access as opening or
+    # creating a scene replaces every registry (see ZeusRigRegistry.scan).
+    # Without the rig in the scene (after File > New, until the
+    # environment is created again) nothing resolves.
+    @property
+    def nodes(self):
+        nodes = self.rigs.rig(self.rig_id)
+        if nodes is None:
+            if self.empty_nodes is None:
+                self.empty_nodes = ZeusNodeRegistry()
+            return self.empty_nodes
+        return nodes
 
-        # Check for rain particles
-        children = cmds.ls(RAIN_PARTICLES_OBJECT_NAME, long=True) or []
-        if children:
-            self.rain_particles = children[0]
-            log('Found ' + self.rain_particles)
-        else:
-            log('No rain particles object found!')
+    # A scene was opened or created: forget the values read from the
+    # previous rig group and the writes meant for it
+    def on_scene_changed(self):
+        self.pending_writes = {}
+        self.noise_volume = None
+        self.wind_field = None
+        self.particle_budget = None
+        self.stored_time_of_day = None
+        self.sky_table = None
+        if self.nodes.contains('cloud_drift'):
+            self.watch_drift_wind()
+
+    # Name of a rig node, the default rig keeps the original names
+    def object_name(self, name):
+        return rig_object_name(name, self.rig_id)
 
-        # Check for nucleus solver
-        children = cmds.ls(NUCLEUS_OBJECT_NAME, long=True) or []
-        if children:
-            self.nucleus = children[0]
-            log('Found ' + self.nucleus)
+    # Register the rig nodes found by name (every node, or only the
+    # given keys)
+    def set_reference_from_outliner(self, keys=None):
+        objects = {
+            self.object_name(SKYDOME_OBJECT_NAME): ('skydome', 'skydome'),
+            self.object_name(CLOUD_OBJECT_NAME): ('cloud_container', 'cloud'),
+            self.object_name(CLOUD_DRIFT_OBJECT_NAME): ('cloud_drift', 'cloud drift'),
+            self.object_name(RAIN_EMITTER_OBJECT_NAME): ('rain_emitter', 'rain emitter'),
+            self.object_name(RAIN_PARTICLES_OBJECT_NAME): ('rain_particles', 'rain particles'),
+            self.object_name(NUCLEUS_OBJECT_NAME): ('nucleus', 'nucleus'),
+        }
+        if keys is not None:
+            objects = {name: value for name, value in objects.items() if value[0] in keys}
+
+        # Look every object up at once and tag it on the rig group
+        found = {}
+        for path in cmds.ls(list(objects), long=True) or []:
+            found.setdefault(path.split('|')[-1], path)
+        for object_name, (key, description) in objects.items():
+            if object_name in found:
+                self.rigs.register_node(self.rig_id, key, found[object_name])
+                log('Found ' + found[object_name])
+            elif keys is None:
+                log(f'No {description} object found!')
+
+        # Attributes live on the shapes
+        if self.nodes.contains('cloud_container') and (keys is None or 'cloud_container' in keys):
+            self.cloud_shape = cmds.listRelatives(self.cloud_container, shapes=True, fullPath=True)[0]
+        if self.nodes.contains('rain_particles') and (keys is None or 'rain_particles' in keys):
+            self.rain_particles_shape = cmds.listRelatives(self.rain_particles, shapes=True, fullPath=True)[0]
+
+    def close(self):
+        self.flush_writes()
+        if self.drift_callback_id is not None:
+            om.MMessage.removeCallback(self.drift_callback_id)
+            self.drift_callback_id = None
+        if self.empty_nodes is not None:
+            self.empty_nodes.remove_callbacks()
+
+    # Environment creation, in steps of (label, method). Every step
+    # compares the rig with what should be in the scene and only creates
+    # or repairs what is missing or wrong, so running them again on a
+    # complete rig costs a few queries and never duplicates nodes.
+    # Steps return the list of what they repaired.
+    def environment_steps(self):
+        return [
+            ('Rig group', self.reconcile_group),
+            ('Sky', self.reconcile_sky),
+            ('Clouds', self.reconcile_clouds),
+            ('Rain', self.reconcile_rain),
+            ('Cloud drift', self.reconcile_cloud_drift),
+            ('Rain material', self.reconcile_rain_material),
+            ('Lean rain', self.reconcile_lean_rain),
+            ('Wind field', self.reconcile_wind_field),
+            ('Ground collision', self.reconcile_ground_collision),
+            ('Connections', self.reconcile_connections),
+        ]
+
+    def create_environment(self):
+        return self.reconcile()
+
+    # Bring the rig in line with its description, safe to call at any
+    # time (scene open, farm task start)
+    def reconcile(self):
+        repairs = []
+        for _, step in self.environment_steps():
+            repairs += step()
+        if repairs:
+            log(f'Rig {self.rig_id} updated: {", ".join(repairs)}')
         else:
-            log('No nucleus object found!')
+            log(f'Rig {self.rig_id} is up to date')
+        return repairs
+
+    def reconcile_group(self):
+        nodes = self.rigs.rig(self.rig_id)
+        if nodes is None or not nodes.contains('group'):
+            self.rigs.add_rig(self.rig_id, cmds.group(empty=True, name=self.object_name(GROUP_NAME)))
+            return ['group']
+
+        # Nodes of the rig not tagged on the group (older scenes)
+        self.particle_budget = None
+        self.stored_time_of_day = None
+        missing = [key for key in RIG_NAMED_KEYS if not self.nodes.contains(key)]
+        if self.nodes.contains('rain_tiles'):
+            missing = [key for key in missing if key != 'rain_emitter']
+        if missing:
+            self.set_reference_from_outliner(missing)
+        return []
+
+    def reconcile_sky(self):
+        if not self.nodes.contains('skydome'):
+            self.create_sky()
+            self.update_time_of_day()
+            return ['sky']
+
+        repairs = []
+        if not self.nodes.contains('skydome_light'):
+            lights = cmds.listRelatives(self.skydome, shapes=True, type='aiSkyDomeLight', fullPath=True)
+            if lights:
+                self.skydome_light = lights[0]
+            else:
+                self.skydome_light = cmds.createNode('aiSkyDomeLight', name='aiSkyDomeLight', parent=self.skydome)
+                repairs.append('skydome light')
+        if not self.nodes.contains('physical_sky'):
+            skies = cmds.listConnections(f'{self.skydome_light}.color', source=True, destination=False,
+                                         type='aiPhysicalSky')
+            if skies:
+                self.physical_sky = skies[0]
+            else:
+                self.create_physical_sky()
+                repairs.append('physical sky')
+                # The new sky follows the time of day too
+                self.update_time_of_day()
+        return repairs
+
+    def reconcile_clouds(self):
+        if not self.nodes.contains('cloud_container'):
+            self.create_cloud_bank()
+            return ['clouds']
+        if not self.nodes.contains('cloud_shape'):
+            shapes = cmds.listRelatives(self.cloud_container, shapes=True, type='fluidShape', fullPath=True)
+            if shapes:
+                self.cloud_shape = shapes[0]
+            else:
+                self.create_cloud_shape()
+                return ['cloud shape']
+        return []
+
+    def reconcile_rain(self):
+        if not self.nodes.contains('rain_particles'):
+            self.create_rain_particles()
+            return ['rain']
+
+        repairs = []
+        if not self.nodes.contains('rain_particles_shape'):
+            self.rain_particles_shape = cmds.listRelatives(self.rain_particles, shapes=True, fullPath=True)[0]
+        if not self.nodes.contains('nucleus'):
+            solvers = cmds.listConnections(self.rain_particles_shape, type='nucleus')
+            if solvers:
+                self.nucleus = solvers[0]
+            else:
+                log(f'{self.rain_particles} has no nucleus solver, delete it to create the rain again')
+
+        # The rain is emitted by the single emitter or by the tiles
+        if not self.nodes.contains('rain_emitter') and not self.nodes.contains('rain_tiles'):
+            self.create_single_rain_emitter()
+            repairs.append('rain emitter')
+        if self.nodes.contains('rain_emitter'):
+            emitters = cmds.listConnections(self.rain_particles_shape, source=True, destination=False,
+                                            type='pointEmitter') or []
+            if self.nodes.name('rain_emitter') not in emitters:
+                cmds.connectDynamic(self.rain_particles, em=self.rain_emitter)
+                repairs.append('rain emission')
+        return repairs
+
+    def reconcile_cloud_drift(self):
+        if self.nodes.contains('cloud_drift'):
+            self.watch_drift_wind()
+            return []
+        if not self.nodes.contains('nucleus') or not self.nodes.contains('cloud_shape'):
+            return []
+        self.create_cloud_drift()
+        return ['cloud drift']
+
+    def reconcile_rain_material(self):
+        if not self.nodes.contains('rain_particles_shape'):
+            return []
+        if cmds.listConnections(self.rain_particles_shape, type='shadingEngine'):
+            return []
+        self.assign_rain_material()
+        return ['rain material']
+
+    def reconcile_lean_rain(self):
+        if not self.nodes.contains('rain_particles_shape') or not self.get_lean_rain():
+            return []
+        if self.nodes.contains('rain_instancer') and self.nodes.contains('rain_streak'):
+            return []
+        self.create_rain_streaks()
+        return ['rain streaks']
+
+    def reconcile_wind_field(self):
+        settings = self.get_wind_field_settings()
+        if settings is None:
+            return []
+
+        repairs = []
+        if not self.nodes.contains('wind_container'):
+            self.create_wind_container()
+            repairs.append('wind field')
+        elif not self.nodes.contains('wind_shape'):
+            self.wind_shape = cmds.listRelatives(self.wind_container, shapes=True, type='fluidShape', fullPath=True)[0]
+        if self.nodes.contains('rain_particles_shape'):
+            particles = cmds.listConnections(self.wind_shape, type='nParticle', shapes=True, fullPath=True) or []
+            if self.nodes.name('rain_particles_shape') not in particles:
+                cmds.connectDynamic(self.rain_particles, fields=self.wind_container)
+                repairs.append('wind field connection')
+        self.attach_wind_field(settings)
+        return repairs
+
+    def reconcile_ground_collision(self):
+        settings = self.get_ground_collision_settings()
+        if settings is None or not self.nodes.contains('rain_particles_shape'):
+            return []
+
+        repairs = []
+        if not self.nodes.contains('ground_collision'):
+            self.create_ground_collision()
+            repairs.append('ground collision')
+        if cmds.getAttr(f'{self.rain_particles_shape}.lifespanMode') != LIFESPAN_MODE_PP_ONLY:
+            cmds.setAttr(f'{self.rain_particles_shape}.lifespanMode', LIFESPAN_MODE_PP_ONLY)
+            repairs.append('rain lifespan')
+        if settings['splashes'] and not self.nodes.contains('rain_splash_emitter'):
+            self.create_rain_splash()
+            repairs.append('rain splash')
+        if self.connect_ground_meshes(settings['meshes']):
+            repairs.append('ground meshes')
+        return repairs
+
+    def reconcile_connections(self):
+        repairs = []
+        for source, destination in self.rig_connections():
+            if not cmds.isConnected(source, destination):
+                cmds.connectAttr(source, destination, force=True)
+                repairs.append(destination)
+
+        # Top level nodes live in the rig group (checked without commands)
+        group = self.nodes.node('group')
+        for key in RIG_GROUPED_KEYS:
+            node = self.nodes.node(key)
+            if node is not None and om.MFnDagNode(node).parent(0) != group:
+                cmds.parent(self.nodes.name(key), self.group)
+                repairs.append(f'{key} parent')
+        return repairs
+
+    # (source, destination) plugs of the rig, for the nodes that exist
+    def rig_connections(self):
+        connections = []
+        if self.nodes.contains('physical_sky') and self.nodes.contains('skydome_light'):
+            connections.append((f'{self.physical_sky}.outColor', f'{self.skydome_light}.color'))
+        if self.nodes.contains('cloud_drift'):
+            connections += self.cloud_drift_connections()
+        if self.nodes.contains('ground_collision') and self.nodes.contains('rain_particles_shape'):
+            connections += self.ground_collision_connections()
+        return connections
+
+    def cloud_drift_connections(self):
+        # Wind inputs (keyframes stay on the nucleus), output to the fluid shape
+        connections = [('time1.outTime', f'{self.cloud_drift}.time')]
+        if self.nodes.contains('nucleus'):
+            connections.append((f'{self.nucleus}.windSpeed', f'{self.cloud_drift}.windSpeed'))
+            connections += [(f'{self.nucleus}.windDirection{axis}', f'{self.cloud_drift}.windDirection{axis}')
+                            for axis in ('X', 'Y', 'Z')]
+        if self.nodes.contains('cloud_shape'):
+            connections.append((f'{self.cloud_drift}.textureOrigin', f'{self.cloud_shape}.textureOrigin'))
+        return connections
+
+    # Same as create_environment, one step per idle event (see
+    # ZeusDeferredSteps). progress(done, total, label) is called after
+    # every step and finished(completed) at the end.
+    def create_environment_deferred(self, progress=None, finished=None):
+        def environment_finished(completed):
+            # Writes held back during the creation
+            self.flush_writes()
+            if finished:
+                finished(completed)
+
+        self.flush_writes()
+        self.environment_job = ZeusDeferredSteps(self.environment_steps(), progress, environment_finished)
+        return self.environment_job.start()
+
+    def environment_running(self):
+        return self.environment_job is not None and self.environment_job.running
+
+    # Set every parameter found in a weather config (same names as the
+    # bake_timeline schedule, wind_direction being a 3-vector)
+    def apply_parameters(self, parameters):
+        # A weather state (name, file or dict) first, the other
+        # parameters override it
+        if 'state' in parameters:
+            state = parameters['state']
+            self.apply_state(ZeusWeatherState.from_dict(state) if isinstance(state, dict) else load_state(state))
+        if 'quality_tier' in parameters:
+            self.set_quality_tier(parameters['quality_tier'])
+        if 'density' in parameters:
+            self.set_cloud_density(parameters['density'])
+        if 'storminess' in parameters:
+            self.set_cloud_storminess(parameters['storminess'])
+        if 'details' in parameters:
+            self.set_cloud_details_amount(parameters['details'])
+        if 'baked_noise' in parameters:
+            self.set_baked_noise(parameters['baked_noise'])
+        if 'particle_budget' in parameters:
+            self.set_particle_budget(parameters['particle_budget'])
+        if 'lean_rain' in parameters:
+            self.set_lean_rain(parameters['lean_rain'])
+        if 'wind_field' in parameters:
+            # true for the default settings, false or null to remove it
+            settings = parameters['wind_field']
+            self.set_wind_field({} if settings is True else settings or None)
+        if 'time_of_day' in parameters:
+            # true for the default settings, false or null for the static sky
+            settings = parameters['time_of_day']
+            self.set_time_of_day({} if settings is True else settings or None)
+        if 'ground_collision' in parameters:
+            # A list of meshes, or a dict of settings (meshes, splashes)
+            settings = parameters['ground_collision']
+            if isinstance(settings, dict):
+                self.set_ground_collision(settings.get('meshes'), settings.get('splashes', False))
+            else:
+                self.set_ground_collision(settings)
+        if 'rain_tiles' in parameters:
+            # The tiled area size, a dict of settings (size, tile_size,
+            # camera), false or null for the single emitter
+            settings = parameters['rain_tiles']
+            if isinstance(settings, dict):
+                self.set_rain_tiles(settings.get('size', RAIN_TILES_AREA_SIZE),
+                                    settings.get('tile_size', RAIN_TILE_SIZE), settings.get('camera', RAIN_TILE_CAMERA))
+            else:
+                self.set_rain_tiles(RAIN_TILES_AREA_SIZE if settings is True else settings)
+        if 'rain_rate' in parameters:
+            self.enable_rain(parameters['rain_rate'])
+        if 'wind_speed' in parameters:
+            self.set_wind_speed(parameters['wind_speed'])
+        if 'wind_direction' in parameters:
+            for value, axis in zip(parameters['wind_direction'], ('X', 'Y', 'Z')):
+                self.set_wind_direction(value, axis)
+        self.flush_writes()
 
     def create_sky(self):
         # Create skydome
-        self.skydome = cmds.createNode('transform', name=SKYDOME_OBJECT_NAME)
-        skydome_light = cmds.createNode('aiSkyDomeLight', name='aiSkyDomeLight', parent=self.skydome)
-        log(SKYDOME_OBJECT_NAME + ' created successfully!')
+        self.skydome = cmds.createNode('transform', name=self.object_name(SKYDOME_OBJECT_NAME))
+        self.skydome_light = cmds.createNode('aiSkyDomeLight', name='aiSkyDomeLight', parent=self.skydome)
+        log(self.skydome + ' created successfully!')
 
+        self.create_physical_sky()
+
+        # Insert in the plugin group
+        cmds.parent(self.skydome, self.group)
+
+    def create_physical_sky(self):
         # Add physical sky
-        physical_sky = cmds.shadingNode('aiPhysicalSky', asTexture=True, name='aiPhysicalSky')
+        self.physical_sky = cmds.shadingNode('aiPhysicalSky', asTexture=True, name='aiPhysicalSky')
 
         # Edit intensity and sky tint attributes
-        cmds.setAttr(f'{physical_sky}.intensity', 3.0)
-        sky_tint_color = (0.32, 0.50, 0.84)
-        cmds.setAttr(f'{physical_sky}.skyTint', *sky_tint_color, type='double3')
+        cmds.setAttr(f'{self.physical_sky}.intensity', SKY_INTENSITY)
+        cmds.setAttr(f'{self.physical_sky}.skyTint', *SKY_TINT, type='double3')
 
         # Connect physical sky to the skydome
-        cmds.connectAttr(f'{physical_sky}.outColor', f'{skydome_light}.color', force=True)
-        log('aiPhysicalSky connected to ' + SKYDOME_OBJECT_NAME + ' successfully!')
-
-        # Insert in the plugin group
-        cmds.parent(self.skydome, self.group)
+        cmds.connectAttr(f'{self.physical_sky}.outColor', f'{self.skydome_light}.color', force=True)
+        log('aiPhysicalSky connected to ' + self.skydome + ' successfully!')
 
     def create_cloud_bank(self):
         # Create cloud fluid container
-        self.cloud_container = cmds.createNode('transform', name=CLOUD_OBJECT_NAME)
-        cloud_container_shape = cmds.createNode('fluidShape', name='cloudContainerShape', parent=self.cloud_container)
+        self.cloud_container = cmds.createNode('transform', name=self.object_name(CLOUD_OBJECT_NAME))
+        self.create_cloud_shape()
 
-        # Load custom preset
-        mel.eval(f'applyAttrPreset "{cloud_container_shape}" "customClouds" 1')
-
-        log(CLOUD_OBJECT_NAME + ' created successfully!')
+        log(self.cloud_container + ' created successfully!')
 
         # Insert in the plugin group
         cmds.parent(self.cloud_container, self.group)
 
+    def create_cloud_shape(self):
+        self.cloud_shape = cmds.createNode('fluidShape', name='cloudContainerShape', parent=self.cloud_container)
+
+        # Load custom preset
+        apply_preset(self.cloud_shape, 'fluidShape', 'customClouds')
+
     def create_rain(self):
-        # Create particle emitter
-        self.rain_emitter = cmds.emitter(
+        self.create_rain_particles()
+        self.create_cloud_drift()
+        self.assign_rain_material()
+
+    def create_rain_particles(self):
+        # Create particle emitter (kept when only the particles are missing)
+        if not self.nodes.contains('rain_emitter') and not self.nodes.contains('rain_tiles'):
+            self.create_single_rain_emitter()
+
+        # Create nParticles (and nucleus solver)
+        self.rain_particles, self.rain_particles_shape = cmds.nParticle(name=self.object_name(RAIN_PARTICLES_OBJECT_NAME))
+        if self.nodes.contains('rain_emitter'):
+            cmds.connectDynamic(self.rain_particles, em=self.rain_emitter)
+
+        # Disable rain by default
+        cmds.setAttr(f'{self.rain_particles_shape}.lifespanMode', LIFESPAN_MODE_CONSTANT)
+        cmds.setAttr(f'{self.rain_particles_shape}.lifespan', 1.5)
+        self.apply_particle_budget()
+
+        # Get a reference to the nucleus solver
+        nucleus = cmds.listConnections(self.rain_particles_shape, type='nucleus')[0]
+        new_nucleus = nucleus != self.nodes.name('nucleus')
+        if new_nucleus:
+            self.nucleus = cmds.rename(nucleus, self.object_name(NUCLEUS_OBJECT_NAME))
+
+        log(self.rain_particles + ' and ' + self.nucleus + ' created successfully!')
+
+        # Put the rain stuff inside the plugin group (see reconcile_connections
+        # for the nodes that were already there)
+        cmds.parent(self.rain_particles, self.group)
+        if new_nucleus:
+            cmds.parent(self.nucleus, self.group)
+
+    def create_single_rain_emitter(self):
+        self.rain_emitter = self.create_rain_emitter(self.object_name(RAIN_EMITTER_OBJECT_NAME))
+
+        # Scale emitter
+        cmds.setAttr(f'{self.rain_emitter}.scaleX', RAIN_EMITTER_SIZE)
+        cmds.setAttr(f'{self.rain_emitter}.scaleY', 0.5)
+        cmds.setAttr(f'{self.rain_emitter}.scaleZ', RAIN_EMITTER_SIZE)
+        cmds.setAttr(f'{self.rain_emitter}.rate', 0)
+
+        log(self.rain_emitter + ' created successfully!')
+        cmds.parent(self.rain_emitter, self.group)
+
+    def assign_rain_material(self):
+        # Create and assign rain material
+        if not cmds.objExists('m_Rain'):
+            rain_material = cmds.shadingNode('aiStandardSurface', asShader=True, name='m_Rain')
+            apply_preset(rain_material, 'aiStandardSurface', 'customRain')
+        else:
+            rain_material = 'm_Rain'
+
+        cmds.select(self.rain_particles)
+        cmds.hyperShade(assign=rain_material)
+
+    def queue_write(self, key, attribute, value):
+        # Only the last value written to an attribute is kept
+        self.pending_writes[(key, attribute)] = value
+
+        # Throttle flushes to WRITE_FLUSH_INTERVAL, whatever arrives in between
+        # is applied by a single deferred flush once Maya is idle
+        if time.perf_counter() - self.last_flush_time >= WRITE_FLUSH_INTERVAL:
+            self.flush_writes()
+        elif not self.flush_scheduled:
+            self.flush_scheduled = True
+            cmds.evalDeferred(self.flush_writes, lowestPriority=True)
+
+    def read_value(self, key, attribute):
+        # Not yet flushed values win over the scene ones
+        if (key, attribute) in self.pending_writes:
+            return self.pending_writes[(key, attribute)]
+        return self.nodes.plug(key, attribute).asDouble()
+
+    def flush_writes(self):
+        self.flush_scheduled = False
+        # Kept until the environment creation is over, outside of its undo chunk
+        if not self.pending_writes or self.environment_running():
+            return
+
+        writes = self.pending_writes
+        self.pending_writes = {}
+        start = time.perf_counter()
+
+        # All the buffered writes go through the cached plugs
+        # and end up in a single undo entry
+        modifier = om.MDGModifier()
+        for (key, attribute), value in writes.items():
+            if isinstance(value, int):
+                modifier.newPlugValueInt(self.nodes.plug(key, attribute), value)
+            else:
+                modifier.newPlugValueDouble(self.nodes.plug(key, attribute), value)
+        apply_modifier(modifier)
+
+        self.last_flush_time = time.perf_counter()
+        if profiler.enabled:
+            profiler.add_writes([f'{self.nodes.name(key)}.{attribute}' for key, attribute in writes],
+                                self.last_flush_time - start)
+
+        # The baked noise follows the settings and the drift (the wind)
+        if any(attribute in NOISE_ATTRIBUTES or attribute.startswith('windDirection') or attribute == 'windSpeed'
+               for _, attribute in writes):
+            self.schedule_noise_update()
+
+    # Bake the noise again once Maya is idle: the flushes (slider steps,
+    # buttons) until then bake once, and never during a drag
+    # (end_interaction schedules it)
+    def schedule_noise_update(self):
+        self.noise_stale = True
+        if not self.noise_update_scheduled and not self.interaction_open:
+            self.noise_update_scheduled = True
+            cmds.evalDeferred(self.deferred_noise_update, lowestPriority=True)
+
+    def deferred_noise_update(self):
+        self.noise_update_scheduled = False
+        if self.interaction_open or not self.noise_stale:
+            return
+
+        # Outside of the undo queue, the bake only follows the settings
+        self.noise_stale = False
+        cmds.undoInfo(stateWithoutFlush=False)
+        try:
+            self.update_baked_noise()
+        finally:
+            cmds.undoInfo(stateWithoutFlush=True)
+
+    def begin_interaction(self):
+        # Group every flush of a slider drag in one undo chunk (not
+        # nested in the one of the environment creation)
+        if not self.interaction_open and not self.environment_running():
+            cmds.undoInfo(openChunk=True, chunkName=UNDO_CHUNK_NAME)
+            self.interaction_open = True
+
+    def end_interaction(self):
+        # Always apply the last value when the drag is released
+        self.flush_writes()
+        if self.interaction_open:
+            cmds.undoInfo(closeChunk=True)
+            self.interaction_open = False
+            if self.noise_stale:
+                self.schedule_noise_update()
+
+    def create_rain_emitter(self, name):
+        emitter = cmds.emitter(
             pos=(0, 0, 0),  # Position of the emitter
             type="volume",  # Emitter type set to "volume"
-            n=RAIN_EMITTER_OBJECT_NAME,  # Emitter name
+            n=name,  # Emitter name
             r=1000,  # Rate: Number of particles emitted per second
             sro=0,  # Start rotation: No initial rotation
             nuv=0,  # No UV tiling
@@ -128,124 +740,669 @@ class ZeusModel:
             drs=0,  # Drag coefficient
             ssz=0  # Size of particles set to 0 (default)
         )
-        self.rain_emitter = self.rain_emitter[0]
+        return emitter[0]
 
-        # Scale emitter
-        cmds.setAttr(f'{self.rain_emitter}.scaleX', 10)
-        cmds.setAttr(f'{self.rain_emitter}.scaleY', 0.5)
-        cmds.setAttr(f'{self.rain_emitter}.scaleZ', 10)
-        cmds.setAttr(f'{self.rain_emitter}.rate', 0)
+    # Split the rain over a grid of emitters covering size_x by size_z,
+    # the tiles the camera cannot see are switched off (or slowed down)
+    # by a zeusRainCuller node, so the simulation cost follows the view
+    # while the rain density on screen stays the same
+    def create_rain_tiles(self, size_x, size_z, tile_size=RAIN_TILE_SIZE, camera=RAIN_TILE_CAMERA,
+                          max_distance=RAIN_TILE_MAX_DISTANCE):
+        if not self.nodes.contains('rain_particles'):
+            raise RuntimeError('The rain has to be created before being tiled')
 
-        log(RAIN_EMITTER_OBJECT_NAME + ' created successfully!')
+        rate_key, rate_attribute = self.rain_rate_target()
+        rate = self.read_value(rate_key, rate_attribute)
+        self.delete_rain_tiles()
 
-        # Create nParticles (and nucleus solver)
-        self.rain_particles = cmds.nParticle(name=RAIN_PARTICLES_OBJECT_NAME)
-        cmds.connectDynamic(self.rain_particles, em=self.rain_emitter)
+        self.rain_tiles = cmds.group(empty=True, name=self.object_name(RAIN_TILES_OBJECT_NAME))
+        cmds.parent(self.rain_tiles, self.group)
 
-        # Get reference to nParticle shape node
-        rain_particles_shape = cmds.listRelatives(self.rain_particles, shapes=True)[0]
+        # Culling node, driven by the camera
+        camera_shape = (cmds.listRelatives(camera, shapes=True, type='camera') or [camera])[0]
+        self.rain_culler = cmds.createNode(RAIN_CULLER_NODE_TYPE, name=self.object_name(RAIN_CULLER_OBJECT_NAME))
+        cmds.connectAttr(f'{camera_shape}.worldMatrix[0]', f'{self.rain_culler}.cameraMatrix')
+        for attribute in ('focalLength', 'horizontalFilmAperture', 'verticalFilmAperture'):
+            cmds.connectAttr(f'{camera_shape}.{attribute}', f'{self.rain_culler}.{attribute}')
+        cmds.setAttr(f'{self.rain_culler}.maxDistance', max_distance)
+        cmds.setAttr(f'{self.rain_culler}.rate', rate)
+        cmds.setAttr(f'{self.rain_culler}.rateScale', (tile_size / RAIN_EMITTER_SIZE) ** 2)
+        cmds.connectAttr(f'{self.rain_particles_shape}.lifespan', f'{self.rain_culler}.lifespan')
+        cmds.setAttr(f'{self.rain_culler}.particleBudget', self.get_particle_budget())
 
-        # Disable rain by default
-        cmds.setAttr(f'{rain_particles_shape}.lifespanMode', 1)  # 1 is for constant lifespan mode
-        cmds.setAttr(f'{rain_particles_shape}.lifespan', 1.5)
+        # Grid of emitters centered on the rig
+        columns = max(1, math.ceil(size_x / tile_size))
+        rows = max(1, math.ceil(size_z / tile_size))
+        for row in range(rows):
+            for column in range(columns):
+                index = row * columns + column
+                emitter = self.create_rain_emitter(self.object_name(f'{RAIN_TILE_OBJECT_NAME}{index}'))
+                emitter = cmds.parent(emitter, self.rain_tiles)[0]
+                cmds.setAttr(f'{emitter}.translate',
+                             (column - (columns - 1) * 0.5) * tile_size, 0, (row - (rows - 1) * 0.5) * tile_size)
+                cmds.setAttr(f'{emitter}.scale', tile_size, 0.5, tile_size)
+                cmds.connectDynamic(self.rain_particles, em=emitter)
 
-        # Get a reference to the nucleus solver
-        self.nucleus = cmds.listConnections(self.rain_particles, type='nucleus')[0]
-        self.nucleus = cmds.rename(self.nucleus, NUCLEUS_OBJECT_NAME)
-
-        # Additional attribute to compute deltaTime for animation purposes
-        cmds.addAttr(self.nucleus, longName="lastFrameTime", attributeType="float", defaultValue=0.0)
-
-        # Create expression to link textureOrigin with nucleus.windSpeed to move clouds
-        # NOTE:
-        # - opposite sign to translate them correctly with the axis
-        # - scaling factor of 0.1
-        expression = f"""
-            float $deltaTime = time - {self.nucleus}.lastFrameTime;
-            
-            {self.cloud_container}.textureOriginX += - $deltaTime * ({self.nucleus}.windSpeed * {self.nucleus}.windDirectionX * 0.1);
-            {self.cloud_container}.textureOriginY += - $deltaTime * ({self.nucleus}.windSpeed * {self.nucleus}.windDirectionY * 0.1);
-            {self.cloud_container}.textureOriginZ += - $deltaTime * ({self.nucleus}.windSpeed * {self.nucleus}.windDirectionZ * 0.1);
-            
-            {self.nucleus}.lastFrameTime = time;
-        """
-        cmds.expression(name="WC:cloudMovementExpression", string=expression, alwaysEvaluate=True)
+                cmds.connectAttr(f'{emitter}.worldMatrix[0]', f'{self.rain_culler}.cell[{index}].cellMatrix')
+                cmds.setAttr(f'{self.rain_culler}.cell[{index}].cellRadius', tile_size * math.sqrt(0.5))
+                cmds.connectAttr(f'{self.rain_culler}.outRate[{index}]', f'{emitter}.rate')
 
-        # Create and assign rain material
-        if not cmds.objExists('m_Rain'):
-            rain_material = cmds.shadingNode('aiStandardSurface', asShader=True, name='m_Rain')
-            mel.eval(f'applyAttrPreset "{rain_material}" "customRain" 1')
+        # The single emitter is replaced by the tiles
+        if self.nodes.contains('rain_emitter'):
+            cmds.delete(self.rain_emitter)
+
+        log(f'{self.rain_tiles} created with {rows * columns} tiles culled from {camera}')
+
+    # Tiled rain over size by size (see create_rain_tiles), a size of 0 or
+    # None goes back to the single emitter with the same rate
+    def set_rain_tiles(self, size, tile_size=RAIN_TILE_SIZE, camera=RAIN_TILE_CAMERA):
+        self.flush_writes()
+        cmds.undoInfo(openChunk=True, chunkName=UNDO_CHUNK_NAME)
+        try:
+            if size:
+                self.create_rain_tiles(size, size, tile_size, camera)
+            elif self.nodes.contains('rain_tiles'):
+                rate = self.read_value('rain_culler', 'rate')
+                self.delete_rain_tiles()
+                self.create_single_rain_emitter()
+                cmds.connectDynamic(self.rain_particles, em=self.rain_emitter)
+                cmds.setAttr(f'{self.rain_emitter}.rate', rate)
+        finally:
+            cmds.undoInfo(closeChunk=True)
+
+    def get_rain_tiles(self):
+        return self.nodes.contains('rain_tiles')
+
+    def delete_rain_tiles(self):
+        if self.nodes.contains('rain_tiles'):
+            cmds.delete(self.rain_tiles)
+        if self.nodes.contains('rain_culler'):
+            cmds.delete(self.rain_culler)
+
+    # Attribute holding the rain rate (the culler feeds the tiles)
+    def rain_rate_target(self):
+        if self.nodes.contains('rain_culler'):
+            return 'rain_culler', 'rate'
+        return 'rain_emitter', 'rate'
+
+    def create_cloud_drift(self):
+        self.cloud_drift = cmds.createNode(CLOUD_DRIFT_NODE_TYPE, name=self.object_name(CLOUD_DRIFT_OBJECT_NAME))
+        cmds.setAttr(f'{self.cloud_drift}.startTime', cmds.playbackOptions(query=True, minTime=True))
+        for source, destination in self.cloud_drift_connections():
+            cmds.connectAttr(source, destination, force=True)
+        self.update_drift_table()
+        self.watch_drift_wind()
+
+        log(self.cloud_drift + ' connected to ' + self.cloud_container + ' successfully!')
+
+    # Wind plugs integrated by the drift node
+    def drift_wind_plugs(self):
+        return ([f'{self.nucleus}.windSpeed']
+                + [f'{self.nucleus}.windDirection{axis}' for axis in ('X', 'Y', 'Z')]
+                + [f'{self.cloud_drift}.gust{axis}' for axis in ('X', 'Y', 'Z')])
+
+    # Cumulative wind of every whole frame of the keyed range into the
+    # drift node (see ZeusCloudDriftNode), so its compute is a lookup
+    # instead of an integration from startTime. Cleared when the wind is
+    # not keyed, the node then integrates the constant wind itself.
+    def update_drift_table(self):
+        if not self.nodes.contains('cloud_drift'):
+            return
+        times = cmds.keyframe(self.drift_wind_plugs(), query=True, timeChange=True)
+        if not times:
+            cmds.setAttr(f'{self.cloud_drift}.offsetTable', [], type='doubleArray')
         else:
-            rain_material = 'm_Rain'
+            from zeus_export import wind_integral
 
-        cmds.select(self.rain_particles)
-        cmds.hyperShade(assign=rain_material)
+            first = min(times + [cmds.playbackOptions(query=True, minTime=True)])
+            last = max(times + [cmds.playbackOptions(query=True, maxTime=True)])
+            first, integral = wind_integral(self, first, last, frames_per_second())
+            cmds.setAttr(f'{self.cloud_drift}.tableStart', first)
+            cmds.setAttr(f'{self.cloud_drift}.offsetTable', integral.ravel().tolist(), type='doubleArray')
+        # The baked noise drifts with the wind
+        self.schedule_noise_update()
 
-        log(RAIN_PARTICLES_OBJECT_NAME + ' and ' + NUCLEUS_OBJECT_NAME + ' created successfully!')
+    def watch_drift_wind(self):
+        import maya.api.OpenMayaAnim as oma
 
-        # Put the rain stuff inside the plugin group
-        cmds.parent(self.rain_emitter, self.group)
-        cmds.parent(self.rain_particles, self.group)
-        cmds.parent(self.nucleus, self.group)
+        if self.drift_callback_id is None:
+            self.drift_callback_id = oma.MAnimMessage.addAnimCurveEditedCallback(self.on_anim_curves_edited)
+
+    # Keys edited in the graph editor (or undone). Only the curves driving
+    # the wind plugs matter, editing any other curve of the scene does
+    # not rebuild the table.
+    def on_anim_curves_edited(self, curves, *args):
+        if not self.nodes.contains('cloud_drift') or not self.nodes.contains('nucleus'):
+            return
+        wind_plugs = [self.nodes.plug('nucleus', 'windSpeed')]
+        wind_plugs += [self.nodes.plug('nucleus', f'windDirection{axis}') for axis in ('X', 'Y', 'Z')]
+        wind_plugs += [self.nodes.plug('cloud_drift', f'gust{axis}') for axis in ('X', 'Y', 'Z')]
+        for curve in curves:
+            output = om.MFnDependencyNode(curve).findPlug('output', False)
+            if any(destination == plug for destination in output.destinations() for plug in wind_plugs):
+                self.schedule_drift_update()
+                return
+
+    # The table is built again once on idle, outside of the undo queue as
+    # it only follows the curves
+    def schedule_drift_update(self):
+        if not self.drift_update_scheduled:
+            self.drift_update_scheduled = True
+            cmds.evalDeferred(self.deferred_drift_update, lowestPriority=True)
+
+    def deferred_drift_update(self):
+        self.drift_update_scheduled = False
+        cmds.undoInfo(stateWithoutFlush=False)
+        try:
+            self.update_drift_table()
+        finally:
+            cmds.undoInfo(stateWithoutFlush=True)
 
     def set_cloud_density(self, value):
-        normalized_value = value / 100
-        cmds.setAttr(f'{self.cloud_container}.opacityInputBias', normalized_value * 0.6)
+        self.queue_write('cloud_shape', 'opacityInputBias', density_to_opacity_bias(value))
 
     def add_cloud_density_keyframe(self):
+        self.flush_writes()
         cmds.setKeyframe(f'{self.cloud_container}.opacityInputBias')
 
     def delete_cloud_density_keyframe(self):
+        self.flush_writes()
         cmds.cutKey(f'{self.cloud_container}.opacityInputBias')
 
-    def set_cloud_storminess(self, is_toggled):
-        if is_toggled:
-            cmds.setAttr(f'{self.cloud_container}.edgeDropoff', 0.499)
-            cmds.setAttr(f'{self.cloud_container}.transparency', 0.01, 0.01, 0.01, type="double3")
+    # 0 (clear) to 1 (stormy), the UI checkbox gives either end
+    def set_cloud_storminess(self, value):
+        storminess = min(max(float(value), 0.0), 1.0)
+        self.queue_write('cloud_shape', 'edgeDropoff', storminess_to_edge_dropoff(storminess))
+        for channel in ('R', 'G', 'B'):
+            self.queue_write('cloud_shape', f'transparency{channel}', storminess_to_transparency(storminess))
+        # The sky darkens with the storm
+        self.update_time_of_day()
+
+    # Sun and sky following the time of day over a frame range (see
+    # zeus_sky). settings overrides DEFAULT_TIME_OF_DAY (start and end
+    # default to the playback range), None goes back to the static sky.
+    def set_time_of_day(self, settings):
+        self.flush_writes()
+        cmds.undoInfo(openChunk=True, chunkName=UNDO_CHUNK_NAME)
+        try:
+            self.write_time_of_day(settings)
+        finally:
+            cmds.undoInfo(closeChunk=True)
+
+    def write_time_of_day(self, settings):
+        if settings is None:
+            self.clear_time_of_day()
+            stored = ''
         else:
-            cmds.setAttr(f'{self.cloud_container}.edgeDropoff', 0.372)
-            cmds.setAttr(f'{self.cloud_container}.transparency', 0.25, 0.25, 0.25, type="double3")
+            settings = {**DEFAULT_TIME_OF_DAY, **settings}
+            if 'start' not in settings:
+                settings['start'] = cmds.playbackOptions(query=True, minTime=True)
+            if 'end' not in settings:
+                settings['end'] = cmds.playbackOptions(query=True, maxTime=True)
+            stored = json.dumps(settings, sort_keys=True)
+
+        if not cmds.attributeQuery(TIME_OF_DAY_ATTRIBUTE, node=self.group, exists=True):
+            cmds.addAttr(self.group, longName=TIME_OF_DAY_ATTRIBUTE, dataType='string')
+        cmds.setAttr(f'{self.group}.{TIME_OF_DAY_ATTRIBUTE}', stored, type='string')
+        self.stored_time_of_day = stored
+        if settings is not None:
+            self.bake_time_of_day()
+
+    # Settings of the time of day, None for a static sky
+    def get_time_of_day(self):
+        if self.stored_time_of_day is None:
+            self.stored_time_of_day = ''
+            if self.group and cmds.attributeQuery(TIME_OF_DAY_ATTRIBUTE, node=self.group, exists=True):
+                self.stored_time_of_day = cmds.getAttr(f'{self.group}.{TIME_OF_DAY_ATTRIBUTE}') or ''
+        return json.loads(self.stored_time_of_day) if self.stored_time_of_day else None
+
+    # Compute the sky table of the frame range, with the storminess of
+    # the clouds on every frame, and bake it on the aiPhysicalSky.
+    # Returns the table.
+    def bake_time_of_day(self, tolerance=BAKE_TOLERANCE):
+        import numpy as np
+        from zeus_export import evaluate_plug
+        from zeus_sky import table_to_attributes, time_of_day_table
+        from zeus_timeline import thin_keys
+
+        settings = self.get_time_of_day()
+        frames = np.arange(settings['start'], settings['end'] + 1, dtype=np.float64)
+        storminess = np.zeros(len(frames))
+        if self.nodes.contains('cloud_shape'):
+            edge_dropoff = evaluate_plug(self.nodes.plug('cloud_shape', 'edgeDropoff'), frames, frames_per_second())
+            storminess = edge_dropoff_to_storminess(edge_dropoff)
+
+        self.sky_table = time_of_day_table(settings, frames, storminess)
+        cmds.undoInfo(openChunk=True, chunkName=UNDO_CHUNK_NAME)
+        try:
+            for attribute, values in table_to_attributes(self.sky_table):
+                keep = thin_keys(frames, values, tolerance)
+                self.write_anim_curve('physical_sky', attribute, frames[keep], values[keep])
+        finally:
+            cmds.undoInfo(closeChunk=True)
+        log(f'Sky baked from {settings["start_hour"]:g}h to {settings["end_hour"]:g}h over {len(frames)} frames')
+        return self.sky_table
+
+    # Bake the sky again (after a storminess change), pending values first
+    def update_time_of_day(self):
+        if self.get_time_of_day() is not None and self.nodes.contains('physical_sky'):
+            self.flush_writes()
+            self.bake_time_of_day()
+
+    def clear_time_of_day(self):
+        self.sky_table = None
+        if not self.nodes.contains('physical_sky'):
+            return
+        for attribute in ('elevation', 'azimuth', 'intensity', 'skyTint', 'sunTint'):
+            cmds.cutKey(f'{self.physical_sky}.{attribute}', clear=True)
+        cmds.setAttr(f'{self.physical_sky}.intensity', SKY_INTENSITY)
+        cmds.setAttr(f'{self.physical_sky}.skyTint', *SKY_TINT, type='double3')
+        cmds.setAttr(f'{self.physical_sky}.sunTint', 1.0, 1.0, 1.0, type='double3')
 
     def add_cloud_storminess_keyframe(self):
+        self.flush_writes()
         cmds.setKeyframe(f'{self.cloud_container}.edgeDropoff')
         cmds.setKeyframe(f'{self.cloud_container}.transparency')
 
     def delete_cloud_storminess_keyframe(self):
+        self.flush_writes()
         cmds.cutKey(f'{self.cloud_container}.edgeDropoff')
         cmds.setKeyframe(f'{self.cloud_container}.transparency')
 
+    # Fluid settings of a quality tier, only the resolution and the
+    # sampling change, the look parameters are left untouched
+    def quality_tier_settings(self, tier):
+        if tier not in QUALITY_TIERS:
+            raise ValueError(f'Unknown quality tier {tier}, expected one of {", ".join(QUALITY_TIERS)}')
+
+        resolution_scale, sample_rate_scale, quality_scale = QUALITY_TIERS[tier]
+        settings = {}
+        for attribute, resolution in zip(('resolutionW', 'resolutionH', 'resolutionD'), CLOUD_RESOLUTION):
+            settings[attribute] = max(1, round(resolution * resolution_scale))
+        settings['initialSampleRate'] = max(1.0, CLOUD_INITIAL_SAMPLE_RATE * sample_rate_scale)
+        settings['extraSampleRate'] = max(0.0, CLOUD_EXTRA_SAMPLE_RATE * sample_rate_scale)
+        settings['quality'] = CLOUD_SHADING_QUALITY * quality_scale
+        return settings
+
+    # Switch the cloud container to a quality tier, either for the
+    # whole scene or only for one render layer (render setup override)
+    def set_quality_tier(self, tier, render_layer=None):
+        settings = self.quality_tier_settings(tier)
+
+        if render_layer:
+            self.add_quality_tier_overrides(tier, settings, render_layer)
+            return
+
+        for attribute, value in settings.items():
+            self.queue_write('cloud_shape', attribute, value)
+        self.flush_writes()
+
+        # Remember the tier on the group (read back by the UI and batch)
+        if not cmds.attributeQuery(QUALITY_TIER_ATTRIBUTE, node=self.group, exists=True):
+            cmds.addAttr(self.group, longName=QUALITY_TIER_ATTRIBUTE, dataType='string')
+        cmds.setAttr(f'{self.group}.{QUALITY_TIER_ATTRIBUTE}', tier, type='string')
+        log(f'Quality tier set to {tier}')
+
+    def get_quality_tier(self):
+        if self.group and cmds.attributeQuery(QUALITY_TIER_ATTRIBUTE, node=self.group, exists=True):
+            return cmds.getAttr(f'{self.group}.{QUALITY_TIER_ATTRIBUTE}') or DEFAULT_QUALITY_TIER
+        return DEFAULT_QUALITY_TIER
+
+    def add_quality_tier_overrides(self, tier, settings, render_layer):
+        import maya.app.renderSetup.model.renderSetup as renderSetup
+
+        layer = renderSetup.instance().getRenderLayer(render_layer)
+
+        # Reuse the Zeus collection of the layer if there is one
+        collection = None
+        for layer_collection in layer.getCollections():
+            if layer_collection.name() == QUALITY_COLLECTION_NAME:
+                collection = layer_collection
+        if collection is None:
+            collection = layer.createCollection(QUALITY_COLLECTION_NAME)
+            collection.getSelector().setPattern(self.cloud_shape)
+
+        overrides = {override.attributeName(): override for override in collection.getOverrides()}
+        for attribute, value in settings.items():
+            override = overrides.get(attribute)
+            if override is None:
+                override = collection.createAbsoluteOverride(self.cloud_shape, attribute)
+            override.setAttrValue(value)
+
+        log(f'Quality tier set to {tier} on render layer {render_layer}')
+
     def set_cloud_details_amount(self, value):
-        normalized_value = value / 100
-        cmds.setAttr(f'{self.cloud_container}.frequencyRatio', normalized_value * 3.9 + 0.1)
+        self.queue_write('cloud_shape', 'frequencyRatio', details_to_frequency_ratio(value))
 
     def add_cloud_details_keyframe(self):
+        self.flush_writes()
         cmds.setKeyframe(f'{self.cloud_container}.frequencyRatio')
 
     def delete_cloud_details_keyframe(self):
+        self.flush_writes()
         cmds.cutKey(f'{self.cloud_container}.frequencyRatio')
 
+    # Replace the procedural detail noise of the clouds by a baked
+    # volume (see zeus_noise), or go back to the procedural texture
+    def set_baked_noise(self, enabled):
+        from zeus_noise import ZeusNoiseVolume
+
+        self.flush_writes()
+        was_baked = self.get_baked_noise()
+        if not cmds.attributeQuery(BAKED_NOISE_ATTRIBUTE, node=self.group, exists=True):
+            cmds.addAttr(self.group, longName=BAKED_NOISE_ATTRIBUTE, attributeType='bool')
+        cmds.setAttr(f'{self.group}.{BAKED_NOISE_ATTRIBUTE}', bool(enabled))
+
+        if enabled:
+            self.update_baked_noise()
+        elif was_baked:
+            (self.noise_volume or ZeusNoiseVolume(self)).detach()
+            self.noise_volume = None
+
+    def get_baked_noise(self):
+        if self.group and cmds.attributeQuery(BAKED_NOISE_ATTRIBUTE, node=self.group, exists=True):
+            return cmds.getAttr(f'{self.group}.{BAKED_NOISE_ATTRIBUTE}')
+        return False
+
+    # Bake again if the settings or the drift changed (the volumes and
+    # the shifted frames are cached on disk)
+    def update_baked_noise(self):
+        from zeus_noise import ZeusNoiseVolume
+
+        if not self.nodes.contains('cloud_shape') or not self.get_baked_noise():
+            return
+        if self.noise_volume is None:
+            self.noise_volume = ZeusNoiseVolume(self)
+        self.noise_volume.update()
+
     def enable_rain(self, value):
-        cmds.setAttr(f'{self.rain_emitter}.rate', value)
+        self.queue_write(*self.rain_rate_target(), self.budget_rain_rate(float(value)))
+
+    # Rate of the single emitter within the particle budget (particles
+    # alive at once are rate * lifespan). The culler of the rain tiles
+    # scales its own rates, they are left alone.
+    def budget_rain_rate(self, rate):
+        limit = self.rain_rate_limit()
+        return rate if limit is None else min(rate, limit)
+
+    def rain_rate_limit(self):
+        if self.nodes.contains('rain_culler') or not self.nodes.contains('rain_particles_shape'):
+            return None
+        budget = self.get_particle_budget()
+        lifespan = self.read_value('rain_particles_shape', 'lifespan')
+        if budget <= 0 or lifespan <= 0:
+            return None
+        return budget / lifespan
+
+    def set_particle_budget(self, budget):
+        cmds.undoInfo(openChunk=True, chunkName=UNDO_CHUNK_NAME)
+        try:
+            self.write_particle_budget(budget)
+        finally:
+            cmds.undoInfo(closeChunk=True)
+
+    def write_particle_budget(self, budget):
+        self.particle_budget = int(budget)
+        if not cmds.attributeQuery(PARTICLE_BUDGET_ATTRIBUTE, node=self.group, exists=True):
+            cmds.addAttr(self.group, longName=PARTICLE_BUDGET_ATTRIBUTE, attributeType='long')
+        cmds.setAttr(f'{self.group}.{PARTICLE_BUDGET_ATTRIBUTE}', self.particle_budget)
+        self.apply_particle_budget()
+
+        # The current rate may be over the new budget
+        key, attribute = self.rain_rate_target()
+        if self.nodes.contains(key):
+            self.enable_rain(self.read_value(key, attribute))
+            self.flush_writes()
+        log(f'Rain particle budget set to {self.particle_budget or "unlimited"}')
+
+    def get_particle_budget(self):
+        if self.particle_budget is None:
+            if self.group and cmds.attributeQuery(PARTICLE_BUDGET_ATTRIBUTE, node=self.group, exists=True):
+                self.particle_budget = cmds.getAttr(f'{self.group}.{PARTICLE_BUDGET_ATTRIBUTE}')
+            else:
+                self.particle_budget = DEFAULT_PARTICLE_BUDGET
+        return self.particle_budget
+
+    def apply_particle_budget(self):
+        budget = self.get_particle_budget()
+        if self.nodes.contains('rain_particles_shape'):
+            max_count = int(budget * PARTICLE_BUDGET_HEADROOM) if budget > 0 else -1
+            cmds.setAttr(f'{self.rain_particles_shape}.maxCount', max_count)
+        if self.nodes.contains('rain_culler'):
+            cmds.setAttr(f'{self.rain_culler}.particleBudget', budget)
+
+    # Lean rain: the particles only keep position and velocity (the age
+    # comes with the constant lifespan), the per-particle ramps are off and
+    # the drops are rendered as instanced streaks with an unlit material
+    def set_lean_rain(self, enabled):
+        self.flush_writes()
+        cmds.undoInfo(openChunk=True, chunkName=UNDO_CHUNK_NAME)
+        try:
+            self.write_lean_rain(enabled)
+        finally:
+            cmds.undoInfo(closeChunk=True)
+
+    def write_lean_rain(self, enabled):
+        if enabled:
+            self.create_rain_streaks()
+        else:
+            self.delete_rain_streaks()
+
+        if not cmds.attributeQuery(LEAN_RAIN_ATTRIBUTE, node=self.group, exists=True):
+            cmds.addAttr(self.group, longName=LEAN_RAIN_ATTRIBUTE, attributeType='bool')
+        cmds.setAttr(f'{self.group}.{LEAN_RAIN_ATTRIBUTE}', bool(enabled))
+
+    def get_lean_rain(self):
+        if self.group and cmds.attributeQuery(LEAN_RAIN_ATTRIBUTE, node=self.group, exists=True):
+            return cmds.getAttr(f'{self.group}.{LEAN_RAIN_ATTRIBUTE}')
+        return False
+
+    def create_rain_streaks(self):
+        shape = self.rain_particles_shape
+        cmds.setAttr(f'{shape}.cacheableAttributes', CACHEABLE_POSITION_VELOCITY)
+        for attribute in ('colorInput', 'opacityScaleInput', 'radiusScaleInput'):
+            cmds.setAttr(f'{shape}.{attribute}', 0)  # 0 is for off
+        cmds.setAttr(f'{shape}.computeRotation', False)
+        # Only the streaks are rendered
+        cmds.setAttr(f'{shape}.primaryVisibility', False)
+        cmds.setAttr(f'{shape}.castsShadows', False)
+
+        # Thin cylinder along X, the instancer aims X along the velocity
+        if not self.nodes.contains('rain_streak'):
+            self.rain_streak = cmds.polyCylinder(name=self.object_name(RAIN_STREAK_OBJECT_NAME),
+                                                 radius=RAIN_STREAK_RADIUS, height=RAIN_STREAK_LENGTH,
+                                                 subdivisionsAxis=3, subdivisionsHeight=1, axis=(1, 0, 0),
+                                                 constructionHistory=False)[0]
+            cmds.setAttr(f'{self.rain_streak}.visibility', False)
+            cmds.parent(self.rain_streak, self.group)
+            self.assign_streak_material()
+        if not self.nodes.contains('rain_instancer'):
+            self.rain_instancer = cmds.particleInstancer(shape, addObject=True, object=self.rain_streak,
+                                                         aimDirection='velocity',
+                                                         name=self.object_name(RAIN_INSTANCER_OBJECT_NAME))
+            cmds.parent(self.rain_instancer, self.group)
+        log(f'{self.rain_particles} rendered as instanced streaks')
+
+    def assign_streak_material(self):
+        if not cmds.objExists(RAIN_STREAK_MATERIAL):
+            material = cmds.shadingNode('aiStandardSurface', asShader=True, name=RAIN_STREAK_MATERIAL)
+            # Emission only, no lobe to sample
+            cmds.setAttr(f'{material}.base', 0.0)
+            cmds.setAttr(f'{material}.specular', 0.0)
+            cmds.setAttr(f'{material}.emission', 1.0)
+            cmds.setAttr(f'{material}.emissionColor', *RAIN_STREAK_COLOR, type='double3')
+            cmds.setAttr(f'{material}.opacity', *(RAIN_STREAK_OPACITY,) * 3, type='double3')
+        else:
+            material = RAIN_STREAK_MATERIAL
+
+        streak_shape = cmds.listRelatives(self.rain_streak, shapes=True, fullPath=True)[0]
+        cmds.setAttr(f'{streak_shape}.aiOpaque', False)
+        cmds.select(self.rain_streak)
+        cmds.hyperShade(assign=material)
+
+    def delete_rain_streaks(self):
+        if self.nodes.contains('rain_instancer'):
+            cmds.delete(self.rain_instancer)
+        if self.nodes.contains('rain_streak'):
+            cmds.delete(self.rain_streak)
+        if self.nodes.contains('rain_particles_shape'):
+            shape = self.rain_particles_shape
+            cmds.setAttr(f'{shape}.cacheableAttributes', CACHEABLE_DYNAMICS)
+            cmds.setAttr(f'{shape}.primaryVisibility', True)
+            cmds.setAttr(f'{shape}.castsShadows', True)
+
+    # Rain collision with ground meshes through a heightfield (see
+    # zeus_collision), no meshes removes it. With splashes, particles are
+    # emitted where the drops hit the ground.
+    def set_ground_collision(self, meshes, splashes=False):
+        self.flush_writes()
+        cmds.undoInfo(openChunk=True, chunkName=UNDO_CHUNK_NAME)
+        try:
+            self.write_ground_collision(meshes, splashes)
+        finally:
+            cmds.undoInfo(closeChunk=True)
+
+    def write_ground_collision(self, meshes, splashes):
+        if meshes:
+            settings = {'meshes': cmds.ls(meshes, long=True), 'splashes': bool(splashes)}
+            if not self.nodes.contains('ground_collision'):
+                self.create_ground_collision()
+            if splashes and not self.nodes.contains('rain_splash_emitter'):
+                self.create_rain_splash()
+            elif not splashes:
+                self.delete_rain_splash()
+            self.connect_ground_meshes(settings['meshes'])
+            stored = json.dumps(settings)
+        else:
+            self.delete_ground_collision()
+            stored = ''
+
+        if not cmds.attributeQuery(GROUND_COLLISION_ATTRIBUTE, node=self.group, exists=True):
+            cmds.addAttr(self.group, longName=GROUND_COLLISION_ATTRIBUTE, dataType='string')
+        cmds.setAttr(f'{self.group}.{GROUND_COLLISION_ATTRIBUTE}', stored, type='string')
+
+    # Settings of the ground collision, None without one
+    def get_ground_collision_settings(self):
+        if self.group and cmds.attributeQuery(GROUND_COLLISION_ATTRIBUTE, node=self.group, exists=True):
+            stored = cmds.getAttr(f'{self.group}.{GROUND_COLLISION_ATTRIBUTE}')
+            if stored:
+                return json.loads(stored)
+        return None
+
+    # The collision node (see ZeusGroundCollisionNode) kills a particle
+    # by setting its lifespanPP to its age, every other particle gets
+    # the lifespan of the shape
+    def create_ground_collision(self):
+        self.ground_collision = cmds.createNode(GROUND_COLLISION_NODE_TYPE,
+                                                name=self.object_name(GROUND_COLLISION_OBJECT_NAME))
+        cmds.setAttr(f'{self.rain_particles_shape}.lifespanMode', LIFESPAN_MODE_PP_ONLY)
+        for source, destination in self.ground_collision_connections():
+            cmds.connectAttr(source, destination, force=True)
+
+    def ground_collision_connections(self):
+        shape = self.rain_particles_shape
+        connections = [(f'{shape}.{attribute}', f'{self.ground_collision}.{attribute}')
+                       for attribute in ('position', 'age', 'lifespan')]
+        connections.append((f'{self.ground_collision}.outLifespanPP', f'{shape}.lifespanPP'))
+        if self.nodes.contains('rain_splash_emitter'):
+            connections.append((f'{self.ground_collision}.outSplashRatePP',
+                                f'{shape}.{self.splash_rate_attribute()}'))
+        return connections
+
+    # Per-point rate of the splash emitter on the rain particles
+    def splash_rate_attribute(self):
+        return self.rain_splash_emitter.split('|')[-1].split(':')[-1] + 'RatePP'
+
+    # Connect the world meshes of the ground to the collision node (meshes
+    # deleted since are skipped), returns whether the connections changed
+    def connect_ground_meshes(self, meshes):
+        shapes = []
+        for mesh in cmds.ls(meshes, long=True):
+            shapes += cmds.ls(mesh, type='mesh', long=True) or cmds.listRelatives(
+                mesh, shapes=True, type='mesh', noIntermediate=True, fullPath=True) or []
+        if not shapes:
+            log('None of the ground meshes are in the scene, the rain does not collide')
+
+        sources = [f'{shape}.worldMesh[0]' for shape in shapes]
+        connected = cmds.listConnections(f'{self.ground_collision}.ground', source=True, destination=False,
+                                         connections=True, plugs=True) or []
+        # (destination, source) pairs
+        current = dict(zip(connected[0::2], connected[1::2]))
+        wanted = {f'{self.ground_collision}.ground[{index}]': source for index, source in enumerate(sources)}
+        if sorted(current.values()) == sorted(wanted.values()):
+            return False
+
+        for destination, source in current.items():
+            cmds.disconnectAttr(source, destination)
+        for destination, source in wanted.items():
+            cmds.connectAttr(source, destination, force=True)
+        return True
+
+    # Splashes are emitted from the rain drops, at the per-point rate
+    # given by the collision node (1 for the drops that hit)
+    def create_rain_splash(self):
+        if not self.nodes.contains('rain_splash'):
+            self.rain_splash = cmds.particle(name=self.object_name(RAIN_SPLASH_OBJECT_NAME))[0]
+            splash_shape = cmds.listRelatives(self.rain_splash, shapes=True, fullPath=True)[0]
+            cmds.setAttr(f'{splash_shape}.lifespanMode', LIFESPAN_MODE_CONSTANT)
+            cmds.setAttr(f'{splash_shape}.lifespan', RAIN_SPLASH_LIFESPAN)
+            cmds.parent(self.rain_splash, self.group)
+
+        # One splash per hit, the rate is per second
+        self.rain_splash_emitter = cmds.emitter(self.rain_particles, type='omni', rate=frames_per_second(),
+                                                speed=RAIN_SPLASH_SPEED,
+                                                name=self.object_name(RAIN_SPLASH_EMITTER_OBJECT_NAME))[-1]
+        cmds.setAttr(f'{self.rain_splash_emitter}.useRatePP', True)
+        cmds.addAttr(self.rain_particles_shape, longName=self.splash_rate_attribute(), dataType='doubleArray')
+        cmds.connectDynamic(self.rain_splash, em=self.rain_splash_emitter)
+        cmds.connectAttr(f'{self.ground_collision}.outSplashRatePP',
+                         f'{self.rain_particles_shape}.{self.splash_rate_attribute()}', force=True)
+
+    def delete_rain_splash(self):
+        if self.nodes.contains('rain_splash_emitter'):
+            attribute = self.splash_rate_attribute()
+            cmds.delete(self.rain_splash_emitter)
+            if cmds.attributeQuery(attribute, node=self.rain_particles_shape, exists=True):
+                cmds.deleteAttr(self.rain_particles_shape, attribute=attribute)
+        if self.nodes.contains('rain_splash'):
+            cmds.delete(self.rain_splash)
+
+    def delete_ground_collision(self):
+        self.delete_rain_splash()
+        if self.nodes.contains('ground_collision'):
+            cmds.delete(self.ground_collision)
+        if self.nodes.contains('rain_particles_shape'):
+            cmds.setAttr(f'{self.rain_particles_shape}.lifespanMode', LIFESPAN_MODE_CONSTANT)
 
     def add_rain_enabled_keyframe(self):
-        cmds.setKeyframe(f'{self.rain_emitter}.rate')
+        self.flush_writes()
+        key, attribute = self.rain_rate_target()
+        cmds.setKeyframe(f'{self.nodes.name(key)}.{attribute}')
 
     def delete_rain_enabled_keyframe(self):
-        cmds.cutKey(f'{self.rain_emitter}.rate')
+        self.flush_writes()
+        key, attribute = self.rain_rate_target()
+        cmds.cutKey(f'{self.nodes.name(key)}.{attribute}')
 
     def set_wind_speed(self, value):
-        cmds.setAttr(f'{self.nucleus}.windSpeed', value)
+        self.queue_write('nucleus', 'windSpeed', float(value))
 
     def add_wind_speed_keyframe(self):
+        self.flush_writes()
         cmds.setKeyframe(f'{self.nucleus}.windSpeed')
+        self.schedule_drift_update()
 
     def delete_wind_speed_keyframe(self):
+        self.flush_writes()
         cmds.cutKey(f'{self.nucleus}.windSpeed')
+        self.schedule_drift_update()
 
     def set_wind_direction(self, value, axis):
-        # Get previous values from the nucleus
-        wind_direction = cmds.getAttr(f'{self.nucleus}.windDirection')[0]
-        wind_direction = np.array(wind_direction)
+        # Get previous values from the nucleus (or the not yet flushed ones)
+        wind_direction = [
+            self.read_value('nucleus', f'windDirection{axis_name}')
+            for axis_name in ('X', 'Y', 'Z')
+        ]
 
         # Update values locally
         if axis == 'X':
@@ -256,15 +1413,307 @@ class ZeusModel:
             wind_direction[2] = value
 
         # wind_direction[1] = 0 # Projecting to the XZ plane
-        wind_direction = wind_direction / np.linalg.norm(wind_direction) # Normalizing the vector
+        norm = math.sqrt(sum(component * component for component in wind_direction))
+        if norm == 0.0:
+            log('Wind direction cannot be a null vector!')
+            return
+        wind_direction = [component / norm for component in wind_direction] # Normalizing the vector
 
         # Update values on the nucleus
-        cmds.setAttr(f'{self.nucleus}.windDirectionX', wind_direction[0])
-        cmds.setAttr(f'{self.nucleus}.windDirectionY', wind_direction[1])
-        cmds.setAttr(f'{self.nucleus}.windDirectionZ', wind_direction[2])
+        self.queue_write('nucleus', 'windDirectionX', wind_direction[0])
+        self.queue_write('nucleus', 'windDirectionY', wind_direction[1])
+        self.queue_write('nucleus', 'windDirectionZ', wind_direction[2])
+
+    # Gusts and turbulence on top of the nucleus wind (see zeus_wind).
+    # settings overrides DEFAULT_WIND_FIELD, None removes the field.
+    def set_wind_field(self, settings):
+        self.flush_writes()
+        cmds.undoInfo(openChunk=True, chunkName=UNDO_CHUNK_NAME)
+        try:
+            self.write_wind_field(settings)
+        finally:
+            cmds.undoInfo(closeChunk=True)
+
+    def write_wind_field(self, settings):
+        if settings is None:
+            self.delete_wind_container()
+            stored = ''
+        else:
+            settings = {**DEFAULT_WIND_FIELD, **settings}
+            if not self.nodes.contains('wind_container'):
+                self.create_wind_container()
+                if self.nodes.contains('rain_particles'):
+                    cmds.connectDynamic(self.rain_particles, fields=self.wind_container)
+            self.attach_wind_field(settings)
+            if self.nodes.contains('cloud_drift'):
+                self.wind_field.bake_gusts(cmds.playbackOptions(query=True, minTime=True),
+                                           cmds.playbackOptions(query=True, maxTime=True))
+            stored = json.dumps(settings, sort_keys=True)
+
+        if not cmds.attributeQuery(WIND_FIELD_ATTRIBUTE, node=self.group, exists=True):
+            cmds.addAttr(self.group, longName=WIND_FIELD_ATTRIBUTE, dataType='string')
+        cmds.setAttr(f'{self.group}.{WIND_FIELD_ATTRIBUTE}', stored, type='string')
+
+    # Settings of the wind field, None without one
+    def get_wind_field_settings(self):
+        if self.group and cmds.attributeQuery(WIND_FIELD_ATTRIBUTE, node=self.group, exists=True):
+            stored = cmds.getAttr(f'{self.group}.{WIND_FIELD_ATTRIBUTE}')
+            if stored:
+                return {**DEFAULT_WIND_FIELD, **json.loads(stored)}
+        return None
+
+    def attach_wind_field(self, settings):
+        from zeus_wind import ZeusWindField
+
+        if self.wind_field is None:
+            self.wind_field = ZeusWindField(self)
+        self.wind_field.update(settings)
+
+    # Fluid with a static velocity grid over the rain area, no density
+    # (nothing to render) and no solver (the grid is played from a cache)
+    def create_wind_container(self):
+        self.wind_container = cmds.createNode('transform', name=self.object_name(WIND_CONTAINER_OBJECT_NAME))
+        self.wind_shape = cmds.createNode('fluidShape', name='windContainerShape', parent=self.wind_container)
+        for axis, resolution, size in zip(('W', 'H', 'D'), WIND_GRID_RESOLUTION, WIND_FIELD_SIZE):
+            cmds.setAttr(f'{self.wind_shape}.resolution{axis}', resolution)
+            cmds.setAttr(f'{self.wind_shape}.dimensions{axis}', size)
+        cmds.setAttr(f'{self.wind_shape}.densityMethod', DENSITY_METHOD_OFF)
+        cmds.setAttr(f'{self.wind_shape}.velocityMethod', VELOCITY_METHOD_STATIC_GRID)
+        cmds.setAttr(f'{self.wind_shape}.solver', FLUID_SOLVER_NONE)
+        # The rain falls from the emitter
+        cmds.setAttr(f'{self.wind_container}.translateY', -WIND_FIELD_SIZE[1] / 2)
+
+        log(self.wind_container + ' created successfully!')
+        cmds.parent(self.wind_container, self.group)
+
+    def delete_wind_container(self):
+        self.wind_field = None
+        if self.nodes.contains('wind_container'):
+            cmds.delete(self.wind_container)
+        if self.nodes.contains('cloud_drift'):
+            for axis in ('X', 'Y', 'Z'):
+                cmds.cutKey(f'{self.cloud_drift}.gust{axis}', clear=True)
+                cmds.setAttr(f'{self.cloud_drift}.gust{axis}', 0.0)
+            self.update_drift_table()
 
     def add_wind_direction_keyframe(self):
+        self.flush_writes()
         cmds.setKeyframe(f'{self.nucleus}.windDirection')
+        self.schedule_drift_update()
 
     def delete_wind_direction_keyframe(self):
-        cmds.cutKey(f'{self.nucleus}.windDirection')
\ No newline at end of file
+        self.flush_writes()
+        cmds.cutKey(f'{self.nucleus}.windDirection')
+        self.schedule_drift_update()
+
+    # Current weather, from the scene values (and the not yet flushed ones)
+    def capture_state(self):
+        return ZeusWeatherState(
+            density=opacity_bias_to_density(self.read_value('cloud_shape', 'opacityInputBias')),
+            storminess=edge_dropoff_to_storminess(self.read_value('cloud_shape', 'edgeDropoff')),
+            details=frequency_ratio_to_details(self.read_value('cloud_shape', 'frequencyRatio')),
+            rain_rate=self.read_value(*self.rain_rate_target()),
+            wind_speed=self.read_value('nucleus', 'windSpeed'),
+            wind_direction=[self.read_value('nucleus', f'windDirection{axis}') for axis in ('X', 'Y', 'Z')],
+        )
+
+    # (key, attribute, value) of every attribute driven by a state
+    def state_attributes(self, state):
+        attributes = [
+            ('cloud_shape', 'opacityInputBias', density_to_opacity_bias(state.density)),
+            ('cloud_shape', 'edgeDropoff', storminess_to_edge_dropoff(state.storminess)),
+        ]
+        for channel in ('R', 'G', 'B'):
+            attributes.append(('cloud_shape', f'transparency{channel}', storminess_to_transparency(state.storminess)))
+        attributes += [
+            ('cloud_shape', 'frequencyRatio', details_to_frequency_ratio(state.details)),
+            (*self.rain_rate_target(), self.budget_rain_rate(state.rain_rate)),
+            ('nucleus', 'windSpeed', state.wind_speed),
+        ]
+        norm = math.sqrt(sum(component * component for component in state.wind_direction))
+        if norm > 0.0:
+            for component, axis in zip(state.wind_direction, ('X', 'Y', 'Z')):
+                attributes.append(('nucleus', f'windDirection{axis}', component / norm))
+        return attributes
+
+    # Switch to a weather state, only the attributes that differ from
+    # the current values are written (in a single undo entry).
+    # Returns the number of attributes written.
+    def apply_state(self, state, tolerance=STATE_TOLERANCE):
+        changed = [(key, attribute, value) for key, attribute, value in self.state_attributes(state)
+                   if abs(self.read_value(key, attribute) - value) > tolerance]
+        # Straight to the pending writes, queue_write could flush the
+        # first ones on their own
+        for key, attribute, value in changed:
+            self.pending_writes[(key, attribute)] = value
+        self.flush_writes()
+        if any(attribute == 'edgeDropoff' for _, attribute, _ in changed):
+            self.update_time_of_day()
+        log(f'Weather state applied, {len(changed)} attribute(s) changed')
+        return len(changed)
+
+    # Animate from one state to another over start-end (frames), every
+    # attribute gets its curve in one go (see bake_timeline)
+    def blend_states(self, start_state, end_state, start, end, tolerance=BAKE_TOLERANCE):
+        import numpy as np
+
+        frames = np.arange(start, end + 1, dtype=np.float64)
+        weights = (frames - start) / max(end - start, 1)
+        schedule = {'frame': frames}
+        for parameter in STATE_PARAMETERS:
+            start_value = np.asarray(getattr(start_state, parameter), dtype=np.float64)
+            end_value = np.asarray(getattr(end_state, parameter), dtype=np.float64)
+            schedule[parameter] = start_value + np.multiply.outer(weights, end_value - start_value)
+        return self.bake_timeline(schedule, tolerance)
+
+    # Parameters of the cost model (see zeus_cost) for the current values,
+    # the weather ones from a state when given
+    def cost_parameters(self, state=None):
+        state = state or self.capture_state()
+        return {
+            'density': state.density,
+            'storminess': state.storminess,
+            'details': state.details,
+            'rain_rate': state.rain_rate,
+            'resolution': [self.read_value('cloud_shape', f'resolution{axis}') for axis in ('W', 'H', 'D')],
+            'initial_sample_rate': self.read_value('cloud_shape', 'initialSampleRate'),
+            'extra_sample_rate': self.read_value('cloud_shape', 'extraSampleRate'),
+            'quality': self.read_value('cloud_shape', 'quality'),
+            'lifespan': self.read_value('rain_particles_shape', 'lifespan'),
+            'particle_budget': self.get_particle_budget(),
+            'lean_rain': bool(self.get_lean_rain()),
+            'baked_noise': bool(self.get_baked_noise()),
+        }
+
+    # Estimated seconds per frame on this machine (clouds, rain,
+    # simulation and total, see zeus_cost.estimate_cost). Called on every
+    # UI sync, it never runs the calibration (reference speed until then).
+    def estimate_cost(self, state=None):
+        from zeus_cost import estimate_cost, machine_scale
+
+        return estimate_cost(self.cost_parameters(state), machine_scale(measure=False))
+
+    # Pick the quality tier and the particle budget keeping every frame
+    # of the keyed range under target seconds (see zeus_cost.auto_tune).
+    # Returns (tier, budget, worst seconds).
+    def auto_tune_cost(self, target=DEFAULT_TARGET_FRAME_SECONDS):
+        import numpy as np
+        from zeus_cost import auto_tune, machine_scale
+        from zeus_export import evaluate_weather
+
+        self.flush_writes()
+        start, end = self.keyed_range()
+        columns = evaluate_weather(self, np.arange(start, end + 1, dtype=np.float64))
+        base = self.cost_parameters()
+        frames = [
+            {**base, 'density': density, 'storminess': storminess, 'details': details, 'rain_rate': rain_rate}
+            for density, storminess, details, rain_rate in zip(
+                columns['density'].tolist(), columns['storminess'].tolist(),
+                columns['details'].tolist(), columns['rain_rate'].tolist())
+        ]
+
+        tier, budget, worst = auto_tune(frames, target, self.quality_tier_settings, machine_scale())
+        self.set_quality_tier(tier)
+        self.set_particle_budget(budget)
+        log(f'Auto-tuned frames {start:g}-{end:g} for {target:g} s: {tier} tier, {budget} particles, '
+            f'{worst:.1f} s on the worst frame')
+        return tier, budget, worst
+
+    # First and last keys of the weather curves, the playback range
+    # when nothing is keyed
+    def keyed_range(self):
+        plugs = [f'{self.cloud_shape}.{attribute}' for attribute in ('opacityInputBias', 'edgeDropoff', 'frequencyRatio')]
+        key, attribute = self.rain_rate_target()
+        plugs.append(f'{self.nodes.name(key)}.{attribute}')
+        times = cmds.keyframe(plugs, query=True, timeChange=True)
+        if not times:
+            return cmds.playbackOptions(query=True, minTime=True), cmds.playbackOptions(query=True, maxTime=True)
+        return min(times), max(times)
+
+    # Reuse or rebuild the rain disk cache over start-end (playback
+    # range by default), see zeus_cache.ZeusCacheManager
+    def update_rain_cache(self, start=None, end=None):
+        from zeus_cache import ZeusCacheManager
+
+        self.flush_writes()
+        if self.cache_manager is None:
+            self.cache_manager = ZeusCacheManager(self)
+        return self.cache_manager.update(start, end)
+
+    # Bake a whole weather timelapse at once.
+    # schedule is either a path to a CSV/JSON file or a dict of columns
+    # (see zeus_timeline.load_schedule), every parameter present in it
+    # replaces the animation of the corresponding attributes.
+    # Returns the time spent on each curve.
+    def bake_timeline(self, schedule, tolerance=BAKE_TOLERANCE):
+        from zeus_timeline import load_schedule, normalize_schedule, thin_keys
+
+        if isinstance(schedule, dict):
+            schedule = normalize_schedule(schedule)
+        else:
+            schedule = load_schedule(schedule)
+
+        # Pending UI values would be overwritten by the curves anyway
+        self.flush_writes()
+
+        # A single undo for the whole bake
+        frames = schedule['frame']
+        timings = {}
+        cmds.undoInfo(openChunk=True, chunkName=UNDO_CHUNK_NAME)
+        try:
+            for key, attribute, values in self.schedule_to_attributes(schedule):
+                start = time.perf_counter()
+                keep = thin_keys(frames, values, tolerance)
+                self.write_anim_curve(key, attribute, frames[keep], values[keep])
+                attribute = f'{self.nodes.name(key)}.{attribute}'
+                timings[attribute] = time.perf_counter() - start
+                log(f'Baked {attribute}: {int(keep.sum())}/{len(frames)} keys in {timings[attribute] * 1000:.2f} ms')
+
+            if 'storminess' in schedule:
+                self.update_time_of_day()
+            if 'wind_speed' in schedule or 'wind_direction' in schedule:
+                self.update_drift_table()
+        finally:
+            cmds.undoInfo(closeChunk=True)
+        return timings
+
+    # Attribute values for every parameter of the schedule
+    def schedule_to_attributes(self, schedule):
+        import numpy as np
+
+        attributes = []
+        if 'density' in schedule:
+            attributes.append(('cloud_shape', 'opacityInputBias', density_to_opacity_bias(schedule['density'])))
+        if 'storminess' in schedule:
+            storminess = np.clip(schedule['storminess'], 0.0, 1.0)
+            attributes.append(('cloud_shape', 'edgeDropoff', storminess_to_edge_dropoff(storminess)))
+            for channel in ('R', 'G', 'B'):
+                attributes.append(('cloud_shape', f'transparency{channel}', storminess_to_transparency(storminess)))
+        if 'details' in schedule:
+            attributes.append(('cloud_shape', 'frequencyRatio', details_to_frequency_ratio(schedule['details'])))
+        if 'rain_rate' in schedule:
+            limit = self.rain_rate_limit()
+            rain_rate = schedule['rain_rate'] if limit is None else np.minimum(schedule['rain_rate'], limit)
+            attributes.append((*self.rain_rate_target(), rain_rate))
+        if 'wind_speed' in schedule:
+            attributes.append(('nucleus', 'windSpeed', schedule['wind_speed']))
+        if 'wind_direction' in schedule:
+            wind_direction = schedule['wind_direction']
+            norm = np.linalg.norm(wind_direction, axis=1, keepdims=True)
+            wind_direction = wind_direction / np.where(norm > 0.0, norm, 1.0)
+            for i, axis in enumerate(('X', 'Y', 'Z')):
+                attributes.append(('nucleus', f'windDirection{axis}', wind_direction[:, i]))
+        return attributes
+
+    # Replace the animation of an attribute with a new curve, all the
+    # keys are added in a single MFnAnimCurve.addKeys call and the whole
+    # write is one undoable zeusApplyModifier (see ZeusAnimCurveModifier)
+    def write_anim_curve(self, key, attribute, frames, values):
+        unit = om.MTime.uiUnit()
+        times = om.MTimeArray([om.MTime(float(frame), unit) for frame in frames])
+        apply_modifier(ZeusAnimCurveModifier(self.nodes.plug(key, attribute), times,
+                                             om.MDoubleArray(values.tolist())))
+
+
+# Every model method shows up in the profiler (see zeus_profile)
+instrument_class(ZeusModel)
@@ -0,0 +1,366 @@
+import math
+
+import maya.api.OpenMaya as om
+
+from zeus_utils import *
+
+
+# Drives the cloud textureOrigin from the nucleus wind.
+# The offset is the integral of the wind velocity from startTime to the
+# evaluated time, so every frame can be computed on its own (scrubbing,
+# out of order rendering, parallel evaluation) without the per-frame
+# expression accumulating state on the nucleus.
+# gustX/Y/Z add the mean of the wind field (see zeus_wind) so the clouds
+# move with the same gusts as the rain.
+# When the wind is animated, the model bakes its cumulative integral on
+# every whole frame from tableStart into offsetTable (x, y, z per frame,
+# see ZeusModel.update_drift_table) and compute only interpolates it.
+# Outside the table (or without one) the wind of the evaluated time is
+# taken as constant, which is exact for a wind that is not animated.
+class ZeusCloudDriftNode(om.MPxNode):
+    type_name = CLOUD_DRIFT_NODE_TYPE
+    type_id = om.MTypeId(CLOUD_DRIFT_NODE_ID)
+
+    time = None
+    start_time = None
+    wind_speed = None
+    wind_direction_x = None
+    wind_direction_y = None
+    wind_direction_z = None
+    gust_x = None
+    gust_y = None
+    gust_z = None
+    scale = None
+    table_start = None
+    offset_table = None
+    texture_origin = None
+
+    @staticmethod
+    def creator():
+        return ZeusCloudDriftNode()
+
+    @staticmethod
+    def initialize():
+        unit_fn = om.MFnUnitAttribute()
+        numeric_fn = om.MFnNumericAttribute()
+        typed_fn = om.MFnTypedAttribute()
+        cls = ZeusCloudDriftNode
+
+        cls.time = unit_fn.create('time', 'tm', om.MFnUnitAttribute.kTime, 0.0)
+        cls.start_time = unit_fn.create('startTime', 'st', om.MFnUnitAttribute.kTime, 1.0)
+        unit_fn.keyable = True
+
+        cls.wind_speed = numeric_fn.create('windSpeed', 'ws', om.MFnNumericData.kDouble, 0.0)
+        numeric_fn.keyable = True
+        cls.wind_direction_x = numeric_fn.create('windDirectionX', 'wdx', om.MFnNumericData.kDouble, 1.0)
+        numeric_fn.keyable = True
+        cls.wind_direction_y = numeric_fn.create('windDirectionY', 'wdy', om.MFnNumericData.kDouble, 0.0)
+        numeric_fn.keyable = True
+        cls.wind_direction_z = numeric_fn.create('windDirectionZ', 'wdz', om.MFnNumericData.kDouble, 0.0)
+        numeric_fn.keyable = True
+        cls.gust_x = numeric_fn.create('gustX', 'gx', om.MFnNumericData.kDouble, 0.0)
+        numeric_fn.keyable = True
+        cls.gust_y = numeric_fn.create('gustY', 'gy', om.MFnNumericData.kDouble, 0.0)
+        numeric_fn.keyable = True
+        cls.gust_z = numeric_fn.create('gustZ', 'gz', om.MFnNumericData.kDouble, 0.0)
+        numeric_fn.keyable = True
+        cls.scale = numeric_fn.create('scale', 'sc', om.MFnNumericData.kDouble, CLOUD_DRIFT_SCALE)
+        numeric_fn.keyable = True
+
+        cls.table_start = unit_fn.create('tableStart', 'tbs', om.MFnUnitAttribute.kTime, 0.0)
+        cls.offset_table = typed_fn.create('offsetTable', 'otb', om.MFnData.kDoubleArray,
+                                           om.MFnDoubleArrayData().create())
+
+        cls.texture_origin = numeric_fn.create('textureOrigin', 'to', om.MFnNumericData.k3Double)
+        numeric_fn.writable = False
+        numeric_fn.storable = False
+
+        inputs = (cls.time, cls.start_time, cls.wind_speed, cls.wind_direction_x,
+                  cls.wind_direction_y, cls.wind_direction_z, cls.gust_x, cls.gust_y, cls.gust_z,
+                  cls.scale, cls.table_start, cls.offset_table)
+        for attribute in inputs + (cls.texture_origin,):
+            cls.addAttribute(attribute)
+        for attribute in inputs:
+            cls.attributeAffects(attribute, cls.texture_origin)
+
+    def compute(self, plug, data_block):
+        if plug.isChild:
+            plug = plug.parent()
+        if plug.attribute() != ZeusCloudDriftNode.texture_origin:
+            return None
+
+        cls = ZeusCloudDriftNode
+        unit = om.MTime.uiUnit()
+        time = data_block.inputValue(cls.time).asTime().asUnits(unit)
+        start = data_block.inputValue(cls.start_time).asTime().asUnits(unit)
+        scale = data_block.inputValue(cls.scale).asDouble()
+        frames_per_second = om.MTime(1.0, om.MTime.kSeconds).asUnits(unit)
+
+        # Wind of the evaluated time, used outside the table
+        speed = data_block.inputValue(cls.wind_speed).asDouble()
+        velocity = [
+            speed * data_block.inputValue(direction).asDouble() + data_block.inputValue(gust).asDouble()
+            for direction, gust in ((cls.wind_direction_x, cls.gust_x),
+                                    (cls.wind_direction_y, cls.gust_y),
+                                    (cls.wind_direction_z, cls.gust_z))
+        ]
+        table = om.MFnDoubleArrayData(data_block.inputValue(cls.offset_table).data()).array()
+        table_start = data_block.inputValue(cls.table_start).asTime().asUnits(unit)
+
+        end_integral = self.integral(table, table_start, time, velocity, frames_per_second)
+        start_integral = self.integral(table, table_start, start, velocity, frames_per_second)
+
+        # Opposite sign to translate the texture along the wind
+        handle = data_block.outputValue(cls.texture_origin)
+        handle.set3Double(*[-scale * (end - begin) for end, begin in zip(end_integral, start_integral)])
+        data_block.setClean(plug)
+
+    # Integral of the wind at frame: interpolated in the table, extended
+    # with velocity before and after it
+    @staticmethod
+    def integral(table, table_start, frame, velocity, frames_per_second):
+        count = len(table) // 3
+        if count == 0:
+            return [component * frame / frames_per_second for component in velocity]
+
+        position = frame - table_start
+        if position <= 0.0 or position >= count - 1:
+            index = 0 if position <= 0.0 else count - 1
+            delta_time = (position - index) / frames_per_second
+            return [table[index * 3 + i] + velocity[i] * delta_time for i in range(3)]
+
+        index = int(position)
+        weight = position - index
+        return [table[index * 3 + i] * (1.0 - weight) + table[index * 3 + 3 + i] * weight for i in range(3)]
+
+
+# Drives the rate of the rain tile emitters from the camera.
+# Every tile (cell[i]: emitter world matrix and bounding radius) inside the
+# camera frustum and closer than maxDistance emits at rate, the others at
+# rate * cullRate. outRate[i] is connected to the rate of tile i, so the
+# culling follows the camera on every evaluation without any expression.
+# rateScale is the area of a tile over the area of the single emitter, so
+# rate keeps the rain density of the single emitter whatever the tile size.
+# With a particleBudget, every rate is scaled down so that the particles
+# alive at once (total rate * lifespan) stay within the budget.
+class ZeusRainCullerNode(om.MPxNode):
+    type_name = RAIN_CULLER_NODE_TYPE
+    type_id = om.MTypeId(RAIN_CULLER_NODE_ID)
+
+    camera_matrix = None
+    focal_length = None
+    horizontal_aperture = None
+    vertical_aperture = None
+    max_distance = None
+    rate = None
+    cull_rate = None
+    rate_scale = None
+    particle_budget = None
+    lifespan = None
+    cell = None
+    cell_matrix = None
+    cell_radius = None
+    out_rate = None
+
+    @staticmethod
+    def creator():
+        return ZeusRainCullerNode()
+
+    @staticmethod
+    def initialize():
+        matrix_fn = om.MFnMatrixAttribute()
+        numeric_fn = om.MFnNumericAttribute()
+        compound_fn = om.MFnCompoundAttribute()
+        cls = ZeusRainCullerNode
+
+        cls.camera_matrix = matrix_fn.create('cameraMatrix', 'cm', om.MFnMatrixAttribute.kDouble)
+
+        # Camera lens, focal length in mm and film aperture in inches
+        cls.focal_length = numeric_fn.create('focalLength', 'fl', om.MFnNumericData.kDouble, 35.0)
+        cls.horizontal_aperture = numeric_fn.create('horizontalFilmAperture', 'hfa', om.MFnNumericData.kDouble, 1.417)
+        cls.vertical_aperture = numeric_fn.create('verticalFilmAperture', 'vfa', om.MFnNumericData.kDouble, 0.945)
+
+        cls.max_distance = numeric_fn.create('maxDistance', 'md', om.MFnNumericData.kDouble, RAIN_TILE_MAX_DISTANCE)
+        numeric_fn.keyable = True
+        cls.rate = numeric_fn.create('rate', 'r', om.MFnNumericData.kDouble, 0.0)
+        numeric_fn.keyable = True
+        cls.cull_rate = numeric_fn.create('cullRate', 'cr', om.MFnNumericData.kDouble, RAIN_TILE_CULL_RATE)
+        numeric_fn.keyable = True
+        cls.rate_scale = numeric_fn.create('rateScale', 'rsc', om.MFnNumericData.kDouble, 1.0)
+        cls.particle_budget = numeric_fn.create('particleBudget', 'pb', om.MFnNumericData.kDouble, 0.0)
+        cls.lifespan = numeric_fn.create('lifespan', 'ls', om.MFnNumericData.kDouble, 1.0)
+
+        cls.cell_matrix = matrix_fn.create('cellMatrix', 'clm', om.MFnMatrixAttribute.kDouble)
+        cls.cell_radius = numeric_fn.create('cellRadius', 'clr', om.MFnNumericData.kDouble, 1.0)
+        cls.cell = compound_fn.create('cell', 'cl')
+        compound_fn.addChild(cls.cell_matrix)
+        compound_fn.addChild(cls.cell_radius)
+        compound_fn.array = True
+
+        cls.out_rate = numeric_fn.create('outRate', 'or', om.MFnNumericData.kDouble, 0.0)
+        numeric_fn.array = True
+        numeric_fn.usesArrayDataBuilder = True
+        numeric_fn.writable = False
+        numeric_fn.storable = False
+
+        inputs = (cls.camera_matrix, cls.focal_length, cls.horizontal_aperture, cls.vertical_aperture,
+                  cls.max_distance, cls.rate, cls.cull_rate, cls.rate_scale, cls.particle_budget, cls.lifespan,
+                  cls.cell)
+        for attribute in inputs + (cls.out_rate,):
+            cls.addAttribute(attribute)
+        for attribute in inputs + (cls.cell_matrix, cls.cell_radius):
+            cls.attributeAffects(attribute, cls.out_rate)
+
+    def compute(self, plug, data_block):
+        if plug.isElement:
+            plug = plug.array()
+        if plug.attribute() != ZeusRainCullerNode.out_rate:
+            return None
+
+        cls = ZeusRainCullerNode
+        world_to_camera = data_block.inputValue(cls.camera_matrix).asMatrix().inverse()
+        focal_length = data_block.inputValue(cls.focal_length).asDouble()
+        max_distance = data_block.inputValue(cls.max_distance).asDouble()
+        rate = data_block.inputValue(cls.rate).asDouble() * data_block.inputValue(cls.rate_scale).asDouble()
+        culled_rate = rate * data_block.inputValue(cls.cull_rate).asDouble()
+
+        # Half field of view tangents (aperture in inches, focal length in mm)
+        tangents = [
+            data_block.inputValue(aperture).asDouble() * 25.4 * 0.5 / max(focal_length, 1e-6)
+            for aperture in (cls.horizontal_aperture, cls.vertical_aperture)
+        ]
+        # Distance of a point from a side plane of the frustum is
+        # (|x| - depth * tangent) / sqrt(1 + tangent^2)
+        normalizers = [math.sqrt(1.0 + tangent * tangent) for tangent in tangents]
+
+        cells = data_block.inputArrayValue(cls.cell)
+        rates = []
+        for i in range(len(cells)):
+            cells.jumpToPhysicalElement(i)
+            cell = cells.inputValue()
+            radius = cell.child(cls.cell_radius).asDouble()
+            center = om.MPoint(0.0, 0.0, 0.0) * cell.child(cls.cell_matrix).asMatrix() * world_to_camera
+
+            # Maya cameras look down -Z
+            depth = -center.z
+            visible = -radius < depth < max_distance + radius
+            for coordinate, tangent, normalizer in zip((center.x, center.y), tangents, normalizers):
+                if (abs(coordinate) - depth * tangent) / normalizer > radius:
+                    visible = False
+
+            rates.append((cells.elementLogicalIndex(), rate if visible else culled_rate))
+
+        budget = data_block.inputValue(cls.particle_budget).asDouble()
+        alive = sum(tile_rate for _, tile_rate in rates) * data_block.inputValue(cls.lifespan).asDouble()
+        budget_scale = budget / alive if 0.0 < budget < alive else 1.0
+
+        out_rates = data_block.outputArrayValue(cls.out_rate)
+        builder = out_rates.builder()
+        for index, tile_rate in rates:
+            builder.addElement(index).setDouble(tile_rate * budget_scale)
+        out_rates.set(builder)
+        out_rates.setAllClean()
+        data_block.setClean(plug)
+
+
+# Kills the rain drops that went under the ground (see zeus_collision).
+# The ground meshes (worldMesh connected to ground[i]) are sampled into a
+# heightfield only when they change. On every evaluation, the drops under
+# it get their age as lifespan (outLifespanPP, connected to lifespanPP)
+# so the solver removes them, the others the lifespan of the shape.
+# outSplashRatePP is 1 for the drops that hit, it drives the per-point
+# rate of the splash emitter of the rain particles.
+# Reading position and age from the shape it writes lifespanPP to is the
+# wiring of Maya's own arrayMapper ramps (age in, outValuePP to a PP
+# attribute), not a cycle the DG evaluates: the solver only reads
+# lifespanPP when it steps to the next time, position and age are the
+# state of the last step, and the result never depends on the lifespans
+# it wrote (see collide), so it is the same when evaluated again.
+class ZeusGroundCollisionNode(om.MPxNode):
+    type_name = GROUND_COLLISION_NODE_TYPE
+    type_id = om.MTypeId(GROUND_COLLISION_NODE_ID)
+
+    position = None
+    age = None
+    lifespan = None
+    ground = None
+    out_lifespan = None
+    out_splash_rate = None
+
+    def __init__(self):
+        om.MPxNode.__init__(self)
+        self.heightfield = None
+        self.ground_stale = True
+
+    @staticmethod
+    def creator():
+        return ZeusGroundCollisionNode()
+
+    @staticmethod
+    def initialize():
+        numeric_fn = om.MFnNumericAttribute()
+        typed_fn = om.MFnTypedAttribute()
+        cls = ZeusGroundCollisionNode
+
+        cls.position = typed_fn.create('position', 'pos', om.MFnData.kVectorArray, om.MFnVectorArrayData().create())
+        cls.age = typed_fn.create('age', 'ag', om.MFnData.kDoubleArray, om.MFnDoubleArrayData().create())
+        cls.lifespan = numeric_fn.create('lifespan', 'ls', om.MFnNumericData.kDouble, 1.0)
+        cls.ground = typed_fn.create('ground', 'gr', om.MFnData.kMesh)
+        typed_fn.array = True
+        typed_fn.storable = False
+
+        cls.out_lifespan = typed_fn.create('outLifespanPP', 'olp', om.MFnData.kDoubleArray)
+        typed_fn.writable = False
+        typed_fn.storable = False
+        cls.out_splash_rate = typed_fn.create('outSplashRatePP', 'osr', om.MFnData.kDoubleArray)
+        typed_fn.writable = False
+        typed_fn.storable = False
+
+        inputs = (cls.position, cls.age, cls.lifespan, cls.ground)
+        outputs = (cls.out_lifespan, cls.out_splash_rate)
+        for attribute in inputs + outputs:
+            cls.addAttribute(attribute)
+        for attribute in inputs:
+            for output in outputs:
+                cls.attributeAffects(attribute, output)
+
+    # The heightfield is only looked up again when a ground mesh changed
+    def setDependentsDirty(self, plug, affected_plugs):
+        if plug.attribute() == ZeusGroundCollisionNode.ground:
+            self.ground_stale = True
+        return om.MPxNode.setDependentsDirty(self, plug, affected_plugs)
+
+    def compute(self, plug, data_block):
+        cls = ZeusGroundCollisionNode
+        if plug.attribute() not in (cls.out_lifespan, cls.out_splash_rate):
+            return None
+
+        import numpy as np
+        from zeus_collision import collide, load_heightfield
+
+        if self.ground_stale:
+            grounds = data_block.inputArrayValue(cls.ground)
+            meshes = []
+            for i in range(len(grounds)):
+                grounds.jumpToPhysicalElement(i)
+                mesh = grounds.inputValue().asMesh()
+                if not mesh.isNull():
+                    meshes.append(mesh)
+            self.heightfield = load_heightfield(meshes) if meshes else None
+            self.ground_stale = False
+
+        # Plug data straight to NumPy, the particle arrays are never boxed
+        # one value at a time by getAttr
+        positions = np.array(om.MFnVectorArrayData(data_block.inputValue(cls.position).data()).array(),
+                             dtype=np.float64).reshape(-1, 3)
+        ages = np.array(om.MFnDoubleArrayData(data_block.inputValue(cls.age).data()).array(), dtype=np.float64)
+        lifespans, hits = collide(self.heightfield, positions, ages, data_block.inputValue(cls.lifespan).asDouble())
+
+        for attribute, values in ((cls.out_lifespan, lifespans), (cls.out_splash_rate, hits.astype(np.float64))):
+            handle = data_block.outputValue(attribute)
+            handle.setMObject(om.MFnDoubleArrayData().create(om.MDoubleArray(values.tolist())))
+            handle.setClean()
+        data_block.setClean(plug)
+
+
+NODE_CLASSES = [ZeusCloudDriftNode, ZeusRainCullerNode, ZeusGroundCollisionNode]
@@ -0,0 +1,208 @@
+import ctypes
+import hashlib
+import os
+
+import numpy as np
+import maya.cmds as cmds
+
+from zeus_cache import bake_fluid_cache, detach_fluid_cache, workspace_cache_directory
+from zeus_utils import *
+
+
+# Baked cloud detail noise.
+# The cloud details come from the Perlin opacity texture of the container,
+# evaluated by the fluid shader for every shading sample of every render.
+# Instead, the fractal noise is generated once with NumPy for the texture
+# settings of the container, stored as a .npy volume (memory mapped when
+# read back) and written to the container density grid. The opacity
+# texture is switched off and the container keeps its Y gradient opacity
+# input, so the cloud shape and the density slider (opacityInputBias)
+# still work without baking again.
+#
+# The noise is periodic over the container, so the drift (textureOrigin
+# of the zeusCloudDrift node) is applied by shifting the baked volume
+# instead of generating it again: the shifted volume of every frame of
+# the playback range is baked to a fluid cache referenced by the scene
+# (see ZeusNoiseVolume), so batch renders see the same drift.
+
+
+def noise_settings(fluid_shape):
+    return {attribute: cmds.getAttr(f'{fluid_shape}.{attribute}') for attribute in NOISE_ATTRIBUTES}
+
+
+# Periodic value noise on a (depth, height, width) grid of voxels,
+# cells is the number of lattice cells along (z, y, x)
+def periodic_noise(shape, cells, random):
+    lattice = random.random(cells, dtype=np.float32)
+
+    # Interpolate along x, then y, then z (separable smooth trilinear)
+    for axis in (2, 1, 0):
+        count = cells[axis]
+        position = (np.arange(shape[axis], dtype=np.float32) + 0.5) / shape[axis] * count
+        index = np.floor(position).astype(np.int64)
+        fraction = position - index
+        fraction = fraction * fraction * (3.0 - 2.0 * fraction)
+        weights_shape = [1, 1, 1]
+        weights_shape[axis] = -1
+        fraction = fraction.reshape(weights_shape)
+
+        lower = np.take(lattice, index % count, axis=axis)
+        upper = np.take(lattice, (index + 1) % count, axis=axis)
+        lattice = lower + (upper - lower) * fraction
+    return lattice
+
+
+# Fractal noise volume (depth, height, width) matching the container
+# texture settings. One texture unit spans the container width, the
+# frequency of every octave is rounded to whole periods over the
+# container so that the volume tiles.
+def noise_volume(settings, seed=NOISE_SEED):
+    shape = (int(settings['resolutionD']), int(settings['resolutionH']), int(settings['resolutionW']))
+    extents = (settings['dimensionsD'] / settings['dimensionsW'], settings['dimensionsH'] / settings['dimensionsW'], 1.0)
+    random = np.random.default_rng(seed)
+
+    volume = np.zeros(shape, dtype=np.float32)
+    frequency = settings['frequency']
+    amplitude = 1.0
+    total_amplitude = 0.0
+    for _ in range(max(int(settings['depthMax']), 1)):
+        cells = tuple(max(int(round(frequency * extent)), 1) for extent in extents)
+        octave = periodic_noise(shape, cells, random)
+        if settings['inflection']:
+            octave = np.abs(2.0 * octave - 1.0)
+        volume += amplitude * octave
+        total_amplitude += amplitude
+        frequency *= settings['frequencyRatio']
+        amplitude *= settings['ratio']
+
+    volume /= total_amplitude
+    if settings['invertTexture']:
+        volume = 1.0 - volume
+    volume = np.clip((volume - settings['threshold']) * settings['amplitude'], 0.0, 1.0)
+
+    # Same as the opacity texture gain, 0 leaves the density at 1
+    gain = settings['opacityTexGain']
+    return (1.0 - gain) + gain * volume
+
+
+def noise_path(settings, seed=NOISE_SEED):
+    directory = os.path.join(cache_root(), 'noise')
+    os.makedirs(directory, exist_ok=True)
+    key = hashlib.sha1(repr((sorted(settings.items()), seed)).encode()).hexdigest()[:16]
+    return os.path.join(directory, f'clouds_{key}.npy')
+
+
+# Baked volume for the settings, generated only when not on disk yet
+def load_noise_volume(settings, seed=NOISE_SEED):
+    path = noise_path(settings, seed)
+    if not os.path.exists(path):
+        volume = noise_volume(settings, seed)
+        # Written next to the final file first, readers never see a partial volume
+        temporary_path = path + '.tmp.npy'
+        stored = np.lib.format.open_memmap(temporary_path, mode='w+', dtype=np.float32, shape=volume.shape)
+        stored[...] = volume
+        stored.flush()
+        del stored
+        os.replace(temporary_path, path)
+        log(f'Baked cloud noise {volume.shape[2]}x{volume.shape[1]}x{volume.shape[0]} to {path}')
+    return np.load(path, mmap_mode='r')
+
+
+# Volume translated by offset voxels (x, y, z), wrapping around,
+# fractional offsets are linearly interpolated
+def shift_volume(volume, offset):
+    shifted = np.asarray(volume)
+    for axis, value in zip((2, 1, 0), offset):
+        whole = int(np.floor(value))
+        fraction = value - whole
+        lower = np.roll(shifted, -whole, axis=axis)
+        if fraction:
+            upper = np.roll(shifted, -whole - 1, axis=axis)
+            shifted = lower + (upper - lower) * np.float32(fraction)
+        else:
+            shifted = lower
+    return shifted
+
+
+# The API 2.0 has no MFnFluid, the API 1.0 one gives the address of the
+# grids (x fastest, then y, then z: the C order of the volumes)
+def fluid_function(fluid_shape):
+    import maya.OpenMaya as om1
+    import maya.OpenMayaFX as omfx
+
+    selection = om1.MSelectionList()
+    selection.add(fluid_shape)
+    node = om1.MObject()
+    selection.getDependNode(0, node)
+    return omfx.MFnFluid(node)
+
+
+# Copy a (depth, height, width) volume to the density grid of a fluid
+def write_density_grid(fluid_shape, volume):
+    fluid_fn = fluid_function(fluid_shape)
+    if fluid_fn.gridSize() != volume.size:
+        raise RuntimeError(f'{fluid_shape} grid does not match the baked noise ({volume.size} voxels)')
+    address = int(fluid_fn.density())
+    if not address:
+        raise RuntimeError(f'{fluid_shape} has no density grid')
+
+    data = np.ascontiguousarray(volume, dtype=np.float32)
+    ctypes.memmove(address, data.ctypes.data, data.nbytes)
+    fluid_fn.updateGrid()
+
+
+# Baked noise of a cloud container, following the drift.
+# The textureOrigin of the drift node over the playback range (converted
+# to voxels) gives the shift of every frame. When it moves, the shifted
+# volumes are baked to a fluid cache keyed by the noise settings and the
+# shifts, otherwise the volume is written once to the density grid.
+class ZeusNoiseVolume:
+    def __init__(self, model):
+        self.model = model
+        self.volume = None
+        self.settings = None
+
+    def update(self):
+        settings = noise_settings(self.model.cloud_shape)
+        if settings != self.settings:
+            self.settings = settings
+            self.volume = load_noise_volume(settings)
+
+        # Static grid instead of the gradient and the opacity texture
+        cmds.setAttr(f'{self.model.cloud_shape}.densityMethod', DENSITY_METHOD_STATIC_GRID)
+        cmds.setAttr(f'{self.model.cloud_shape}.opacityTexture', False)
+
+        start = int(cmds.playbackOptions(query=True, minTime=True))
+        end = int(cmds.playbackOptions(query=True, maxTime=True))
+        frames = np.arange(start, end + 1, dtype=np.float64)
+        offsets = self.voxel_offsets(frames)
+        if not np.ptp(offsets, axis=0).any():
+            detach_fluid_cache(self.model.cloud_shape)
+            write_density_grid(self.model.cloud_shape, shift_volume(self.volume, offsets[0]))
+            return
+
+        key = hashlib.sha1(repr((sorted(settings.items()), NOISE_SEED, frames.tolist(),
+                                 np.round(offsets, 6).tolist())).encode()).hexdigest()[:16]
+        directory = workspace_cache_directory(self.model.rig_id, 'noise', key)
+        bake_fluid_cache(self.model.cloud_shape, directory, frames.tolist(), lambda frame: write_density_grid(
+            self.model.cloud_shape, shift_volume(self.volume, offsets[int(frame) - start])))
+
+    # textureOrigin of the drift at every frame, in voxels of the container
+    def voxel_offsets(self, frames):
+        if not self.model.nodes.contains('cloud_drift'):
+            return np.zeros((len(frames), 3))
+        from zeus_export import drift_offsets
+
+        settings = self.settings
+        voxels_per_unit = np.array([
+            settings['dimensionsW'] / settings[f'dimensions{axis}'] * settings[f'resolution{axis}']
+            for axis in ('W', 'H', 'D')
+        ])
+        return drift_offsets(self.model, frames, frames_per_second()) * voxels_per_unit
+
+    # Back to the procedural gradient and texture
+    def detach(self):
+        if self.model.nodes.contains('cloud_shape'):
+            detach_fluid_cache(self.model.cloud_shape)
+            cmds.setAttr(f'{self.model.cloud_shape}.densityMethod', DENSITY_METHOD_GRADIENT)
+            cmds.setAttr(f'{self.model.cloud_shape}.opacityTexture', True)
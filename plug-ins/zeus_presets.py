@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import re
+
+import maya.api.OpenMaya as om
+import maya.cmds as cmds
+
+from zeus_handles import apply_modifier
+from zeus_utils import *
+
+
+# Attribute presets (presets/attrPresets/<nodeType>/<name>.mel) are parsed
+# once into a table of the attributes that differ from the node defaults.
+# The table is cached on disk, keyed by the preset modification time and
+# the Maya version, and applied with a single MDGModifier instead of
+# evaluating applyAttrPreset (hundreds of blendAttr commands) every time.
+
+PRESET_LINE = re.compile(r'^blendAttr(Str)?\s+"([^"]+)"\s+(.*?)\s*;\s*$')
+MEL_ESCAPES = {'n': '\n', 't': '\t', '\\': '\\', '"': '"', "'": "'"}
+
+# Parsed tables already used in this session
+preset_tables = {}
+
+
+def preset_path(node_type, preset_name):
+    return os.path.join(PRESET_DIRECTORY, node_type, preset_name + '.mel')
+
+
+def cache_directory():
+    directory = os.path.join(cache_root(), 'presets')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def unescape_mel_string(text):
+    return re.sub(r'\\(.)', lambda match: MEL_ESCAPES.get(match.group(1), match.group(1)), text)
+
+
+# Every (attribute, value) of a preset file, in file order
+def parse_preset(path):
+    attributes = []
+    with open(path) as preset_file:
+        for line in preset_file:
+            match = PRESET_LINE.match(line.strip())
+            if not match:
+                continue
+            is_string, attribute, value = match.groups()
+            if is_string:
+                attributes.append((attribute, unescape_mel_string(value[1:-1])))
+            else:
+                attributes.append((attribute, float(value)))
+    return attributes
+
+
+def find_plug(node, attribute):
+    selection = om.MSelectionList()
+    try:
+        selection.add(f'{node}.{attribute}')
+        return selection.getPlug(0)
+    except RuntimeError:
+        return None
+
+
+# Kind of value a plug holds: 'i' (integer, boolean, enum), 's' (string),
+# 'a'/'l'/'t' (angle, distance, time in UI units) or 'd' (double)
+def plug_kind(plug):
+    attribute = plug.attribute()
+    if attribute.hasFn(om.MFn.kEnumAttribute):
+        return 'i'
+    if attribute.hasFn(om.MFn.kTypedAttribute):
+        return 's'
+    if attribute.hasFn(om.MFn.kUnitAttribute):
+        unit_type = om.MFnUnitAttribute(attribute).unitType()
+        return {
+            om.MFnUnitAttribute.kAngle: 'a',
+            om.MFnUnitAttribute.kDistance: 'l',
+            om.MFnUnitAttribute.kTime: 't',
+        }.get(unit_type, 'd')
+    if attribute.hasFn(om.MFn.kNumericAttribute):
+        numeric_type = om.MFnNumericAttribute(attribute).numericType()
+        if numeric_type in (om.MFnNumericData.kFloat, om.MFnNumericData.kDouble):
+            return 'd'
+        return 'i'
+    return None
+
+
+def read_plug(plug, kind):
+    if kind == 's':
+        return plug.asString()
+    if kind == 'a':
+        return plug.asMAngle().asUnits(om.MAngle.uiUnit())
+    if kind == 'l':
+        return plug.asMDistance().asUnits(om.MDistance.uiUnit())
+    if kind == 't':
+        return plug.asMTime().asUnits(om.MTime.uiUnit())
+    return plug.asDouble()
+
+
+def add_plug_value(modifier, plug, kind, value):
+    if kind == 's':
+        modifier.newPlugValueString(plug, value)
+    elif kind == 'i':
+        modifier.newPlugValueInt(plug, int(round(value)))
+    elif kind == 'a':
+        modifier.newPlugValueMAngle(plug, om.MAngle(value, om.MAngle.uiUnit()))
+    elif kind == 'l':
+        modifier.newPlugValueMDistance(plug, om.MDistance(value, om.MDistance.uiUnit()))
+    elif kind == 't':
+        modifier.newPlugValueMTime(plug, om.MTime(value, om.MTime.uiUnit()))
+    else:
+        modifier.newPlugValueDouble(plug, value)
+
+
+# Attributes of the preset that differ from the defaults, as a list of
+# (attribute, kind, value). Built from a freshly created node the first
+# time, then read from the session or disk cache.
+def preset_table(node, node_type, preset_name):
+    path = preset_path(node_type, preset_name)
+    stat = os.stat(path)
+    cache_key = hashlib.sha1(
+        f'{path}|{stat.st_mtime_ns}|{stat.st_size}|{cmds.about(version=True)}'.encode()
+    ).hexdigest()
+
+    if cache_key in preset_tables:
+        return preset_tables[cache_key]
+
+    cache_path = os.path.join(cache_directory(), f'{node_type}_{preset_name}_{cache_key[:16]}.json')
+    if os.path.exists(cache_path):
+        with open(cache_path) as cache_file:
+            table = [tuple(row) for row in json.load(cache_file)]
+    else:
+        table = []
+        for attribute, value in parse_preset(path):
+            plug = find_plug(node, attribute)
+            if plug is None:
+                continue
+            kind = plug_kind(plug)
+            if kind is None or (kind == 's') != isinstance(value, str):
+                continue
+            # The node has just been created, its values are the defaults
+            default = read_plug(plug, kind)
+            if kind == 's':
+                differs = default != value
+            else:
+                differs = abs(default - value) > PRESET_TOLERANCE
+            if differs:
+                table.append((attribute, kind, value))
+
+        with open(cache_path, 'w') as cache_file:
+            json.dump(table, cache_file, separators=(',', ':'))
+        log(f'Cached preset {preset_name}: {len(table)} attributes differ from the defaults')
+
+    preset_tables[cache_key] = table
+    return table
+
+
+# Apply a preset to a node that has just been created
+def apply_preset(node, node_type, preset_name):
+    # Presets outside of the Zeus folder are left to Maya
+    if not os.path.exists(preset_path(node_type, preset_name)):
+        import maya.mel as mel
+        mel.eval(f'applyAttrPreset "{node}" "{preset_name}" 1')
+        return
+
+    modifier = om.MDGModifier()
+    for attribute, kind, value in preset_table(node, node_type, preset_name):
+        plug = find_plug(node, attribute)
+        # Same as applyAttrPreset, connected and locked attributes are skipped
+        if plug is None or plug.isDestination or plug.isLocked:
+            continue
+        add_plug_value(modifier, plug, kind, value)
+    apply_modifier(modifier)
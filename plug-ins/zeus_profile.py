@@ -0,0 +1,147 @@
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+
+from zeus_utils import *
+
+
+# Session profiler of the controller and the model.
+# instrument_class wraps the methods of a class once (at import), the
+# wrappers only check profiler.enabled while profiling is off. When it is
+# on, every call records its wall time and the number of maya.cmds
+# commands it issued (cmds functions are wrapped for the time being), and
+# ZeusModel.flush_writes reports the time spent per attribute write.
+# Calls are also kept as Chrome trace events (chrome://tracing, Perfetto).
+class ZeusProfiler:
+    def __init__(self):
+        self.enabled = False
+        self.command_count = 0
+        self.command_functions = {}
+        self.reset()
+
+    def reset(self):
+        # name -> [calls, seconds, commands]
+        self.calls = {}
+        # attribute -> [writes, seconds]
+        self.writes = {}
+        self.events = []
+        self.start_time = time.perf_counter()
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.count_commands()
+        self.enabled = True
+        log('Profiling enabled')
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        self.restore_commands()
+        log('Profiling disabled')
+
+    def count_commands(self):
+        import maya.cmds as cmds
+
+        for name in dir(cmds):
+            function = getattr(cmds, name)
+            if name.startswith('_') or not callable(function):
+                continue
+            self.command_functions[name] = function
+            setattr(cmds, name, self.counted(function))
+
+    def counted(self, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            self.command_count += 1
+            return function(*args, **kwargs)
+        return wrapper
+
+    def restore_commands(self):
+        import maya.cmds as cmds
+
+        for name, function in self.command_functions.items():
+            setattr(cmds, name, function)
+        self.command_functions = {}
+
+    def call(self, name, function, args, kwargs):
+        command_count = self.command_count
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            end = time.perf_counter()
+            commands = self.command_count - command_count
+
+            stats = self.calls.setdefault(name, [0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += end - start
+            stats[2] += commands
+
+            if len(self.events) < PROFILE_TRACE_LIMIT:
+                self.events.append({
+                    'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': threading.get_ident(),
+                    'ts': (start - self.start_time) * 1e6, 'dur': (end - start) * 1e6,
+                    'args': {'commands': commands},
+                })
+
+    # Time of a flush, shared between the attributes it wrote
+    def add_writes(self, attributes, seconds):
+        for attribute in attributes:
+            stats = self.writes.setdefault(attribute, [0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds / len(attributes)
+
+    # Rows of (name, calls, total ms, mean ms, commands), slowest first
+    def call_report(self):
+        rows = [(name, calls, seconds * 1000.0, seconds * 1000.0 / calls, commands)
+                for name, (calls, seconds, commands) in self.calls.items()]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    # Rows of (attribute, writes, total ms), slowest first
+    def write_report(self):
+        rows = [(attribute, writes, seconds * 1000.0) for attribute, (writes, seconds) in self.writes.items()]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def export_trace(self, path):
+        trace = {
+            'traceEvents': self.events,
+            'displayTimeUnit': 'ms',
+            'otherData': {
+                'calls': {name: dict(zip(('calls', 'seconds', 'commands'), stats))
+                          for name, stats in self.calls.items()},
+                'writes': {attribute: dict(zip(('writes', 'seconds'), stats))
+                           for attribute, stats in self.writes.items()},
+            },
+        }
+        with open(path, 'w') as trace_file:
+            json.dump(trace, trace_file)
+        log(f'Profile exported to {path} ({len(self.events)} events)')
+
+
+profiler = ZeusProfiler()
+
+
+# Wrap the methods of a class accepted by predicate(name) (every public
+# method by default) so they are profiled while the profiler is enabled
+def instrument_class(cls, predicate=None):
+    for name, function in list(vars(cls).items()):
+        if not inspect.isfunction(function) or name.startswith('_'):
+            continue
+        if predicate is not None and not predicate(name):
+            continue
+        setattr(cls, name, instrumented(f'{cls.__name__}.{name}', function))
+    return cls
+
+
+def instrumented(name, function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not profiler.enabled:
+            return function(*args, **kwargs)
+        return profiler.call(name, function, args, kwargs)
+    return wrapper
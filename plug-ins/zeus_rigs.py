@@ -0,0 +1,147 @@
+import maya.api.OpenMaya as om
+import maya.cmds as cmds
+
+from zeus_handles import ZeusNodeRegistry
+from zeus_utils import *
+
+
+# Index of every Zeus rig in the scene: rig id -> ZeusNodeRegistry.
+# Rig groups are tagged with a zeusRigId attribute and reference their
+# nodes through message attributes (zeusNode_<key>), so all the rigs are
+# found with a single ls and one listConnections per rig. After that the
+# index is kept up to date incrementally from DG callbacks, a full scan
+# only happens when a scene is opened or created.
+class ZeusRigRegistry:
+    __slots__ = ('rigs', 'added_nodes', 'callback_ids')
+
+    def __init__(self):
+        self.rigs = {}
+        self.added_nodes = []
+        self.callback_ids = [
+            om.MSceneMessage.addCallback(om.MSceneMessage.kAfterOpen, self.on_scene_changed),
+            om.MSceneMessage.addCallback(om.MSceneMessage.kAfterNew, self.on_scene_changed),
+            om.MDGMessage.addNodeAddedCallback(self.on_node_added, 'transform'),
+            om.MDGMessage.addNodeRemovedCallback(self.on_node_removed, 'transform'),
+        ]
+        self.scan()
+
+    def scan(self):
+        self.clear()
+        groups = cmds.ls(f'*.{RIG_ID_ATTRIBUTE}', recursive=True, objectsOnly=True, long=True) or []
+        for group in groups:
+            self.index_rig(group)
+        log(f'Found {len(self.rigs)} weather rig(s)')
+
+    def index_rig(self, group):
+        rig_id = cmds.getAttr(f'{group}.{RIG_ID_ATTRIBUTE}')
+        nodes = ZeusNodeRegistry()
+        nodes.register('group', group)
+
+        # Pairs of (group plug, connected node)
+        connections = cmds.listConnections(group, source=True, destination=False,
+                                           connections=True, plugs=False) or []
+        for group_plug, node in zip(connections[::2], connections[1::2]):
+            attribute = group_plug.split('.')[-1]
+            if attribute.startswith(RIG_NODE_ATTRIBUTE_PREFIX):
+                nodes.register(attribute[len(RIG_NODE_ATTRIBUTE_PREFIX):], node)
+
+        if rig_id in self.rigs:
+            self.rigs[rig_id].remove_callbacks()
+        self.rigs[rig_id] = nodes
+        return nodes
+
+    def rig(self, rig_id):
+        return self.rigs.get(rig_id)
+
+    def rig_ids(self):
+        return sorted(self.rigs)
+
+    def add_rig(self, rig_id, group):
+        if not cmds.attributeQuery(RIG_ID_ATTRIBUTE, node=group, exists=True):
+            cmds.addAttr(group, longName=RIG_ID_ATTRIBUTE, dataType='string')
+        cmds.setAttr(f'{group}.{RIG_ID_ATTRIBUTE}', rig_id, type='string')
+
+        nodes = ZeusNodeRegistry()
+        nodes.register('group', group)
+        self.rigs[rig_id] = nodes
+        return nodes
+
+    # Add a node to a rig and tag it on the rig group
+    def register_node(self, rig_id, key, name):
+        nodes = self.rigs[rig_id]
+        nodes.register(key, name)
+        if key == 'group':
+            return
+
+        group = nodes.name('group')
+        attribute = RIG_NODE_ATTRIBUTE_PREFIX + key
+        source = f'{nodes.name(key)}.message'
+        destination = f'{group}.{attribute}'
+        # Registering a node again leaves the scene (and the undo queue) alone
+        if not cmds.attributeQuery(attribute, node=group, exists=True):
+            cmds.addAttr(group, longName=attribute, attributeType='message')
+        elif cmds.isConnected(source, destination):
+            return
+        cmds.connectAttr(source, destination, force=True)
+
+    def on_scene_changed(self, *args):
+        self.scan()
+
+    def on_node_added(self, node, *args):
+        # Attributes are added after the node is created (import, duplicate),
+        # the new transforms are checked once Maya is idle
+        if not self.added_nodes:
+            cmds.evalDeferred(self.index_added_nodes, lowestPriority=True)
+        self.added_nodes.append(om.MObjectHandle(node))
+
+    def index_added_nodes(self):
+        handles = self.added_nodes
+        self.added_nodes = []
+        for handle in handles:
+            if not handle.isValid():
+                continue
+            node_fn = om.MFnDagNode(handle.object())
+            if node_fn.hasAttribute(RIG_ID_ATTRIBUTE) and not self.find_group(handle.object()):
+                self.index_rig(node_fn.fullPathName())
+
+    def on_node_removed(self, node, *args):
+        rig_id = self.find_group(node)
+        if rig_id is not None:
+            self.rigs.pop(rig_id).remove_callbacks()
+
+    # Rig id of a rig group node (None for any other node)
+    def find_group(self, node):
+        for rig_id, nodes in self.rigs.items():
+            handle = nodes.handles.get('group')
+            if handle is not None and handle.isValid() and handle.object() == node:
+                return rig_id
+        return None
+
+    def clear(self):
+        for nodes in self.rigs.values():
+            nodes.remove_callbacks()
+        self.rigs = {}
+
+    def remove_callbacks(self):
+        self.clear()
+        for callback_id in self.callback_ids:
+            om.MMessage.removeCallback(callback_id)
+        self.callback_ids = []
+
+
+# Registry shared by every ZeusModel of the session
+shared_registry = None
+
+
+def rig_registry():
+    global shared_registry
+    if shared_registry is None:
+        shared_registry = ZeusRigRegistry()
+    return shared_registry
+
+
+def release_rig_registry():
+    global shared_registry
+    if shared_registry is not None:
+        shared_registry.remove_callbacks()
+        shared_registry = None
@@ -0,0 +1,194 @@
+# Parallel rain simulation of a shot (mayapy, render farm, batch nodes).
+#
+# Usage:
+#   mayapy zeus_simulate.py <scene> [--start <frame>] [--end <frame>]
+#                           [--workers <count>] [--rig <id>] [--output <scene>]
+#
+# The rain particles live for a fixed lifespan, so the rain at any frame
+# only depends on the frames of the lifespan before it. The stale frames
+# of the rain cache (see zeus_cache) are split into chunks, every chunk is
+# simulated in its own mayapy process from a preroll covering the
+# lifespan, and the chunk frames are stitched into the rig cache, which
+# is then attached and saved with the scene.
+#
+# A chunk starts from its own preroll, so it rains the same weather but
+# not the same drops as a single simulation would: the emission
+# randomness and the particle ids follow the start of the simulation,
+# the drops of two chunks do not continue each other at their boundary
+# (per-particle ids are not stable across chunks). Every chunk also
+# simulates the first frame of the next one, continuously from its own
+# frames, and the particle count and rain bounds of both versions of
+# that frame are compared, boundaries differing more than
+# CHUNK_BOUNDARY_TOLERANCE are reported.
+#
+# Workers are started with:
+#   mayapy zeus_simulate.py <scene> --chunk <start> <end> --directory <dir>
+import argparse
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+PLUGIN_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+if PLUGIN_DIRECTORY not in sys.path:
+    sys.path.insert(0, PLUGIN_DIRECTORY)
+
+
+# Split the frame ranges in chunks of at least min_size frames, about
+# one per worker. Every chunk pays for its preroll, so chunks shorter
+# than the preroll would cost more than they save.
+def split_ranges(ranges, workers, min_size=1):
+    frame_count = sum(end - start + 1 for start, end in ranges)
+    chunk_size = max(int(math.ceil(frame_count / workers)), min_size)
+
+    chunks = []
+    for start, end in ranges:
+        chunk_count = max(int(round((end - start + 1) / chunk_size)), 1)
+        bounds = [start + round(i * (end - start + 1) / chunk_count) for i in range(chunk_count + 1)]
+        chunks += [(first, last - 1) for first, last in zip(bounds[:-1], bounds[1:])]
+    return chunks
+
+
+# ZeusCacheManager.update simulator running the chunks on a local pool
+# of mayapy processes
+class ParallelSimulator:
+    def __init__(self, scene, rig_id, workers=None):
+        self.scene = scene
+        self.rig_id = rig_id
+        self.workers = workers or os.cpu_count() or 1
+
+    def __call__(self, manager, ranges, directory):
+        from zeus_cache import merge_frames
+        from zeus_utils import log
+
+        chunks = split_ranges(ranges, self.workers, manager.preroll_frames())
+        log(f'Simulating {len(chunks)} rain chunk(s) on {self.workers} worker(s)')
+
+        root_directory = tempfile.mkdtemp(prefix='zeus_chunks_')
+        try:
+            chunk_directories = [os.path.join(root_directory, f'{start}_{end}') for start, end in chunks]
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                # Threads only wait for the processes
+                list(executor.map(self.simulate_chunk, chunks, chunk_directories))
+            self.check_boundaries(chunks, chunk_directories)
+
+            # Chunks only hold their own frames (not the preroll), stitching
+            # is moving them into the cache
+            cache_name = manager.cache_name()
+            for (start, end), chunk_directory in zip(chunks, chunk_directories):
+                merge_frames(chunk_directory, directory, cache_name, start, end)
+            shutil.copy(os.path.join(chunk_directories[0], cache_name + '.template.xml'),
+                        os.path.join(directory, cache_name + '.template.xml'))
+        finally:
+            shutil.rmtree(root_directory, ignore_errors=True)
+
+    # Compare the first frame of every chunk with the same frame simulated
+    # by the chunk before it
+    def check_boundaries(self, chunks, chunk_directories):
+        from zeus_utils import CHUNK_BOUNDARY_TOLERANCE, log
+
+        stats = []
+        for chunk_directory in chunk_directories:
+            with open(os.path.join(chunk_directory, BOUNDARY_STATS_FILE)) as stats_file:
+                stats.append(json.load(stats_file))
+
+        for index in range(1, len(chunks)):
+            frame = chunks[index][0]
+            if chunks[index - 1][1] + 1 != frame:
+                continue
+            continuous, restarted = stats[index - 1][str(frame)], stats[index][str(frame)]
+            count_difference = (abs(continuous['count'] - restarted['count'])
+                                / max(continuous['count'], restarted['count'], 1))
+            size = math.dist(continuous['bounds'][:3], continuous['bounds'][3:])
+            bounds_difference = (max(abs(a - b) for a, b in zip(continuous['bounds'], restarted['bounds']))
+                                 / max(size, 1e-6))
+            if max(count_difference, bounds_difference) > CHUNK_BOUNDARY_TOLERANCE:
+                log(f'Rain chunks differ at frame {frame}: {continuous["count"]} particles simulated '
+                    f'continuously, {restarted["count"]} from the preroll '
+                    f'(bounds {bounds_difference:.1%} apart), consider fewer workers')
+
+    def simulate_chunk(self, chunk, directory):
+        start, end = chunk
+        command = [sys.executable, os.path.abspath(__file__), self.scene,
+                   '--chunk', str(start), str(end), '--directory', directory, '--rig', self.rig_id]
+        process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        if process.returncode != 0:
+            raise RuntimeError(f'Rain chunk {start}-{end} failed:\n{process.stdout[-2000:]}')
+
+
+# Statistics of the boundary frames written by every chunk
+BOUNDARY_STATS_FILE = 'boundary.json'
+
+
+# Worker side, simulate start-end of the scene into directory, plus the
+# first frame of the next chunk for the boundary check
+def simulate_chunk(scene, start, end, directory, rig_id=None):
+    import maya.cmds as cmds
+    from zeus_batch import initialize_maya, open_model
+    from zeus_cache import ZeusCacheManager
+
+    initialize_maya()
+    cmds.file(scene, open=True, force=True)
+
+    model = open_model(rig_id)
+    manager = ZeusCacheManager(model)
+    # A cache saved with the scene would replace the simulation
+    manager.detach()
+    os.makedirs(directory, exist_ok=True)
+    manager.simulate(start, end + 1, directory)
+
+    # Both boundary frames, read back from the chunk cache
+    manager.write_description(directory, start, end + 1)
+    manager.attach(directory)
+    stats = {frame: manager.rain_stats(frame) for frame in (start, end + 1)}
+    manager.detach()
+    with open(os.path.join(directory, BOUNDARY_STATS_FILE), 'w') as stats_file:
+        json.dump(stats, stats_file)
+    model.close()
+
+
+def run(scene, start=None, end=None, workers=None, rig_id=None, output=None):
+    import maya.cmds as cmds
+    from zeus_batch import initialize_maya, open_model
+    from zeus_cache import ZeusCacheManager
+    from zeus_utils import DEFAULT_RIG_ID, log
+
+    initialize_maya()
+    cmds.file(scene, open=True, force=True)
+
+    model = open_model(rig_id)
+    # Workers open the scene file, it is not modified before the update
+    simulator = ParallelSimulator(os.path.abspath(scene), rig_id or DEFAULT_RIG_ID, workers)
+    ZeusCacheManager(model).update(start, end, simulator)
+    model.close()
+
+    if output:
+        cmds.file(rename=output)
+    cmds.file(save=True, force=True)
+    log(f'Saved {output or scene}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Simulate the Zeus rain cache of a scene on several processes')
+    parser.add_argument('scene', help='scene to open')
+    parser.add_argument('--start', type=int, help='first frame (playback start by default)')
+    parser.add_argument('--end', type=int, help='last frame (playback end by default)')
+    parser.add_argument('--workers', type=int, help='number of mayapy processes (one per core by default)')
+    parser.add_argument('--rig', help='weather rig id')
+    parser.add_argument('--output', help='save to this scene instead of overwriting the input one')
+    parser.add_argument('--chunk', type=int, nargs=2, metavar=('START', 'END'), help=argparse.SUPPRESS)
+    parser.add_argument('--directory', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.chunk:
+        simulate_chunk(args.scene, args.chunk[0], args.chunk[1], args.directory, args.rig)
+    else:
+        run(args.scene, args.start, args.end, args.workers, args.rig, args.output)
+
+
+if __name__ == '__main__':
+    main()
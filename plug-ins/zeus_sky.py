@@ -0,0 +1,80 @@
+import numpy as np
+
+from zeus_utils import *
+
+
+# Time of day of the sky.
+# The sun position, the sky intensity and the tints are computed for a
+# whole frame range at once (a lookup table with one row per frame) and
+# baked as curves on the aiPhysicalSky (see ZeusModel.bake_time_of_day),
+# so nothing is evaluated per frame. The storminess of the clouds darkens
+# and greys the sky of the same frames.
+
+
+# Sun elevation and azimuth (degrees, azimuth clockwise from north) for
+# every hour of a day of the year at a latitude
+def sun_position(hours, day_of_year, latitude):
+    hours = np.asarray(hours, dtype=np.float64)
+    declination = np.radians(23.44) * np.sin(2.0 * np.pi * (284.0 + day_of_year) / 365.0)
+    hour_angle = np.radians(15.0 * (hours - 12.0))
+    latitude = np.radians(latitude)
+
+    sin_elevation = (np.sin(latitude) * np.sin(declination)
+                     + np.cos(latitude) * np.cos(declination) * np.cos(hour_angle))
+    elevation = np.arcsin(np.clip(sin_elevation, -1.0, 1.0))
+    # From the south, westwards
+    azimuth = np.arctan2(np.sin(hour_angle),
+                         np.cos(hour_angle) * np.sin(latitude) - np.tan(declination) * np.cos(latitude))
+    return np.degrees(elevation), (np.degrees(azimuth) + 180.0) % 360.0
+
+
+def smoothstep(edge0, edge1, value):
+    t = np.clip((value - edge0) / (edge1 - edge0), 0.0, 1.0)
+    return t * t * (3.0 - 2.0 * t)
+
+
+# Lookup table of the sky for every frame (columns of the frames length,
+# tints of (frames, 3)). storminess is the cloud storminess (0 to 1) of
+# every frame.
+def time_of_day_table(settings, frames, storminess):
+    frames = np.asarray(frames, dtype=np.float64)
+    start, end = settings['start'], settings['end']
+    weights = np.clip((frames - start) / max(end - start, 1.0), 0.0, 1.0)
+    hours = settings['start_hour'] + (settings['end_hour'] - settings['start_hour']) * weights
+
+    elevation, azimuth = sun_position(hours, settings['day_of_year'], settings['latitude'])
+    # Unwrapped, the curves never jump from 360 back to 0
+    azimuth = np.degrees(np.unwrap(np.radians(azimuth + settings['north_offset'])))
+
+    # Night to day around the horizon, warm tints while the sun is low
+    daylight = smoothstep(SKY_TWILIGHT_ELEVATION, 0.0, elevation)
+    intensity = SKY_INTENSITY * (SKY_NIGHT_INTENSITY + (1.0 - SKY_NIGHT_INTENSITY) * daylight)
+    warmth = (1.0 - smoothstep(0.0, SKY_WARM_ELEVATION, elevation))[:, None]
+    sky_tint = np.asarray(SKY_TINT) + (np.asarray(SKY_HORIZON_TINT) - np.asarray(SKY_TINT)) * warmth
+    sun_tint = 1.0 + (np.asarray(SUN_HORIZON_TINT) - 1.0) * warmth
+
+    # Storms darken the sky and grey the tints
+    storminess = np.clip(np.asarray(storminess, dtype=np.float64), 0.0, 1.0)
+    intensity = intensity * (1.0 - SKY_STORM_DARKENING * storminess)
+    grey = (storminess * SKY_STORM_DESATURATION)[:, None]
+    sky_tint = sky_tint + (sky_tint.mean(axis=1, keepdims=True) - sky_tint) * grey
+    sun_tint = sun_tint + (sun_tint.mean(axis=1, keepdims=True) - sun_tint) * grey
+
+    return {
+        'frame': frames,
+        'hour': hours,
+        'elevation': elevation,
+        'azimuth': azimuth,
+        'intensity': intensity,
+        'sky_tint': sky_tint,
+        'sun_tint': sun_tint,
+    }
+
+
+# (attribute, values) of the aiPhysicalSky for a table
+def table_to_attributes(table):
+    attributes = [(attribute, table[attribute]) for attribute in ('elevation', 'azimuth', 'intensity')]
+    for column, attribute in (('sky_tint', 'skyTint'), ('sun_tint', 'sunTint')):
+        for i, channel in enumerate(('R', 'G', 'B')):
+            attributes.append((f'{attribute}{channel}', table[column][:, i]))
+    return attributes
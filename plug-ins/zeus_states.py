@@ -0,0 +1,92 @@
+import json
+import os
+
+from zeus_utils import *
+
+
+# Snapshot of the weather: one value per Zeus parameter (the UI ones,
+# also used by the bake_timeline schedules), stored as a small JSON file.
+# ZeusModel.capture_state reads one from the scene, apply_state only
+# writes the attributes that differ and blend_states bakes the curves
+# going from one state to another.
+class ZeusWeatherState:
+    __slots__ = STATE_PARAMETERS
+
+    def __init__(self, **parameters):
+        unknown = set(parameters) - set(STATE_PARAMETERS)
+        if unknown:
+            raise ValueError(f'Unknown weather parameters: {", ".join(sorted(unknown))}')
+        for parameter in STATE_PARAMETERS:
+            value = parameters.get(parameter, DEFAULT_WEATHER_STATE[parameter])
+            if parameter == 'wind_direction':
+                value = tuple(float(component) for component in value)
+            else:
+                value = float(value)
+            setattr(self, parameter, value)
+
+    @staticmethod
+    def from_dict(data):
+        return ZeusWeatherState(**{parameter: data[parameter] for parameter in STATE_PARAMETERS if parameter in data})
+
+    def to_dict(self):
+        return {parameter: getattr(self, parameter) for parameter in STATE_PARAMETERS}
+
+    def __eq__(self, other):
+        return isinstance(other, ZeusWeatherState) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f'ZeusWeatherState({self.to_dict()})'
+
+    # State between self (weight 0) and other (weight 1)
+    def blend(self, other, weight):
+        parameters = {}
+        for parameter in STATE_PARAMETERS:
+            start, end = getattr(self, parameter), getattr(other, parameter)
+            if parameter == 'wind_direction':
+                parameters[parameter] = tuple(a + (b - a) * weight for a, b in zip(start, end))
+            else:
+                parameters[parameter] = start + (end - start) * weight
+        return ZeusWeatherState(**parameters)
+
+
+# Library of named states: the user ones first, then the shipped ones
+def state_directories():
+    return [USER_STATE_DIRECTORY, WEATHER_STATE_DIRECTORY]
+
+
+def state_names():
+    names = set()
+    for directory in state_directories():
+        if os.path.isdir(directory):
+            names.update(os.path.splitext(name)[0] for name in os.listdir(directory) if name.endswith('.json'))
+    return sorted(names)
+
+
+def state_path(name):
+    for directory in state_directories():
+        path = os.path.join(directory, name + '.json')
+        if os.path.exists(path):
+            return path
+    return None
+
+
+# Named state of the library, or a state file
+def load_state(name):
+    path = name if name.endswith('.json') else state_path(name)
+    if path is None:
+        raise ValueError(f'No weather state named {name}, expected one of {", ".join(state_names())}')
+    with open(path) as state_file:
+        return ZeusWeatherState.from_dict(json.load(state_file))
+
+
+# Save to the user library (or to a state file)
+def save_state(name, state):
+    if name.endswith('.json'):
+        path = name
+    else:
+        os.makedirs(USER_STATE_DIRECTORY, exist_ok=True)
+        path = os.path.join(USER_STATE_DIRECTORY, name + '.json')
+    with open(path, 'w') as state_file:
+        json.dump(state.to_dict(), state_file, indent=4)
+    log(f'Weather state saved to {path}')
+    return path
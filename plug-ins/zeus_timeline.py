@@ -0,0 +1,83 @@
+import csv
+import json
+
+import numpy as np
+
+from zeus_utils import *
+
+
+# Load a weather schedule from a CSV or JSON file.
+# Both are columnar: a 'frame' column plus one column per Zeus parameter
+# (see SCHEDULE_PARAMETERS), wind direction being split in
+# wind_direction_x/y/z. JSON files can also store wind_direction as a
+# list of 3-vectors.
+def load_schedule(path):
+    if str(path).lower().endswith('.json'):
+        with open(path) as json_file:
+            data = json.load(json_file)
+        # A list of rows is converted to columns
+        if isinstance(data, list):
+            data = {key: [row[key] for row in data] for key in data[0]}
+    else:
+        with open(path, newline='') as csv_file:
+            rows = list(csv.DictReader(csv_file))
+        data = {key: [float(row[key]) for row in rows] for key in rows[0]}
+
+    return normalize_schedule(data)
+
+
+# Convert every column of a schedule to float NumPy arrays
+def normalize_schedule(schedule):
+    if 'frame' not in schedule:
+        raise ValueError('Schedule without a frame column')
+
+    columns = {'frame': np.asarray(schedule['frame'], dtype=np.float64)}
+    for parameter in SCHEDULE_PARAMETERS:
+        if parameter == 'wind_direction':
+            if 'wind_direction' in schedule:
+                columns[parameter] = np.asarray(schedule[parameter], dtype=np.float64).reshape(-1, 3)
+            elif 'wind_direction_x' in schedule:
+                columns[parameter] = np.stack(
+                    [np.asarray(schedule[f'wind_direction_{axis}'], dtype=np.float64) for axis in 'xyz'],
+                    axis=1
+                )
+        elif parameter in schedule:
+            columns[parameter] = np.asarray(schedule[parameter], dtype=np.float64)
+
+    for parameter, values in columns.items():
+        if len(values) != len(columns['frame']):
+            raise ValueError(f'Schedule column {parameter} has {len(values)} values, expected {len(columns["frame"])}')
+
+    return columns
+
+
+# Remove the keys that linear interpolation between the remaining ones
+# reproduces within tolerance (Ramer-Douglas-Peucker on the curve).
+# Returns the mask of the keys to keep.
+def thin_keys(frames, values, tolerance):
+    count = len(frames)
+    keep = np.zeros(count, dtype=bool)
+    if count == 0:
+        return keep
+    keep[0] = True
+    keep[-1] = True
+
+    segments = [(0, count - 1)]
+    while segments:
+        first, last = segments.pop()
+        if last - first < 2:
+            continue
+
+        inner_frames = frames[first + 1:last]
+        slope = (values[last] - values[first]) / (frames[last] - frames[first])
+        interpolated = values[first] + slope * (inner_frames - frames[first])
+        error = np.abs(values[first + 1:last] - interpolated)
+
+        worst = int(np.argmax(error))
+        if error[worst] > tolerance:
+            split = first + 1 + worst
+            keep[split] = True
+            segments.append((first, split))
+            segments.append((split, last))
+
+    return keep
@@ -1,7 +1,9 @@
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer
 from PySide6.QtGui import QDoubleValidator, QIcon
 from PySide6.QtWidgets import *
 
+from zeus_utils import *
+
 class ZeusUI(QWidget):
     def __init__(self, controller, *args, **kwargs):
         super(ZeusUI, self).__init__(*args, **kwargs)
@@ -13,20 +15,128 @@ class ZeusUI(QWidget):
         self.setGeometry(50, 50, 350, 150)
         self.build_ui()
 
+        # Widgets follow the scene (time changes, scene opens), read back
+        # at most once every UI_SYNC_INTERVAL
+        self.sync_timer = QTimer(self)
+        self.sync_timer.setSingleShot(True)
+        self.sync_timer.timeout.connect(self.sync)
+        self.full_sync = False
+        self.sync(full=True)
+
     def build_ui(self):
         self.main_layout = QVBoxLayout(self)
         self.build_create_env_ui()
+        self.build_states_ui()
         self.build_clouds_ui()
         self.build_rain_ui()
         self.build_wind_ui()
+        self.build_sky_ui()
 
     def build_create_env_ui(self):
-        button = QPushButton('Create Environment', self)
-        button.clicked.connect(self.controller.create_env_button_action)
+        self.create_env_button = QPushButton('Create Environment', self)
+        self.create_env_button.clicked.connect(self.controller.create_env_button_action)
+        stats_button = QPushButton('Stats', self)
+        stats_button.clicked.connect(self.controller.show_stats_action)
         env_layout = QHBoxLayout(self)
-        env_layout.addWidget(button, alignment=Qt.AlignCenter)
+        env_layout.addWidget(self.create_env_button, alignment=Qt.AlignCenter)
+        env_layout.addWidget(stats_button)
+
+        # Creation progress, only shown while the environment is built
+        self.progress_bar = QProgressBar(self)
+        self.progress_bar.setFormat('%p% %v/%m')
+        self.cancel_button = QPushButton('Cancel', self)
+        self.cancel_button.clicked.connect(self.controller.create_env_cancel_action)
+        self.progress_label = QLabel(self)
+        progress_layout = QHBoxLayout()
+        progress_layout.addWidget(self.progress_bar)
+        progress_layout.addWidget(self.cancel_button)
+        self.hide_progress()
+
+        # Estimated render cost (see ZeusModel.estimate_cost), target
+        # seconds per frame of the auto-tune
+        self.cost_label = QLabel(self)
+        self.target_spin_box = QDoubleSpinBox(self)
+        self.target_spin_box.setRange(1.0, 3600.0)
+        self.target_spin_box.setSuffix(' s/frame')
+        self.target_spin_box.setValue(DEFAULT_TARGET_FRAME_SECONDS)
+        auto_tune_button = QPushButton('Auto-Tune', self)
+        auto_tune_button.clicked.connect(lambda: self.controller.cost_auto_tune_action(self.target_spin_box.value()))
+        calibrate_button = QPushButton('Calibrate', self)
+        calibrate_button.clicked.connect(self.controller.cost_calibrate_action)
+        cost_layout = QHBoxLayout()
+        cost_layout.addWidget(self.cost_label)
+        cost_layout.addStretch()
+        cost_layout.addWidget(self.target_spin_box)
+        cost_layout.addWidget(auto_tune_button)
+        cost_layout.addWidget(calibrate_button)
 
         self.main_layout.addLayout(env_layout)
+        self.main_layout.addLayout(progress_layout)
+        self.main_layout.addWidget(self.progress_label)
+        self.main_layout.addLayout(cost_layout)
+
+    # The controls are disabled while the environment is created, edits
+    # would land in its undo chunk (see ZeusDeferredSteps)
+    def show_progress(self, done, total, text):
+        self.set_controls_enabled(False)
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(done)
+        self.progress_label.setText(text)
+        for widget in (self.progress_bar, self.cancel_button, self.progress_label):
+            widget.setVisible(True)
+
+    def hide_progress(self):
+        self.set_controls_enabled(True)
+        for widget in (self.progress_bar, self.cancel_button, self.progress_label):
+            widget.setVisible(False)
+
+    def set_controls_enabled(self, enabled):
+        progress_widgets = (self.progress_bar, self.cancel_button, self.progress_label)
+        for widget in self.findChildren(QWidget):
+            if widget not in progress_widgets:
+                widget.setEnabled(enabled)
+
+    def build_states_ui(self):
+        states_layout = QVBoxLayout()
+        self.create_section_header('Weather States', states_layout)
+
+        # State library
+        state_layout = QHBoxLayout()
+        self.state_combo_box = QComboBox(self)
+        self.refresh_states()
+        self.state_combo_box.setMinimumWidth(100)
+        apply_button = QPushButton('Apply', self)
+        apply_button.clicked.connect(lambda: self.controller.states_apply_action(self.state_combo_box.currentText()))
+        blend_button = QPushButton('Blend', self)
+        blend_button.setToolTip('Animate from the current weather to the state over the playback range')
+        blend_button.clicked.connect(lambda: self.controller.states_blend_action(self.state_combo_box.currentText()))
+        save_button = QPushButton('Save', self)
+        save_button.clicked.connect(self.save_state)
+
+        # States layout
+        state_layout.addWidget(self.state_combo_box)
+        state_layout.addStretch()
+        state_layout.addWidget(apply_button)
+        state_layout.addWidget(blend_button)
+        state_layout.addWidget(save_button)
+
+        states_layout.addLayout(state_layout)
+        self.main_layout.addLayout(states_layout)
+
+    def refresh_states(self):
+        from zeus_states import state_names
+
+        current = self.state_combo_box.currentText()
+        self.state_combo_box.clear()
+        self.state_combo_box.addItems(state_names())
+        self.state_combo_box.setCurrentText(current)
+
+    def save_state(self):
+        name, accepted = QInputDialog.getText(self, 'Save Weather State', 'Name')
+        if accepted and name:
+            self.controller.states_save_action(name)
+            self.refresh_states()
+            self.state_combo_box.setCurrentText(name)
 
     def build_clouds_ui(self):
         clouds_layout = QVBoxLayout(self)
@@ -36,10 +146,12 @@ class ZeusUI(QWidget):
         # Density sliders
         density_layout = QHBoxLayout()
         density_label = QLabel(self, text='Density')
-        density_slider = QSlider(orientation=Qt.Horizontal, minimum=0, maximum=100, value=10)
-        density_slider.setMinimumWidth(100)
-        density_slider.setMaximumWidth(100)
-        density_slider.valueChanged.connect(self.controller.clouds_density_action)
+        self.density_slider = QSlider(orientation=Qt.Horizontal, minimum=0, maximum=100, value=10)
+        self.density_slider.setMinimumWidth(100)
+        self.density_slider.setMaximumWidth(100)
+        self.density_slider.valueChanged.connect(self.controller.clouds_density_action)
+        self.density_slider.sliderPressed.connect(self.controller.slider_pressed_action)
+        self.density_slider.sliderReleased.connect(self.controller.slider_released_action)
 
         # Density keyframes
         density_add_keyframe_button = QPushButton('AK', self)
@@ -50,15 +162,15 @@ class ZeusUI(QWidget):
         # Density layout
         density_layout.addWidget(density_label)
         density_layout.addStretch()
-        density_layout.addWidget(density_slider)
+        density_layout.addWidget(self.density_slider)
         density_layout.addWidget(density_add_keyframe_button)
         density_layout.addWidget(density_delete_keyframe_button)
 
         # Storminess checkbox
         storminess_layout = QHBoxLayout()
         storminess_label = QLabel(self, text='Storminess')
-        storminess_checkbox = QCheckBox(self)
-        storminess_checkbox.stateChanged.connect(self.controller.clouds_storminess_action)
+        self.storminess_checkbox = QCheckBox(self)
+        self.storminess_checkbox.stateChanged.connect(self.controller.clouds_storminess_action)
 
         # Storminess keyframes
         storminess_add_keyframe_button = QPushButton('AK', self)
@@ -69,17 +181,19 @@ class ZeusUI(QWidget):
         # Storminess layout
         storminess_layout.addWidget(storminess_label)
         storminess_layout.addStretch()
-        storminess_layout.addWidget(storminess_checkbox)
+        storminess_layout.addWidget(self.storminess_checkbox)
         storminess_layout.addWidget(storminess_add_keyframe_button)
         storminess_layout.addWidget(storminess_delete_keyframe_button)
 
         # Amount of Details sliders
         aod_layout = QHBoxLayout()
         aod_label = QLabel(self, text='Amount of Details')
-        aod_slider = QSlider(orientation=Qt.Horizontal, minimum=0, maximum=100, value=60)
-        aod_slider.setMinimumWidth(100)
-        aod_slider.setMaximumWidth(100)
-        aod_slider.valueChanged.connect(self.controller.clouds_aod_action)
+        self.aod_slider = QSlider(orientation=Qt.Horizontal, minimum=0, maximum=100, value=60)
+        self.aod_slider.setMinimumWidth(100)
+        self.aod_slider.setMaximumWidth(100)
+        self.aod_slider.valueChanged.connect(self.controller.clouds_aod_action)
+        self.aod_slider.sliderPressed.connect(self.controller.slider_pressed_action)
+        self.aod_slider.sliderReleased.connect(self.controller.slider_released_action)
 
         # Amount of Details keyframes
         aod_add_keyframe_button = QPushButton('AK', self)
@@ -90,14 +204,42 @@ class ZeusUI(QWidget):
         # Amount of Details layout
         aod_layout.addWidget(aod_label)
         aod_layout.addStretch()
-        aod_layout.addWidget(aod_slider)
+        aod_layout.addWidget(self.aod_slider)
         aod_layout.addWidget(aod_add_keyframe_button)
         aod_layout.addWidget(aod_delete_keyframe_button)
 
+        # Quality tier (resolution and sampling of the container)
+        quality_layout = QHBoxLayout()
+        quality_label = QLabel(self, text='Quality')
+        self.quality_combo_box = QComboBox(self)
+        self.quality_combo_box.addItems(list(QUALITY_TIERS))
+        self.quality_combo_box.setCurrentText(self.controller.model.get_quality_tier())
+        self.quality_combo_box.setMinimumWidth(100)
+        self.quality_combo_box.textActivated.connect(self.controller.clouds_quality_action)
+
+        # Quality layout
+        quality_layout.addWidget(quality_label)
+        quality_layout.addStretch()
+        quality_layout.addWidget(self.quality_combo_box)
+
+        # Baked noise checkbox (details from a baked volume, see zeus_noise)
+        baked_noise_layout = QHBoxLayout()
+        baked_noise_label = QLabel(self, text='Baked Noise')
+        self.baked_noise_checkbox = QCheckBox(self)
+        self.baked_noise_checkbox.setChecked(bool(self.controller.model.get_baked_noise()))
+        self.baked_noise_checkbox.toggled.connect(self.controller.clouds_baked_noise_action)
+
+        # Baked noise layout
+        baked_noise_layout.addWidget(baked_noise_label)
+        baked_noise_layout.addStretch()
+        baked_noise_layout.addWidget(self.baked_noise_checkbox)
+
         # Add sub-HBox in the main cloud VBox
         clouds_layout.addLayout(density_layout)
         clouds_layout.addLayout(storminess_layout)
         clouds_layout.addLayout(aod_layout)
+        clouds_layout.addLayout(quality_layout)
+        clouds_layout.addLayout(baked_noise_layout)
 
         self.main_layout.addLayout(clouds_layout)
 
@@ -109,10 +251,12 @@ class ZeusUI(QWidget):
         # Rain enabled checkbox
         rain_enabled_layout = QHBoxLayout()
         rain_enabled_label = QLabel(self, text='Enable Rain')
-        rain_enabled_slider = QSlider(orientation=Qt.Horizontal, minimum=0, maximum=1000, value=0)
-        rain_enabled_slider.setMinimumWidth(100)
-        rain_enabled_slider.setMaximumWidth(100)
-        rain_enabled_slider.valueChanged.connect(self.controller.rain_enabled_action)
+        self.rain_enabled_slider = QSlider(orientation=Qt.Horizontal, minimum=0, maximum=1000, value=0)
+        self.rain_enabled_slider.setMinimumWidth(100)
+        self.rain_enabled_slider.setMaximumWidth(100)
+        self.rain_enabled_slider.valueChanged.connect(self.controller.rain_enabled_action)
+        self.rain_enabled_slider.sliderPressed.connect(self.controller.slider_pressed_action)
+        self.rain_enabled_slider.sliderReleased.connect(self.controller.slider_released_action)
 
         # Rain enabled keyframes
         rain_enabled_add_keyframe_button = QPushButton('AK', self)
@@ -123,13 +267,88 @@ class ZeusUI(QWidget):
         # Rain enabled layout
         rain_enabled_layout.addWidget(rain_enabled_label)
         rain_enabled_layout.addStretch()
-        rain_enabled_layout.addWidget(rain_enabled_slider)
+        rain_enabled_layout.addWidget(self.rain_enabled_slider)
         rain_enabled_layout.addWidget(rain_enabled_add_keyframe_button)
         rain_enabled_layout.addWidget(rain_enabled_delete_keyframe_button)
 
+        # Lean rain checkbox (instanced streaks, see ZeusModel.set_lean_rain)
+        lean_layout = QHBoxLayout()
+        lean_label = QLabel(self, text='Lean Rain')
+        self.lean_rain_checkbox = QCheckBox(self)
+        self.lean_rain_checkbox.setChecked(bool(self.controller.model.get_lean_rain()))
+        self.lean_rain_checkbox.toggled.connect(self.controller.rain_lean_action)
+
+        # Lean rain layout
+        lean_layout.addWidget(lean_label)
+        lean_layout.addStretch()
+        lean_layout.addWidget(self.lean_rain_checkbox)
+
+        # Particle budget (0 for no limit)
+        budget_layout = QHBoxLayout()
+        budget_label = QLabel(self, text='Particle Budget')
+        self.budget_spin_box = QSpinBox(self)
+        self.budget_spin_box.setRange(0, 10000000)
+        self.budget_spin_box.setSingleStep(10000)
+        self.budget_spin_box.setSpecialValueText('Unlimited')
+        self.budget_spin_box.setValue(self.controller.model.get_particle_budget())
+        self.budget_spin_box.setMinimumWidth(100)
+        self.budget_spin_box.editingFinished.connect(
+            lambda: self.controller.rain_budget_action(self.budget_spin_box.value()))
+
+        # Particle budget layout
+        budget_layout.addWidget(budget_label)
+        budget_layout.addStretch()
+        budget_layout.addWidget(self.budget_spin_box)
+
+        # Rain tiles (area culled from the camera, see ZeusModel.create_rain_tiles)
+        tiles_layout = QHBoxLayout()
+        tiles_label = QLabel(self, text='Rain Tiles')
+        self.tiles_size_spin_box = QDoubleSpinBox(self)
+        self.tiles_size_spin_box.setRange(RAIN_TILE_SIZE, 10000.0)
+        self.tiles_size_spin_box.setSingleStep(RAIN_TILE_SIZE)
+        self.tiles_size_spin_box.setValue(RAIN_TILES_AREA_SIZE)
+        self.tiles_size_spin_box.editingFinished.connect(self.rain_tiles_changed)
+        self.tiles_checkbox = QCheckBox(self)
+        self.tiles_checkbox.setChecked(self.controller.model.get_rain_tiles())
+        self.tiles_checkbox.toggled.connect(self.rain_tiles_changed)
+
+        # Rain tiles layout
+        tiles_layout.addWidget(tiles_label)
+        tiles_layout.addStretch()
+        tiles_layout.addWidget(self.tiles_size_spin_box)
+        tiles_layout.addWidget(self.tiles_checkbox)
+
+        # Ground collision (heightfield of the selected meshes, see ZeusModel.set_ground_collision)
+        ground_layout = QHBoxLayout()
+        ground_label = QLabel(self, text='Ground')
+        self.splash_checkbox = QCheckBox('Splashes', self)
+        settings = self.controller.model.get_ground_collision_settings()
+        self.splash_checkbox.setChecked(bool(settings and settings['splashes']))
+        self.splash_checkbox.toggled.connect(self.controller.rain_splash_action)
+        ground_button = QPushButton('Use Selection', self)
+        ground_button.clicked.connect(lambda: self.controller.rain_ground_action(self.splash_checkbox.isChecked()))
+        ground_clear_button = QPushButton('Clear', self)
+        ground_clear_button.clicked.connect(self.controller.rain_ground_clear_action)
+
+        # Ground collision layout
+        ground_layout.addWidget(ground_label)
+        ground_layout.addStretch()
+        ground_layout.addWidget(self.splash_checkbox)
+        ground_layout.addWidget(ground_button)
+        ground_layout.addWidget(ground_clear_button)
+
         rain_layout.addLayout(rain_enabled_layout)
+        rain_layout.addLayout(lean_layout)
+        rain_layout.addLayout(budget_layout)
+        rain_layout.addLayout(tiles_layout)
+        rain_layout.addLayout(ground_layout)
         self.main_layout.addLayout(rain_layout)
 
+    def rain_tiles_changed(self):
+        # The size alone only matters for tiles already there
+        if self.tiles_checkbox.isChecked() or self.controller.model.get_rain_tiles():
+            self.controller.rain_tiles_action(self.tiles_checkbox.isChecked(), self.tiles_size_spin_box.value())
+
     def build_wind_ui(self):
         wind_layout = QVBoxLayout(self)
         self.create_section_header('Wind', wind_layout)
@@ -137,10 +356,12 @@ class ZeusUI(QWidget):
         # Wind speed slider
         speed_layout = QHBoxLayout()
         speed_label = QLabel(self, text='Wind Speed')
-        speed_slider = QSlider(orientation=Qt.Horizontal, minimum=0, maximum=100, value=0)
-        speed_slider.setMinimumWidth(100)
-        speed_slider.setMaximumWidth(100)
-        speed_slider.valueChanged.connect(self.controller.wind_speed_action)
+        self.speed_slider = QSlider(orientation=Qt.Horizontal, minimum=0, maximum=100, value=0)
+        self.speed_slider.setMinimumWidth(100)
+        self.speed_slider.setMaximumWidth(100)
+        self.speed_slider.valueChanged.connect(self.controller.wind_speed_action)
+        self.speed_slider.sliderPressed.connect(self.controller.slider_pressed_action)
+        self.speed_slider.sliderReleased.connect(self.controller.slider_released_action)
 
         # Wind speed keyframes
         speed_add_keyframe_button = QPushButton(text='AK')
@@ -151,7 +372,7 @@ class ZeusUI(QWidget):
         # Wind speed layout
         speed_layout.addWidget(speed_label)
         speed_layout.addStretch()
-        speed_layout.addWidget(speed_slider)
+        speed_layout.addWidget(self.speed_slider)
         speed_layout.addWidget(speed_add_keyframe_button)
         speed_layout.addWidget(speed_delete_keyframe_button)
 
@@ -166,30 +387,30 @@ class ZeusUI(QWidget):
         direction_input_layout = QHBoxLayout()
 
         # X axis
-        direction_x_input = QLineEdit(self)
-        direction_x_input.setMinimumWidth(50)
-        direction_x_input.setMaximumWidth(50)
-        direction_x_input.setText('1.000')
-        direction_x_input.setValidator(validator)
+        self.direction_x_input = QLineEdit(self)
+        self.direction_x_input.setMinimumWidth(50)
+        self.direction_x_input.setMaximumWidth(50)
+        self.direction_x_input.setText('1.000')
+        self.direction_x_input.setValidator(validator)
 
         # Y axis
-        direction_y_input = QLineEdit(self)
-        direction_y_input.setMinimumWidth(50)
-        direction_y_input.setMaximumWidth(50)
-        direction_y_input.setText('0.000')
-        direction_y_input.setValidator(validator)
+        self.direction_y_input = QLineEdit(self)
+        self.direction_y_input.setMinimumWidth(50)
+        self.direction_y_input.setMaximumWidth(50)
+        self.direction_y_input.setText('0.000')
+        self.direction_y_input.setValidator(validator)
 
         # Z axis
-        direction_z_input = QLineEdit(self)
-        direction_z_input.setMinimumWidth(50)
-        direction_z_input.setMaximumWidth(50)
-        direction_z_input.setText('0.000')
-        direction_z_input.setValidator(validator)
+        self.direction_z_input = QLineEdit(self)
+        self.direction_z_input.setMinimumWidth(50)
+        self.direction_z_input.setMaximumWidth(50)
+        self.direction_z_input.setText('0.000')
+        self.direction_z_input.setValidator(validator)
 
         # Connect inputs
-        direction_x_input.editingFinished.connect(lambda: self.controller.wind_direction_action(float(direction_x_input.text()), 'X'))
-        direction_y_input.editingFinished.connect(lambda: self.controller.wind_direction_action(float(direction_y_input.text()), 'Y'))
-        direction_z_input.editingFinished.connect(lambda: self.controller.wind_direction_action(float(direction_z_input.text()), 'Z'))
+        self.direction_x_input.editingFinished.connect(lambda: self.controller.wind_direction_action(float(self.direction_x_input.text()), 'X'))
+        self.direction_y_input.editingFinished.connect(lambda: self.controller.wind_direction_action(float(self.direction_y_input.text()), 'Y'))
+        self.direction_z_input.editingFinished.connect(lambda: self.controller.wind_direction_action(float(self.direction_z_input.text()), 'Z'))
 
         # Wind direction keyframes
         direction_add_keyframe_button = QPushButton(text='AK')
@@ -198,9 +419,9 @@ class ZeusUI(QWidget):
         direction_delete_keyframe_button.clicked.connect(self.controller.wind_direction_delete_keyframe_action)
 
         # Nest layouts
-        direction_input_layout.addWidget(direction_x_input)
-        direction_input_layout.addWidget(direction_y_input)
-        direction_input_layout.addWidget(direction_z_input)
+        direction_input_layout.addWidget(self.direction_x_input)
+        direction_input_layout.addWidget(self.direction_y_input)
+        direction_input_layout.addWidget(self.direction_z_input)
 
         direction_layout.addWidget(direction_label)
         direction_layout.addStretch()
@@ -208,10 +429,143 @@ class ZeusUI(QWidget):
         direction_layout.addWidget(direction_add_keyframe_button)
         direction_layout.addWidget(direction_delete_keyframe_button)
 
+        # Wind field checkbox (gusts and turbulence, see ZeusModel.set_wind_field)
+        settings = self.controller.model.get_wind_field_settings()
+        field_layout = QHBoxLayout()
+        field_label = QLabel(self, text='Wind Field')
+        self.wind_field_checkbox = QCheckBox(self)
+        self.wind_field_checkbox.setChecked(settings is not None)
+        self.wind_field_checkbox.toggled.connect(self.controller.wind_field_action)
+
+        # Gust and turbulence strengths
+        settings = settings or DEFAULT_WIND_FIELD
+        self.gust_spin_box = QDoubleSpinBox(self)
+        self.gust_spin_box.setPrefix('Gusts ')
+        self.gust_spin_box.setRange(0.0, 50.0)
+        self.gust_spin_box.setValue(settings['gust_strength'])
+        self.gust_spin_box.editingFinished.connect(
+            lambda: self.controller.wind_field_setting_action('gust_strength', self.gust_spin_box.value()))
+        self.turbulence_spin_box = QDoubleSpinBox(self)
+        self.turbulence_spin_box.setPrefix('Turbulence ')
+        self.turbulence_spin_box.setRange(0.0, 50.0)
+        self.turbulence_spin_box.setValue(settings['turbulence_strength'])
+        self.turbulence_spin_box.editingFinished.connect(
+            lambda: self.controller.wind_field_setting_action('turbulence_strength', self.turbulence_spin_box.value()))
+
+        # Wind field layout
+        field_layout.addWidget(field_label)
+        field_layout.addStretch()
+        field_layout.addWidget(self.gust_spin_box)
+        field_layout.addWidget(self.turbulence_spin_box)
+        field_layout.addWidget(self.wind_field_checkbox)
+
         wind_layout.addLayout(speed_layout)
         wind_layout.addLayout(direction_layout)
+        wind_layout.addLayout(field_layout)
         self.main_layout.addLayout(wind_layout)
 
+    def build_sky_ui(self):
+        sky_layout = QVBoxLayout(self)
+        self.create_section_header('Sky', sky_layout)
+
+        # Time of day checkbox and hours (over the playback range, see ZeusModel.set_time_of_day)
+        settings = self.controller.model.get_time_of_day()
+        time_of_day_layout = QHBoxLayout()
+        time_of_day_label = QLabel(self, text='Time of Day')
+        self.time_of_day_checkbox = QCheckBox(self)
+        self.time_of_day_checkbox.setChecked(settings is not None)
+        self.time_of_day_checkbox.toggled.connect(self.time_of_day_changed)
+
+        settings = settings or DEFAULT_TIME_OF_DAY
+        self.start_hour_spin_box = QDoubleSpinBox(self)
+        self.start_hour_spin_box.setRange(0.0, 24.0)
+        self.start_hour_spin_box.setSuffix(' h')
+        self.start_hour_spin_box.setValue(settings['start_hour'])
+        self.start_hour_spin_box.editingFinished.connect(self.time_of_day_changed)
+        self.end_hour_spin_box = QDoubleSpinBox(self)
+        self.end_hour_spin_box.setRange(0.0, 24.0)
+        self.end_hour_spin_box.setSuffix(' h')
+        self.end_hour_spin_box.setValue(settings['end_hour'])
+        self.end_hour_spin_box.editingFinished.connect(self.time_of_day_changed)
+
+        # Time of day layout
+        time_of_day_layout.addWidget(time_of_day_label)
+        time_of_day_layout.addStretch()
+        time_of_day_layout.addWidget(self.start_hour_spin_box)
+        time_of_day_layout.addWidget(self.end_hour_spin_box)
+        time_of_day_layout.addWidget(self.time_of_day_checkbox)
+
+        sky_layout.addLayout(time_of_day_layout)
+        self.main_layout.addLayout(sky_layout)
+
+    def time_of_day_changed(self):
+        self.controller.sky_time_of_day_action(self.time_of_day_checkbox.isChecked(),
+                                               self.start_hour_spin_box.value(), self.end_hour_spin_box.value())
+
+    def request_sync(self, full=False):
+        self.full_sync = self.full_sync or full
+        if not self.sync_timer.isActive():
+            self.sync_timer.start(UI_SYNC_INTERVAL)
+
+    # Show the scene values. Every parameter comes from the cached plugs
+    # of the model in one pass, the widget signals are blocked so nothing
+    # is written back, and the widgets being edited are left alone. The
+    # cost estimate follows the same values.
+    # A full sync also reads the settings stored on the rig group.
+    def sync(self, full=False):
+        full = full or self.full_sync
+        self.full_sync = False
+        model = self.controller.model
+        try:
+            state = model.capture_state()
+        except RuntimeError:
+            # No (complete) rig in the scene
+            return
+
+        widgets = [self.density_slider, self.storminess_checkbox, self.aod_slider, self.rain_enabled_slider,
+                   self.speed_slider, self.direction_x_input, self.direction_y_input, self.direction_z_input,
+                   self.quality_combo_box, self.baked_noise_checkbox, self.lean_rain_checkbox, self.budget_spin_box,
+                   self.tiles_checkbox,
+                   self.wind_field_checkbox, self.gust_spin_box, self.turbulence_spin_box, self.splash_checkbox,
+                   self.time_of_day_checkbox, self.start_hour_spin_box, self.end_hour_spin_box]
+        for widget in widgets:
+            widget.blockSignals(True)
+        try:
+            for slider, value in ((self.density_slider, state.density), (self.aod_slider, state.details),
+                                  (self.rain_enabled_slider, state.rain_rate), (self.speed_slider, state.wind_speed)):
+                if not slider.isSliderDown():
+                    slider.setValue(round(value))
+            self.storminess_checkbox.setChecked(state.storminess >= 0.5)
+            for direction_input, value in zip((self.direction_x_input, self.direction_y_input, self.direction_z_input),
+                                              state.wind_direction):
+                if not direction_input.hasFocus():
+                    direction_input.setText(f'{value:.3f}')
+            if full:
+                self.quality_combo_box.setCurrentText(model.get_quality_tier())
+                self.baked_noise_checkbox.setChecked(bool(model.get_baked_noise()))
+                self.lean_rain_checkbox.setChecked(bool(model.get_lean_rain()))
+                self.budget_spin_box.setValue(model.get_particle_budget())
+                self.tiles_checkbox.setChecked(model.get_rain_tiles())
+                settings = model.get_wind_field_settings()
+                self.wind_field_checkbox.setChecked(settings is not None)
+                settings = settings or DEFAULT_WIND_FIELD
+                self.gust_spin_box.setValue(settings['gust_strength'])
+                self.turbulence_spin_box.setValue(settings['turbulence_strength'])
+                settings = model.get_ground_collision_settings()
+                self.splash_checkbox.setChecked(bool(settings and settings['splashes']))
+                settings = model.get_time_of_day()
+                self.time_of_day_checkbox.setChecked(settings is not None)
+                settings = settings or DEFAULT_TIME_OF_DAY
+                self.start_hour_spin_box.setValue(settings['start_hour'])
+                self.end_hour_spin_box.setValue(settings['end_hour'])
+        finally:
+            for widget in widgets:
+                widget.blockSignals(False)
+
+        cost = model.estimate_cost(state)
+        self.cost_label.setText(f'~{cost["total"]:.1f} s/frame (clouds {cost["clouds"]:.1f}, '
+                                f'rain {cost["rain"]:.1f}, sim {cost["simulation"]:.1f})')
+
     def create_section_header(self, title, layout):
         # Section separator
         separator = QFrame(self)
@@ -228,3 +582,79 @@ class ZeusUI(QWidget):
         # Attach to layout
         layout.addWidget(separator)
         layout.addWidget(title_label)
+
+
+# Live view of the profiler (calls of the actions and model methods,
+# attribute writes), refreshed every STATS_REFRESH_INTERVAL
+class ZeusStatsPanel(QWidget):
+    def __init__(self, controller, *args, **kwargs):
+        super(ZeusStatsPanel, self).__init__(*args, **kwargs)
+        self.controller = controller
+        self.setParent(controller.maya_main_window)
+        self.setWindowFlags(Qt.Window)
+        self.setObjectName('ZeusStatsPanel_uniqueId')
+        self.setWindowTitle('Zeus Stats')
+        self.setGeometry(80, 80, 520, 480)
+        self.build_ui()
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(STATS_REFRESH_INTERVAL)
+
+    def build_ui(self):
+        from zeus_profile import profiler
+
+        main_layout = QVBoxLayout(self)
+
+        # Profiling controls
+        controls_layout = QHBoxLayout()
+        profiling_checkbox = QCheckBox('Profiling', self)
+        profiling_checkbox.setChecked(profiler.enabled)
+        profiling_checkbox.toggled.connect(self.controller.profiling_action)
+        reset_button = QPushButton('Reset', self)
+        reset_button.clicked.connect(self.reset_action)
+        export_button = QPushButton('Export Trace', self)
+        export_button.clicked.connect(self.export_action)
+
+        controls_layout.addWidget(profiling_checkbox)
+        controls_layout.addStretch()
+        controls_layout.addWidget(reset_button)
+        controls_layout.addWidget(export_button)
+
+        # Calls and attribute writes tables
+        self.calls_table = QTableWidget(0, 5, self)
+        self.calls_table.setHorizontalHeaderLabels(['Call', 'Count', 'Total ms', 'Mean ms', 'Commands'])
+        self.writes_table = QTableWidget(0, 3, self)
+        self.writes_table.setHorizontalHeaderLabels(['Attribute', 'Writes', 'Total ms'])
+        for table in (self.calls_table, self.writes_table):
+            table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+            table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+            table.verticalHeader().setVisible(False)
+
+        main_layout.addLayout(controls_layout)
+        main_layout.addWidget(self.calls_table, stretch=2)
+        main_layout.addWidget(self.writes_table, stretch=1)
+
+    def refresh(self):
+        from zeus_profile import profiler
+
+        if not self.isVisible():
+            return
+        self.fill_table(self.calls_table, profiler.call_report())
+        self.fill_table(self.writes_table, profiler.write_report())
+
+    def fill_table(self, table, rows):
+        table.setRowCount(len(rows))
+        for row_index, row in enumerate(rows):
+            for column_index, value in enumerate(row):
+                text = f'{value:.2f}' if isinstance(value, float) else str(value)
+                table.setItem(row_index, column_index, QTableWidgetItem(text))
+
+    def reset_action(self):
+        self.controller.profiling_reset_action()
+        self.refresh()
+
+    def export_action(self):
+        path, _ = QFileDialog.getSaveFileName(self, 'Export Trace', 'zeus_trace.json', 'Chrome trace (*.json)')
+        if path:
+            self.controller.profiling_export_action(path)
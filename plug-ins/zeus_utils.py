@@ -1,3 +1,9 @@
+# Private names, zeus_utils is star imported by every module
+import importlib as _importlib
+import os as _os
+import sys as _sys
+import tempfile as _tempfile
+
 PLUGIN_NAME = 'Zeus'
 GROUP_NAME = 'g_WeatherController'
 SKYDOME_OBJECT_NAME = 'Zeus:SkyDome'
@@ -5,6 +11,262 @@ CLOUD_OBJECT_NAME = 'Zeus:CloudContainer'
 RAIN_EMITTER_OBJECT_NAME = 'Zeus:RainEmitter'
 RAIN_PARTICLES_OBJECT_NAME = 'Zeus:RainParticles'
 NUCLEUS_OBJECT_NAME = 'Zeus:Nucleus'
+CLOUD_DRIFT_OBJECT_NAME = 'Zeus:CloudDrift'
+RAIN_TILES_OBJECT_NAME = 'Zeus:RainTiles'
+RAIN_TILE_OBJECT_NAME = 'Zeus:RainTile'
+RAIN_CULLER_OBJECT_NAME = 'Zeus:RainCuller'
+RAIN_STREAK_OBJECT_NAME = 'Zeus:RainStreak'
+RAIN_INSTANCER_OBJECT_NAME = 'Zeus:RainInstancer'
+WIND_CONTAINER_OBJECT_NAME = 'Zeus:WindContainer'
+RAIN_SPLASH_OBJECT_NAME = 'Zeus:RainSplash'
+RAIN_SPLASH_EMITTER_OBJECT_NAME = 'Zeus:RainSplashEmitter'
+GROUND_COLLISION_OBJECT_NAME = 'Zeus:GroundCollision'
+
+# Several rigs can live in the same scene, rig groups are tagged with their
+# id and point to their nodes through zeusNode_<key> message attributes
+DEFAULT_RIG_ID = 'default'
+RIG_ID_ATTRIBUTE = 'zeusRigId'
+RIG_NODE_ATTRIBUTE_PREFIX = 'zeusNode_'
+# Rig nodes that can be found by name (older scenes) and the ones
+# parented under the rig group
+RIG_NAMED_KEYS = ('skydome', 'cloud_container', 'cloud_drift', 'rain_emitter', 'rain_particles', 'nucleus')
+RIG_GROUPED_KEYS = ('skydome', 'cloud_container', 'rain_emitter', 'rain_tiles', 'rain_particles', 'nucleus',
+                    'rain_streak', 'rain_instancer', 'wind_container', 'rain_splash')
+# Set ZEUS_RECONCILE_ON_OPEN=1 to repair the rig of every scene opened
+# with the UI (see ZeusModel.reconcile)
+RECONCILE_ON_OPEN = _os.environ.get('ZEUS_RECONCILE_ON_OPEN', '0') == '1'
+
+# Custom nodes (ids from the range reserved for local plug-ins)
+CLOUD_DRIFT_NODE_TYPE = 'zeusCloudDrift'
+CLOUD_DRIFT_NODE_ID = 0x0007F7A0
+RAIN_CULLER_NODE_TYPE = 'zeusRainCuller'
+RAIN_CULLER_NODE_ID = 0x0007F7A1
+GROUND_COLLISION_NODE_TYPE = 'zeusGroundCollision'
+GROUND_COLLISION_NODE_ID = 0x0007F7A2
+# Scaling factor between wind speed and cloud texture movement
+CLOUD_DRIFT_SCALE = 0.1
+# Size of the single rain emitter, the rain rate is per emitter of that size
+RAIN_EMITTER_SIZE = 10.0
+# Tiled rain: size of the tiled area and of a tile, camera used for
+# culling, distance after which tiles are culled and rate multiplier of
+# the culled tiles
+RAIN_TILES_AREA_SIZE = 100.0
+RAIN_TILE_SIZE = 10.0
+RAIN_TILE_CAMERA = 'persp'
+RAIN_TILE_MAX_DISTANCE = 200.0
+RAIN_TILE_CULL_RATE = 0.0
+# Lean rain (see ZeusModel.set_lean_rain): flag stored on the rig group,
+# nParticle cacheableAttributes values, streak geometry and material
+LEAN_RAIN_ATTRIBUTE = 'zeusLeanRain'
+CACHEABLE_POSITION_VELOCITY = 1
+CACHEABLE_DYNAMICS = 2
+RAIN_STREAK_LENGTH = 0.4
+RAIN_STREAK_RADIUS = 0.004
+RAIN_STREAK_MATERIAL = 'm_RainStreak'
+RAIN_STREAK_COLOR = (0.55, 0.6, 0.65)
+RAIN_STREAK_OPACITY = 0.3
+# Most rain particles alive at once (0 for no limit), the emission rate
+# is scaled down to stay within it, maxCount only catches the overshoot
+PARTICLE_BUDGET_ATTRIBUTE = 'zeusParticleBudget'
+DEFAULT_PARTICLE_BUDGET = 500000
+PARTICLE_BUDGET_HEADROOM = 1.1
+# Undoable command applying the model attribute writes
+APPLY_MODIFIER_COMMAND = 'zeusApplyModifier'
+
+# Attribute writes coming from the UI are coalesced and flushed
+# at most once every WRITE_FLUSH_INTERVAL seconds (~ one viewport refresh)
+WRITE_FLUSH_INTERVAL = 1.0 / 30.0
+UNDO_CHUNK_NAME = 'ZeusEdit'
+ENVIRONMENT_CHUNK_NAME = 'ZeusCreateEnvironment'
+
+# Cloud look for clear/stormy weather (storminess blends between the two)
+CLEAR_EDGE_DROPOFF = 0.372
+STORMY_EDGE_DROPOFF = 0.499
+CLEAR_TRANSPARENCY = 0.25
+STORMY_TRANSPARENCY = 0.01
+
+# Cloud container settings of the customClouds preset (the final look)
+# and the quality tiers scaling them: (resolution, sample rates, shading quality)
+CLOUD_RESOLUTION = (30, 3, 30)
+CLOUD_INITIAL_SAMPLE_RATE = 6
+CLOUD_EXTRA_SAMPLE_RATE = 5
+CLOUD_SHADING_QUALITY = 2.0
+QUALITY_TIERS = {
+    'proxy': (0.34, 0.25, 0.25),
+    'preview': (0.67, 0.5, 0.5),
+    'final': (1.0, 1.0, 1.0),
+}
+DEFAULT_QUALITY_TIER = 'final'
+QUALITY_TIER_ATTRIBUTE = 'zeusQualityTier'
+QUALITY_COLLECTION_NAME = 'ZeusQualityTier'
+
+# Render cost model (see zeus_cost): seconds per unit of work on the
+# reference workstation, where the micro-benchmark took
+# COST_REFERENCE_SECONDS. Cloud samples are shading quality * largest
+# resolution * (initial + extra sample rates), scaled by the density and
+# the storminess; the detail texture costs per sample on top of them
+# (nothing with the baked noise); the rain costs per particle alive.
+COST_COEFFICIENTS = {
+    'frame': 2.0,
+    'cloud_sample': 0.045,
+    'cloud_texture': 0.025,
+    'particle_render': 3e-5,
+    'particle_streak': 1e-5,
+    'particle_simulation': 1e-5,
+}
+COST_STORM_FACTOR = 0.5
+COST_REFERENCE_SECONDS = 0.04
+COST_BENCHMARK_ITERATIONS = 100000
+COST_BENCHMARK_REPEATS = 3
+# Auto-tune: seconds per frame to hit by default, and the smallest
+# particle budget worth keeping a quality tier for
+DEFAULT_TARGET_FRAME_SECONDS = 60.0
+MINIMUM_AUTO_BUDGET = 50000
+
+# Parameters accepted by ZeusModel.bake_timeline
+SCHEDULE_PARAMETERS = ('density', 'storminess', 'details', 'rain_rate', 'wind_speed', 'wind_direction')
+# Keys closer than this to the linear interpolation of their neighbours are dropped
+BAKE_TOLERANCE = 1e-4
+# Parallel rain chunks (see zeus_simulate) differing more than this (ratio
+# of the particle count and of the rain bounding box) from the continuous
+# simulation at their first frame are reported
+CHUNK_BOUNDARY_TOLERANCE = 0.05
+
+# Weather states (see zeus_states): parameters they hold, values of the
+# parameters a state does not set, shipped and user state libraries and
+# attribute differences below which applying a state writes nothing
+STATE_PARAMETERS = SCHEDULE_PARAMETERS
+DEFAULT_WEATHER_STATE = {
+    'density': 10.0, 'storminess': 0.0, 'details': 60.0,
+    'rain_rate': 0.0, 'wind_speed': 0.0, 'wind_direction': (1.0, 0.0, 0.0),
+}
+WEATHER_STATE_DIRECTORY = _os.path.join(_os.path.dirname(_os.path.dirname(_os.path.abspath(__file__))), 'presets', 'weatherStates')
+USER_STATE_DIRECTORY = _os.environ.get('ZEUS_STATE_DIR', _os.path.join(_os.path.expanduser('~'), 'zeus_states'))
+STATE_TOLERANCE = 1e-6
+
+# Attribute presets shipped with the plug-in (next to the plug-ins folder)
+PRESET_DIRECTORY = _os.path.join(_os.path.dirname(_os.path.dirname(_os.path.abspath(__file__))), 'presets', 'attrPresets')
+# Preset values closer than this to the node defaults are not applied
+PRESET_TOLERANCE = 1e-6
+
+# Baked cloud noise (see zeus_noise): fluid attributes it depends on,
+# seed of the noise and flag stored on the rig group
+NOISE_ATTRIBUTES = (
+    'resolutionW', 'resolutionH', 'resolutionD', 'dimensionsW', 'dimensionsH', 'dimensionsD',
+    'frequency', 'frequencyRatio', 'depthMax', 'ratio', 'amplitude', 'threshold', 'inflection',
+    'opacityTexGain', 'invertTexture',
+)
+NOISE_SEED = 1
+BAKED_NOISE_ATTRIBUTE = 'zeusBakedNoise'
+# fluidShape.densityMethod values
+DENSITY_METHOD_OFF = 0
+DENSITY_METHOD_STATIC_GRID = 1
+DENSITY_METHOD_GRADIENT = 3
+# fluidShape.velocityMethod and solver values
+VELOCITY_METHOD_STATIC_GRID = 1
+FLUID_SOLVER_NONE = 0
+
+# Spatial wind (see zeus_wind): gusts and turbulence on a coarse grid
+# (width, height, depth cells) over the rain area, on top of the nucleus
+# wind. Settings are stored as JSON on the rig group.
+WIND_FIELD_ATTRIBUTE = 'zeusWindField'
+WIND_GRID_RESOLUTION = (8, 4, 8)
+WIND_FIELD_SIZE = (100.0, 40.0, 100.0)
+DEFAULT_WIND_FIELD = {
+    # Gust amplitude (units/s) and period (frames)
+    'gust_strength': 2.0,
+    'gust_period': 48.0,
+    # Turbulence amplitude (units/s), noise cells (depth, height, width)
+    # and scrolling (cells per frame along the width)
+    'turbulence_strength': 1.0,
+    'turbulence_cells': [2, 1, 2],
+    'turbulence_scroll': 0.05,
+    'seed': 1,
+}
+# Gusts are a sum of sines of these multiples of gust_period (weaker
+# for the faster ones), the vertical ones are weaker than the horizontal
+WIND_GUST_HARMONICS = (1.0, 2.3, 5.1)
+WIND_GUST_VERTICAL_SCALE = 0.2
+
+# Ground collision of the rain (see zeus_collision): the ground meshes
+# are sampled once into a heightfield of HEIGHTFIELD_CELL_SIZE cells
+# (at most HEIGHTFIELD_MAX_RESOLUTION along a side). Settings are stored
+# as JSON on the rig group.
+GROUND_COLLISION_ATTRIBUTE = 'zeusGroundCollision'
+HEIGHTFIELD_CELL_SIZE = 0.5
+HEIGHTFIELD_MAX_RESOLUTION = 512
+# Splashes are short lived particles emitted where the drops hit, the
+# emitter rate is per second and per drop that hit
+RAIN_SPLASH_LIFESPAN = 0.2
+RAIN_SPLASH_SPEED = 1.0
+# Sky (aiPhysicalSky) at noon on a clear day
+SKY_INTENSITY = 3.0
+SKY_TINT = (0.32, 0.50, 0.84)
+# Time of day (see zeus_sky): hours go linearly from start_hour to
+# end_hour over the frame range (playback range when not set), the sun
+# position comes from the day of the year and the latitude (degrees),
+# north_offset turns the azimuth (degrees).
+TIME_OF_DAY_ATTRIBUTE = 'zeusTimeOfDay'
+DEFAULT_TIME_OF_DAY = {
+    'start_hour': 6.0,
+    'end_hour': 20.0,
+    'day_of_year': 172,
+    'latitude': 45.0,
+    'north_offset': 0.0,
+}
+# Tints with the sun on the horizon (the noon ones are SKY_TINT and white),
+# reached below SKY_WARM_ELEVATION degrees
+SKY_HORIZON_TINT = (0.62, 0.52, 0.58)
+SUN_HORIZON_TINT = (1.0, 0.55, 0.3)
+SKY_WARM_ELEVATION = 20.0
+# Intensity at night (ratio of SKY_INTENSITY), from SKY_TWILIGHT_ELEVATION
+# degrees below the horizon up to the horizon
+SKY_NIGHT_INTENSITY = 0.02
+SKY_TWILIGHT_ELEVATION = -6.0
+# A stormy sky (storminess 1) is this much darker and greyer
+SKY_STORM_DARKENING = 0.6
+SKY_STORM_DESATURATION = 0.7
+
+# particleShape.lifespanMode values
+LIFESPAN_MODE_CONSTANT = 1
+LIFESPAN_MODE_PP_ONLY = 3
+
+# Developer flag: set ZEUS_DEV_RELOAD=1 to reload every Zeus module when
+# the plug-in is loaded again, instead of having to restart Maya
+DEV_RELOAD = _os.environ.get('ZEUS_DEV_RELOAD', '0') == '1'
+# Set ZEUS_PROFILE=1 to profile the controller and the model from the
+# plug-in load (it can also be switched on from the stats panel)
+PROFILE = _os.environ.get('ZEUS_PROFILE', '0') == '1'
+# Chrome trace events kept by the profiler
+PROFILE_TRACE_LIMIT = 200000
+# Refresh interval of the stats panel (milliseconds)
+STATS_REFRESH_INTERVAL = 1000
+# Shortest interval between two reads of the scene values by the UI
+# (milliseconds), keeps scrubbing and playback at full speed
+UI_SYNC_INTERVAL = 200
+
+# Dependencies first
+ZEUS_MODULES = ('zeus_utils', 'zeus_profile', 'zeus_timeline', 'zeus_handles', 'zeus_rigs', 'zeus_presets', 'zeus_states', 'zeus_cache', 'zeus_noise', 'zeus_wind', 'zeus_collision', 'zeus_sky', 'zeus_cost', 'zeus_nodes', 'zeus_model', 'zeus_ui', 'zeus_batch', 'zeus_simulate', 'zeus_export')
+
+def reload_modules():
+    for module_name in ZEUS_MODULES:
+        if module_name in _sys.modules:
+            _importlib.reload(_sys.modules[module_name])
+
+# Node names of a rig, the default rig keeps the original names
+def rig_object_name(name, rig_id):
+    if rig_id == DEFAULT_RIG_ID:
+        return name
+    return f'{name}_{rig_id}'
+
+# Disk caches (presets, baked noise), ZEUS_CACHE_DIR or the temp folder
+def cache_root():
+    return _os.environ.get('ZEUS_CACHE_DIR') or _os.path.join(_tempfile.gettempdir(), 'zeus_cache')
+
+# Frames per second of the scene time unit
+def frames_per_second():
+    import maya.api.OpenMaya as om
+    return om.MTime(1.0, om.MTime.kSeconds).asUnits(om.MTime.uiUnit())
 
 def log(message):
-    print(f'[{PLUGIN_NAME}]: {message}')
\ No newline at end of file
+    print(f'[{PLUGIN_NAME}]: {message}')
@@ -0,0 +1,147 @@
+import ctypes
+import hashlib
+
+import numpy as np
+import maya.cmds as cmds
+
+from zeus_cache import bake_fluid_cache, workspace_cache_directory
+from zeus_noise import fluid_function, periodic_noise, shift_volume
+from zeus_utils import *
+
+
+# Spatial wind shared by the rain and the clouds.
+# The nucleus keeps the base wind (windSpeed and windDirection). On top of
+# it, the wind field adds gusts (the same vector everywhere, changing over
+# time) and turbulence (zero mean noise scrolling through the rain area).
+# Both are evaluated with NumPy for a whole coarse grid at once, written
+# to the velocity grid of a fluid container connected to the rain
+# particles as a field, and baked to a fluid cache over the playback
+# range that the scene references (batch renders play the same wind).
+#
+# The turbulence averages to zero over the container, so the mean of the
+# field is the gust: it is baked as gustX/Y/Z curves on the zeusCloudDrift
+# node and the clouds drift with the same gusts as the rain.
+
+
+# Gust velocity (frames, 3) at every frame: a few sines per axis with
+# seeded phases, so every frame can be evaluated on its own
+def gust_vectors(settings, frames):
+    frames = np.atleast_1d(np.asarray(frames, dtype=np.float64))
+    harmonics = np.asarray(WIND_GUST_HARMONICS)
+    phases = np.random.default_rng(settings['seed']).uniform(0.0, 2.0 * np.pi, (3, len(harmonics)))
+
+    # (frames, axes, harmonics), the faster sines are weaker
+    angles = 2.0 * np.pi * frames[:, None, None] / settings['gust_period'] * harmonics + phases
+    gusts = (np.sin(angles) / harmonics).sum(axis=2) / (1.0 / harmonics).sum()
+
+    return gusts * (settings['gust_strength'] * np.array([1.0, WIND_GUST_VERTICAL_SCALE, 1.0]))
+
+
+# Turbulence volumes (depth, height, width) of the x, y and z velocity,
+# between -1 and 1 and with a zero mean
+def turbulence_volumes(settings, shape):
+    random = np.random.default_rng(settings['seed'])
+    cells = tuple(int(count) for count in settings['turbulence_cells'])
+    volumes = []
+    for _ in range(3):
+        volume = 2.0 * periodic_noise(shape, cells, random) - 1.0
+        volumes.append(volume - volume.mean())
+    return volumes
+
+
+# Wind velocity (depth, height, width, 3) at the voxel centers for a frame
+def wind_grid(settings, frame, turbulence):
+    gust = gust_vectors(settings, frame)[0]
+    # The noise is periodic, scrolling wraps around the container. The
+    # scroll is in noise cells, shifts are in voxels.
+    voxels_per_cell = turbulence[0].shape[2] / int(settings['turbulence_cells'][2])
+    offset = (float(frame) * settings['turbulence_scroll'] * voxels_per_cell, 0.0, 0.0)
+
+    grid = np.empty(turbulence[0].shape + (3,), dtype=np.float32)
+    for axis in range(3):
+        grid[..., axis] = gust[axis] + settings['turbulence_strength'] * shift_volume(turbulence[axis], offset)
+    return grid
+
+
+# Fluid velocities live on the voxel faces: the x component on a
+# (depth, height, width + 1) grid, y on (depth, height + 1, width) and z
+# on (depth + 1, height, width). Faces get the average of their two
+# voxels (the border ones the value of their voxel).
+def face_velocities(grid):
+    faces = []
+    for component, axis in enumerate((2, 1, 0)):
+        widths = [(0, 0)] * 3
+        widths[axis] = (1, 1)
+        padded = np.pad(grid[..., component], widths, mode='edge')
+        count = padded.shape[axis]
+        lower = np.take(padded, np.arange(count - 1), axis=axis)
+        upper = np.take(padded, np.arange(1, count), axis=axis)
+        faces.append(np.ascontiguousarray(0.5 * (lower + upper), dtype=np.float32))
+    return faces
+
+
+# Copy the face velocities to the velocity grid of a fluid
+def write_velocity_grid(fluid_shape, faces):
+    import maya.OpenMaya as om1
+
+    fluid_fn = fluid_function(fluid_shape)
+    # One face more than voxels along x
+    voxels = faces[0][..., 1:].size
+    if fluid_fn.gridSize() != voxels:
+        raise RuntimeError(f'{fluid_shape} grid does not match the wind field ({voxels} voxels)')
+
+    # The API 1.0 returns the addresses through float pointers
+    utils = [om1.MScriptUtil() for _ in range(3)]
+    pointers = [util.asFloatPtr() for util in utils]
+    fluid_fn.getVelocity(*pointers)
+    for pointer, data in zip(pointers, faces):
+        address = int(pointer)
+        if not address:
+            raise RuntimeError(f'{fluid_shape} has no velocity grid')
+        ctypes.memmove(address, data.ctypes.data, data.nbytes)
+    fluid_fn.updateGrid()
+
+
+# Wind field of a rig, baked over the playback range.
+# The grid of every frame goes to a fluid cache keyed by the settings and
+# the frames, so changing nothing reuses the cache on disk.
+class ZeusWindField:
+    def __init__(self, model):
+        self.model = model
+        self.settings = None
+        self.turbulence = None
+
+    def update(self, settings):
+        if settings != self.settings:
+            self.settings = dict(settings)
+            self.turbulence = None
+
+        start = int(cmds.playbackOptions(query=True, minTime=True))
+        end = int(cmds.playbackOptions(query=True, maxTime=True))
+        frames = list(range(start, end + 1))
+        key = hashlib.sha1(repr((sorted(self.settings.items()), WIND_GRID_RESOLUTION, frames)).encode()).hexdigest()[:16]
+        directory = workspace_cache_directory(self.model.rig_id, 'wind', key)
+        bake_fluid_cache(self.model.wind_shape, directory, frames, self.write)
+
+    # Velocity grid of a frame (the turbulence is only evaluated when baking)
+    def write(self, frame):
+        if self.turbulence is None:
+            self.turbulence = turbulence_volumes(self.settings, tuple(reversed(WIND_GRID_RESOLUTION)))
+        write_velocity_grid(self.model.wind_shape, face_velocities(wind_grid(self.settings, frame, self.turbulence)))
+
+    # Gust curves of the cloud drift from start to end (the same gusts as
+    # the grid, the drift node adds them to the nucleus wind)
+    def bake_gusts(self, start, end, tolerance=BAKE_TOLERANCE):
+        from zeus_timeline import thin_keys
+
+        frames = np.arange(start, end + 1, dtype=np.float64)
+        gusts = gust_vectors(self.settings, frames)
+        cmds.undoInfo(openChunk=True, chunkName=UNDO_CHUNK_NAME)
+        try:
+            for i, axis in enumerate(('X', 'Y', 'Z')):
+                keep = thin_keys(frames, gusts[:, i], tolerance)
+                self.model.write_anim_curve('cloud_drift', f'gust{axis}', frames[keep], gusts[keep, i])
+            self.model.update_drift_table()
+        finally:
+            cmds.undoInfo(closeChunk=True)
+        log(f'Baked the wind gusts of frames {start:g}-{end:g}')
@@ -0,0 +1,36 @@
+import os
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, 'plug-ins'))
+sys.path.insert(0, os.path.join(root, 'benchmarks'))
+
+import numpy as np
+
+import fake_maya
+fake_maya.install()
+
+from zeus_collision import collide
+
+
+# Flat ground at height 0 under x and z in [0, 4)
+def flat_ground():
+    return {'heights': np.zeros((4, 4)), 'origin': np.zeros(2), 'cell_size': 1.0}
+
+
+def test_drops_under_the_ground_get_their_age():
+    positions = np.array([[0.5, 2.0, 0.5], [1.5, -0.1, 1.5], [9.0, -1.0, 9.0]])
+    ages = np.array([0.2, 0.3, 0.4])
+    lifespans, hits = collide(flat_ground(), positions, ages, 1.5)
+    assert hits.tolist() == [False, True, False]
+    assert lifespans.tolist() == [1.5, 0.3, 1.5]
+
+
+# The node writes lifespanPP into the shape it reads position and age from:
+# evaluating it again with its result on the particles gives the same result
+def test_collision_does_not_depend_on_the_lifespans_written():
+    positions = np.random.default_rng(0).uniform(-1.0, 5.0, (100, 3))
+    ages = np.linspace(0.0, 1.0, 100)
+    first = collide(flat_ground(), positions, ages, 1.5)
+    second = collide(flat_ground(), positions, ages, 1.5)
+    assert np.array_equal(first[0], second[0]) and np.array_equal(first[1], second[1])
@@ -0,0 +1,45 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'plug-ins'))
+
+from zeus_cost import auto_tune, estimate_cost, particle_cost, tier_cost_parameters
+from zeus_utils import *
+
+
+# Fluid settings of a tier, as ZeusModel.quality_tier_settings writes them
+def tier_settings(tier):
+    resolution_scale, sample_rate_scale, quality_scale = QUALITY_TIERS[tier]
+    settings = {f'resolution{axis}': max(1, round(resolution * resolution_scale))
+                for axis, resolution in zip(('W', 'H', 'D'), CLOUD_RESOLUTION)}
+    settings['initialSampleRate'] = max(1.0, CLOUD_INITIAL_SAMPLE_RATE * sample_rate_scale)
+    settings['extraSampleRate'] = max(0.0, CLOUD_EXTRA_SAMPLE_RATE * sample_rate_scale)
+    settings['quality'] = CLOUD_SHADING_QUALITY * quality_scale
+    return settings
+
+
+def frame_parameters(rain_rate=0.0):
+    return {
+        'density': 50.0, 'storminess': 0.5, 'details': 60.0, 'rain_rate': rain_rate,
+        **tier_cost_parameters(tier_settings('final')),
+        'lifespan': 1.5, 'particle_budget': 0, 'lean_rain': False, 'baked_noise': False,
+    }
+
+
+def test_lower_tier_costs_less():
+    clouds = [estimate_cost({**frame_parameters(), **tier_cost_parameters(tier_settings(tier))})['clouds']
+              for tier in ('final', 'preview', 'proxy')]
+    assert clouds[0] > clouds[1] > clouds[2]
+
+
+def test_auto_tune_uses_the_tier_sampling():
+    frames = [frame_parameters(rain_rate=1000.0)]
+    proxy = estimate_cost({**frames[0], **tier_cost_parameters(tier_settings('proxy')), 'rain_rate': 0.0})
+
+    # Room for all the rain with the proxy clouds only
+    needed = frames[0]['rain_rate'] * frames[0]['lifespan']
+    target = proxy['total'] + needed * particle_cost(False) * 1.01
+    tier, budget, worst = auto_tune(frames, target, tier_settings)
+    assert tier == 'proxy'
+    assert budget >= needed
+    assert worst <= target